@@ -33,14 +33,18 @@ def do_skip(bot, game):
     ended = process_departure(bot, chat, game, skipped_player.user)
 
     if not ended and game_is_running(game):
-        nextplayer_message = (
-            __("Növbəti oyunçu: {name}", multi=game.translate)
-            .format(name=display_name(game.current_player.user)))
-        choice = [[InlineKeyboardButton(text=_("Seçiminizi Edin!"), switch_inline_query_current_chat='')]]
-        send_async(bot, chat.id,
-                   text=nextplayer_message,
-                   reply_markup=InlineKeyboardMarkup(choice))
+        send_next_player(bot, game)
+
 
+def send_next_player(bot, game):
+    """Növbəti oyunçunu qrupa elan edir"""
+    nextplayer_message = (
+        __("Növbəti oyunçu: {name}", multi=game.translate)
+        .format(name=display_name(game.current_player.user)))
+    choice = [[InlineKeyboardButton(text=_("Seçiminizi Edin!"), switch_inline_query_current_chat='')]]
+    send_async(bot, game.chat.id,
+               text=nextplayer_message,
+               reply_markup=InlineKeyboardMarkup(choice))
 
 
 def send_final_standings(bot, chat_id, game):
@@ -48,7 +52,8 @@ def send_final_standings(bot, chat_id, game):
     hamının yerini (1-ci, 2-ci, 3-cü ...) səviyyə/rütbəsi ilə göstərir."""
     lines = []
     for i, finisher_user in enumerate(game.finish_order, start=1):
-        us = UserSetting.get(id=finisher_user.id)
+        # Yalnız keşə baxırıq - bu mesaj Mongo-nu gözləməməlidir
+        us = UserSetting.peek(id=finisher_user.id)
         wins = us.first_places if us else 0
         _level, rank_name = compute_level(wins)
         lines.append(
@@ -70,6 +75,8 @@ def process_departure(bot, chat, game, user):
     qalan sonuncu oyunçu - tərk edəndən HƏMİŞƏ daha yaxşı yerdə olmaqla -
     sıralamaya əlavə olunur və əgər hələ heç kim (players_won == 0) oyunu
     bitirməyibsə, bu sağ qalan oyunçu 1-ci sayılır və +1 xal qazanır.
+    Yer xalları (total_points, bax: levels.place_points) yalnız oyunu
+    bitirənlərə, bitirmə sırasına (players_won + 1) görə verilir.
 
     Return: True -> oyun tam bitdi (final sıralama göndərildi)
             False -> oyun davam edir
@@ -92,21 +99,12 @@ def process_departure(bot, chat, game, user):
         game.finish_order.insert(0, last_player)
         game.finish_order.append(user)
 
-        send_final_standings(bot, chat.id, game)
+        game.stats.finished(last_player.id, display_name(last_player),
+                            place=game.players_won + 1)
+        game.stats.finished(user.id, display_name(user))
+        game.stats.commit()
 
-        us_last = UserSetting.get(id=last_player.id)
-        if not us_last:
-            us_last = UserSetting(id=last_player.id)
-        us_last.games_played += 1
-        us_last.name = display_name(last_player)
-        if game.players_won == 0:
-            us_last.first_places += 1
-
-        us_dep = UserSetting.get(id=user.id)
-        if not us_dep:
-            us_dep = UserSetting(id=user.id)
-        us_dep.games_played += 1
-        us_dep.name = display_name(user)
+        send_final_standings(bot, chat.id, game)
 
         gm.end_game(chat, last_player)
         return True
@@ -115,11 +113,8 @@ def process_departure(bot, chat, game, user):
     # xal qazanmır, amma oynadığı oyun sayına düşür
     game.finish_order.append(user)
 
-    us_dep = UserSetting.get(id=user.id)
-    if not us_dep:
-        us_dep = UserSetting(id=user.id)
-    us_dep.games_played += 1
-    us_dep.name = display_name(user)
+    game.stats.finished(user.id, display_name(user))
+    game.stats.commit([user.id])
 
     return False
 
@@ -132,11 +127,7 @@ def do_play_card(bot, player, result_id):
     chat = game.chat
     user = player.user
 
-    us = UserSetting.get(id=user.id)
-    if not us:
-        us = UserSetting(id=user.id)
-
-    us.cards_played += 1
+    game.stats.card_played(user.id)
 
     if game.choosing_color:
         send_async(bot, chat.id, text=__("Zəhmət olmasa reng seçin", multi=game.translate))
@@ -157,16 +148,13 @@ def do_play_card(bot, player, result_id):
                        text=__("🎉 {name} oyunu {place}-cü yerdə bitirdi!", multi=game.translate)
                        .format(name=user.first_name, place=place))
 
-        us.games_played += 1
-        us.name = display_name(user)
-
-        if game.players_won == 0:
-            us.first_places += 1
-
+        game.stats.finished(user.id, display_name(user),
+                            place=game.players_won + 1)
         game.players_won += 1
 
         try:
             gm.leave_game(user, chat)
+            game.stats.commit([user.id])
         except NotEnoughPlayersError:
             # Eyni səbəbdən (bax: process_departure-dəki qeyd) game.current_player
             # etibarsız ola bilər - sağ qalanı game.players-dən tapırıq.
@@ -174,13 +162,11 @@ def do_play_card(bot, player, result_id):
             last_player = remaining[0] if remaining else user
             game.finish_order.append(last_player)
 
-            send_final_standings(bot, chat.id, game)
+            game.stats.finished(last_player.id, display_name(last_player),
+                                place=game.players_won + 1)
+            game.stats.commit()
 
-            us2 = UserSetting.get(id=last_player.id)
-            if not us2:
-                us2 = UserSetting(id=last_player.id)
-            us2.games_played += 1
-            us2.name = display_name(last_player)
+            send_final_standings(bot, chat.id, game)
 
             gm.end_game(chat, last_player)
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Measures how long it takes to set up the deck and deal the first hands of a
+game, with the current Deck and with a copy of the old one that built a new
+Card object for every card and drew them one by one.
+
+Run from the repository root:
+
+    python -m benchmarks.deck_setup --players 10 --games 2000
+"""
+
+import argparse
+import logging
+import timeit
+from random import shuffle
+
+import card as c
+from deck import Deck
+from errors import DeckEmptyError
+
+
+class LegacyCard(object):
+    """The Card class before cards were interned"""
+
+    def __init__(self, color, value, special=None):
+        self.color = color
+        self.value = value
+        self.special = special
+
+    def __str__(self):
+        if self.special:
+            return self.special
+        else:
+            return '%s_%s' % (self.color, self.value)
+
+
+class LegacyDeck(object):
+    """The Deck class before draw_many and the card templates"""
+
+    def __init__(self):
+        self.cards = list()
+        self.graveyard = list()
+        self.logger = logging.getLogger(__name__)
+
+    def draw(self):
+        try:
+            card = self.cards.pop()
+            self.logger.debug("Kart Götürülür" + str(card))
+            return card
+        except IndexError:
+            if len(self.graveyard):
+                while len(self.graveyard):
+                    self.cards.append(self.graveyard.pop())
+                shuffle(self.cards)
+                return self.draw()
+            else:
+                raise DeckEmptyError()
+
+    def _fill_classic_(self):
+        self.cards.clear()
+        for color in c.COLORS:
+            for value in c.VALUES:
+                self.cards.append(LegacyCard(color, value))
+                if not value == c.ZERO:
+                    self.cards.append(LegacyCard(color, value))
+        for special in c.SPECIALS:
+            for _ in range(4):
+                self.cards.append(LegacyCard(None, None, special=special))
+        shuffle(self.cards)
+
+
+def legacy_setup(players):
+    deck = LegacyDeck()
+    deck._fill_classic_()
+    for _ in range(players):
+        hand = list()
+        for _ in range(7):
+            hand.append(deck.draw())
+
+
+def setup(players):
+    deck = Deck()
+    deck._fill_classic_()
+    for _ in range(players):
+        deck.draw_many(7)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--games', type=int, default=5000)
+    args = parser.parse_args()
+
+    results = list()
+    for name, func in (('before', legacy_setup), ('after', setup)):
+        seconds = min(timeit.repeat(lambda: func(args.players),
+                                    number=args.games, repeat=5))
+        results.append(seconds)
+        print('%-6s %8.2f µs per game' % (name, seconds / args.games * 1e6))
+
+    print('speedup %.2fx' % (results[0] / results[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Plays complete games with the headless simulator and reports games and
+turns per second, followed by a second pass that times playable_cards,
+play_card, turn and building the inline results separately.
+
+Run from the repository root:
+
+    python -m benchmarks.gameplay --games 200 --modes classic wild
+    python -m benchmarks.gameplay --profile gameplay.prof
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+
+# Game results are written to the in-memory storage, unless STORAGE says
+# otherwise
+os.environ.setdefault('STORAGE', 'memory')
+
+from simulator import MODES, FunctionTimer, Simulator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--players', type=int, nargs='+',
+                        default=list(range(2, 11)))
+    parser.add_argument('--modes', nargs='+', choices=MODES,
+                        default=list(MODES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-turns', type=int, default=2000)
+    parser.add_argument('--profile', metavar='FILE',
+                        help='profile the throughput pass with cProfile and '
+                             'write the stats to FILE')
+    args = parser.parse_args()
+
+    with Simulator(seed=args.seed, max_turns=args.max_turns) as sim:
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+
+        report = sim.run(args.games, args.modes, args.players)
+
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+
+        print('throughput')
+        print(report)
+
+        sim.timer = FunctionTimer()
+        print('\nbreakdown')
+        print(sim.run(args.games, args.modes, args.players))
+
+    if profiler:
+        print()
+        pstats.Stats(args.profile).sort_stats('cumulative').print_stats(20)
+
+
+if __name__ == '__main__':
+    main()
@@ -24,35 +24,45 @@ from telegram import ParseMode, InlineKeyboardMarkup, \
     InlineKeyboardButton, Update
 from telegram.ext import InlineQueryHandler, ChosenInlineResultHandler, \
     CommandHandler, MessageHandler, Filters, CallbackQueryHandler, CallbackContext
-from telegram.ext.dispatcher import run_async
 
 import card as c
+import database
+import engine_log
 import settings
+import shards
+import storage
+import user_setting
 import simple_commands
 import broadcast
+import broadcast_store
 from broadcast_store import add_served_chat, add_served_user
 from actions import (do_skip, do_play_card, do_draw, do_call_bluff,
-                     process_departure)
-from config import DEFAULT_GAMEMODE, MIN_PLAYERS, MAX_PLAYERS, LOBBY_TIMEOUT_MINUTES
+                     process_departure, send_next_player)
+from config import DEFAULT_GAMEMODE, MIN_PLAYERS, MAX_PLAYERS, LOBBY_TIMEOUT_MINUTES, \
+    LOG_LEVEL, ASYNC_GAME_HANDLERS, SHARDS, MONGO_STATS_INTERVAL
 from errors import (NoGameInChatError, LobbyClosedError, AlreadyJoinedError,
                     NotEnoughPlayersError, DeckEmptyError)
 from internationalization import _, __, user_locale, game_locales
+from leaderboard import leaderboard
 from lobby import (get_lobby_keyboard, build_lobby_text, update_lobby_message,
                    send_lobby_message, close_lobby_tracking, get_open_lobby,
                    get_active_game, force_end_game, check_inactive_lobbies_job)
-from results import (add_call_bluff, add_choose_color, add_draw, add_gameinfo,
-                     add_no_game, add_not_started, add_other_cards, add_pass,
-                     add_card, add_mode_classic, add_mode_fast, add_mode_wild, add_mode_text)
+from outbox import outbox, GAMEPLAY, LOBBY
+from results import (GREY_PREFIX, add_no_game, add_not_started,
+                     add_player_options, add_mode_classic, add_mode_fast,
+                     add_mode_wild, add_mode_text)
+from result_cache import cache as result_cache
 from shared_vars import gm, updater, dispatcher
 from simple_commands import help_handler
 from start_bot import start_bot
 from utils import display_name
-from utils import send_async, answer_async, error, TIMEOUT, user_is_creator_or_admin, user_is_creator, game_is_running
+from utils import send_async, answer_async, run_async, error, TIMEOUT, user_is_creator_or_admin, user_is_creator, game_is_running, \
+    game_serial
 
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+engine_log.setup(
+    fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=LOG_LEVEL
 )
 logger = logging.getLogger(__name__)
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
@@ -61,8 +71,9 @@ logging.getLogger('apscheduler').setLevel(logging.WARNING)
 def _group_only_notice(update: Update, context: CallbackContext):
     """Yalnız qrupda işləyən əmrlər şəxsi mesajda yazılanda göstərilir."""
     send_async(context.bot, update.message.chat_id,
-               text=_("⚠️ Bu əmr yalnız qrup daxilində işləyir."))
+               text=_("⚠️ Bu əmr yalnız qrup daxilində işləyir."), priority=LOBBY)
 
+@game_serial
 @user_locale
 def notify_me(update: Update, context: CallbackContext):
     """Handler for /notify_me command, pm people for next game"""
@@ -76,6 +87,7 @@ def notify_me(update: Update, context: CallbackContext):
             gm.remind_dict[chat_id] = {update.message.from_user.id}
 
 
+@game_serial
 @user_locale
 def new_game(update: Update, context: CallbackContext):
     """Handler for the /new (and /uno) command"""
@@ -95,11 +107,11 @@ def new_game(update: Update, context: CallbackContext):
         if not active_game.started:
             send_async(context.bot, chat_id,
                        text=_("✅ Artıq aktiv qeydiyyat menyusu var. "
-                              "Oyunu sonlandırmaq üçün: /stop"))
+                              "Oyunu sonlandırmaq üçün: /stop"), priority=LOBBY)
         else:
             send_async(context.bot, chat_id,
                        text=_("⚠️ Artıq qrupda aktiv UNO oyunu gedir, hələ bitməyib. "
-                              "Oyunu sonlandırmaq üçün: /stop"))
+                              "Oyunu sonlandırmaq üçün: /stop"), priority=LOBBY)
         return
 
     if update.message.chat_id in gm.remind_dict:
@@ -107,7 +119,7 @@ def new_game(update: Update, context: CallbackContext):
             send_async(context.bot,
                        user,
                        text=_("Yeni oyun başlayır {title}").format(
-                            title=update.message.chat.title))
+                            title=update.message.chat.title), priority=LOBBY)
 
         del gm.remind_dict[update.message.chat_id]
 
@@ -121,24 +133,23 @@ def new_game(update: Update, context: CallbackContext):
     send_lobby_message(context.bot, chat_id, game)
 
 
+@game_serial
 @user_locale
 def kill_game(update: Update, context: CallbackContext):
     """Handler for the /kill command"""
     chat = update.message.chat
     user = update.message.from_user
-    games = gm.chatid_games.get(chat.id)
+    game = gm.active_game(chat.id)
 
     if update.message.chat.type == 'private':
         _group_only_notice(update, context)
         return
 
-    if not games:
+    if not game:
             send_async(context.bot, chat.id,
                        text=_("Bu Qrupda heç bir oyun oynanılmır."))
             return
 
-    game = games[-1]
-
     if user_is_creator_or_admin(user, game, context.bot, chat):
 
         if game.lobby_message_id is not None:
@@ -159,6 +170,7 @@ def kill_game(update: Update, context: CallbackContext):
                   .format(name=game.starter.first_name),
                   reply_to_message_id=update.message.message_id)
 
+@game_serial
 @user_locale
 def join_game(update: Update, context: CallbackContext):
     """Handler for the /join command"""
@@ -173,41 +185,42 @@ def join_game(update: Update, context: CallbackContext):
         send_async(context.bot, chat.id,
                    text=_("⚠️ Oyunçu sayı artıq maksimuma ({max} nəfər) çatıb.")
                    .format(max=MAX_PLAYERS),
-                   reply_to_message_id=update.message.message_id)
+                   reply_to_message_id=update.message.message_id, priority=LOBBY)
         return
 
     try:
         gm.join_game(update.message.from_user, chat)
 
     except LobbyClosedError:
-            send_async(context.bot, chat.id, text=_("Oyuna qeydiyyat bağlanıb"))
+            send_async(context.bot, chat.id, text=_("Oyuna qeydiyyat bağlanıb"), priority=LOBBY)
 
     except NoGameInChatError:
         send_async(context.bot, chat.id,
                    text=_("Heç bir Oyun getmir indi. "
                           "Yeni oyunu bu əmr ilə yarat: /uno"),
-                   reply_to_message_id=update.message.message_id)
+                   reply_to_message_id=update.message.message_id, priority=LOBBY)
 
     except AlreadyJoinedError:
         send_async(context.bot, chat.id,
                    text=_("Sən artıq oyuna qoşulmusan ✅"),
-                   reply_to_message_id=update.message.message_id)
+                   reply_to_message_id=update.message.message_id, priority=LOBBY)
 
     except DeckEmptyError:
         send_async(context.bot, chat.id,
                    text=_("Əlinizdə kifayət qədər kart qalmayıb"
                           "yeni oyunçuların qoşulması üçün."),
-                   reply_to_message_id=update.message.message_id)
+                   reply_to_message_id=update.message.message_id, priority=LOBBY)
 
     else:
         send_async(context.bot, chat.id,
                    text=_("✅ {name} oyuna qoşuldu!")
-                   .format(name=display_name(update.message.from_user)))
+                   .format(name=display_name(update.message.from_user)), priority=LOBBY)
         refreshed_lobby = get_open_lobby(chat.id)
         if refreshed_lobby is not None:
             update_lobby_message(context.bot, chat.id, refreshed_lobby)
 
 
+@game_serial
 @user_locale
 def leave_game(update: Update, context: CallbackContext):
     """Handler for the /leave command"""
@@ -263,6 +276,7 @@ def leave_game(update: Update, context: CallbackContext):
                    reply_to_message_id=update.message.message_id)
 
 
+@game_serial
 @user_locale
 def lobby_join_callback(update: Update, context: CallbackContext):
     """Handler for the 'Oyuna Qoşul 🙋‍♂️' lobby button"""
@@ -300,9 +314,10 @@ def lobby_join_callback(update: Update, context: CallbackContext):
     update_lobby_message(context.bot, chat.id, game)
     query.answer(_("Oyuna qoşuldunuz!"), show_alert=False)
     send_async(context.bot, chat.id,
-               text=_("✅ {name} oyuna qoşuldu!").format(name=display_name(user)))
+               text=_("✅ {name} oyuna qoşuldu!").format(name=display_name(user)), priority=LOBBY)
 
 
+@game_serial
 @user_locale
 def lobby_start_callback(update: Update, context: CallbackContext):
     """Handler for the 'Oyunu Başlat ▶️' lobby button"""
@@ -331,7 +346,7 @@ def select_game(update: Update, context: CallbackContext):
     players = gm.userid_players[user_id]
     for player in players:
         if player.game.chat.id == chat_id:
-            gm.userid_current[user_id] = player
+            gm.set_current(user_id, player)
             break
     else:
         send_async(bot,
@@ -357,9 +372,10 @@ def select_game(update: Update, context: CallbackContext):
                             parse_mode=ParseMode.HTML,
                             timeout=TIMEOUT)
 
-    dispatcher.run_async(selected)
+    run_async(selected)
 
 
+@game_serial
 @game_locales
 def status_update(update: Update, context: CallbackContext):
     """Remove player from game if user leaves the group"""
@@ -416,21 +432,16 @@ def perform_game_start(bot, job_queue, chat, game):
            "/close edərək başqalarının oyuna qoşulmağını bağlayın.\n")
         .format(name=display_name(game.current_player.user)))
 
-    def send_first():
-        """Send the first card and player"""
-
-        bot.sendSticker(chat.id,
-                        sticker=c.STICKERS[str(game.last_card)],
-                        timeout=TIMEOUT)
-
-        bot.sendMessage(chat.id,
-                        text=first_message,
-                        reply_markup=InlineKeyboardMarkup(choice),
-                        timeout=TIMEOUT)
-
-    dispatcher.run_async(send_first)
+    # İlk kart və ilk oyunçu digər oyun mesajları kimi növbədən (outbox)
+    # göndərilir ki, çatın limitinə daxil olsunlar
+    outbox.put(bot.sendSticker, (chat.id,),
+               dict(sticker=c.STICKERS[str(game.last_card)], timeout=TIMEOUT),
+               chat_id=chat.id, priority=GAMEPLAY)
+    send_async(bot, chat.id, text=first_message,
+               reply_markup=InlineKeyboardMarkup(choice))
 
 
+@game_serial
 @user_locale
 def start_game(update: Update, context: CallbackContext):
     """Handler for the /start command.
@@ -459,6 +470,7 @@ def start_game(update: Update, context: CallbackContext):
     help_handler(update, context)
 
 
+@game_serial
 @user_locale
 def close_game(update: Update, context: CallbackContext):
     """Handler for the /close command"""
@@ -469,29 +481,28 @@ def close_game(update: Update, context: CallbackContext):
         _group_only_notice(update, context)
         return
 
-    games = gm.chatid_games.get(chat.id)
+    game = gm.active_game(chat.id)
 
-    if not games:
+    if not game:
         send_async(context.bot, chat.id,
-                   text=_("Bu Qrupda heç bir Oyun oynanılmır."))
+                   text=_("Bu Qrupda heç bir Oyun oynanılmır."), priority=LOBBY)
         return
 
-    game = games[-1]
-
     if user.id in game.owner:
         game.open = False
         send_async(context.bot, chat.id, text=_("Oyuna qeydiyyat bağlandı. "
-                                        "Bu oyuna artıq heç kim qoşula bilməz."))
+                                        "Bu oyuna artıq heç kim qoşula bilməz."), priority=LOBBY)
         return
 
     else:
         send_async(context.bot, chat.id,
                    text=_("Ancaq Oyunu başladan ({name}) bunu edə bilər.")
                    .format(name=game.starter.first_name),
-                   reply_to_message_id=update.message.message_id)
+                   reply_to_message_id=update.message.message_id, priority=LOBBY)
         return
 
 
+@game_serial
 @user_locale
 def open_game(update: Update, context: CallbackContext):
     """Handler for the /open command"""
@@ -502,84 +513,81 @@ def open_game(update: Update, context: CallbackContext):
         _group_only_notice(update, context)
         return
 
-    games = gm.chatid_games.get(chat.id)
+    game = gm.active_game(chat.id)
 
-    if not games:
+    if not game:
         send_async(context.bot, chat.id,
-                   text=_("Bu Qrupda heç bir oyun oynanılmır"))
+                   text=_("Bu Qrupda heç bir oyun oynanılmır"), priority=LOBBY)
         return
 
-    game = games[-1]
-
     if user.id in game.owner:
         game.open = True
-        send_async(context.bot, chat.id, text=_("Oyuna Qeydiyyat açıldı. Yeni oyunçular /join yazaraq oyuna qoşula bilərlər."))
+        send_async(context.bot, chat.id, text=_("Oyuna Qeydiyyat açıldı. Yeni oyunçular /join yazaraq oyuna qoşula bilərlər."), priority=LOBBY)
         return
     else:
         send_async(context.bot, chat.id,
                    text=_("Ancaq Oyunu başladan({name}) bunu edə bilər.")
                    .format(name=game.starter.first_name),
-                   reply_to_message_id=update.message.message_id)
+                   reply_to_message_id=update.message.message_id, priority=LOBBY)
         return
 
 
+@game_serial
 @user_locale
 def enable_translations(update: Update, context: CallbackContext):
     """Handler for the /enable_translations command"""
     chat = update.message.chat
     user = update.message.from_user
-    games = gm.chatid_games.get(chat.id)
+    game = gm.active_game(chat.id)
 
-    if not games:
+    if not game:
         send_async(context.bot, chat.id,
-                   text=_("There is no running game in this chat."))
+                   text=_("There is no running game in this chat."), priority=LOBBY)
         return
 
-    game = games[-1]
-
     if user.id in game.owner:
         game.translate = True
         send_async(context.bot, chat.id, text=_("Enabled multi-translations. "
-                                        "Disable with /disable_translations"))
+                                        "Disable with /disable_translations"), priority=LOBBY)
         return
 
     else:
         send_async(context.bot, chat.id,
                    text=_("Only the game creator ({name}) and admin can do that.")
                    .format(name=game.starter.first_name),
-                   reply_to_message_id=update.message.message_id)
+                   reply_to_message_id=update.message.message_id, priority=LOBBY)
         return
 
 
+@game_serial
 @user_locale
 def disable_translations(update: Update, context: CallbackContext):
     """Handler for the /disable_translations command"""
     chat = update.message.chat
     user = update.message.from_user
-    games = gm.chatid_games.get(chat.id)
+    game = gm.active_game(chat.id)
 
-    if not games:
+    if not game:
         send_async(context.bot, chat.id,
-                   text=_("There is no running game in this chat."))
+                   text=_("There is no running game in this chat."), priority=LOBBY)
         return
 
-    game = games[-1]
-
     if user.id in game.owner:
         game.translate = False
         send_async(context.bot, chat.id, text=_("Disabled multi-translations. "
                                         "Enable them again with "
-                                        "/enable_translations"))
+                                        "/enable_translations"), priority=LOBBY)
         return
 
     else:
         send_async(context.bot, chat.id,
                    text=_("Only the game creator ({name}) and admin can do that.")
                    .format(name=game.starter.first_name),
-                   reply_to_message_id=update.message.message_id)
+                   reply_to_message_id=update.message.message_id, priority=LOBBY)
         return
 
 
+@game_serial
 @game_locales
 @user_locale
 def skip_player(update: Update, context: CallbackContext):
@@ -639,41 +647,23 @@ def reply_to_query(update: Update, context: CallbackContext):
             else:
                 add_not_started(results)
 
+            for result in results:
+                result.id += ':%d' % player.anti_cheat
 
-        elif user_id == game.current_player.user.id:
-            if game.choosing_color:
-                add_choose_color(results, game)
-                add_other_cards(player, results, game)
-            else:
-                if not player.drew:
-                    add_draw(player, results)
-
-                else:
-                    add_pass(results, game)
-
-                if game.last_card.special == c.DRAW_FOUR and game.draw_counter:
-                    add_call_bluff(results, game)
-
-                playable = player.playable_cards()
-                added_ids = list()  # Duplicates are not allowed
-
-                for card in sorted(player.cards):
-                    add_card(game, card, results,
-                             can_play=(card in playable and
-                                            str(card) not in added_ids))
-                    added_ids.append(str(card))
-
-                add_gameinfo(game, results)
+        else:
+            # The results only change with the game, the hand, the language
+            # or after the player chose a result
+            key = result_cache.key(player, _.locale_stack)
+            results = result_cache.get(player, key)
 
-        elif user_id != game.current_player.user.id or not game.started:
-            for card in sorted(player.cards):
-                add_card(game, card, results, can_play=False)
+            if results is None:
+                results = list()
+                add_player_options(player, results)
 
-        else:
-            add_gameinfo(game, results)
+                for result in results:
+                    result.id += ':%d' % player.anti_cheat
 
-        for result in results:
-            result.id += ':%d' % player.anti_cheat
+                result_cache.put(player, key, results)
 
         if players and game and len(players) > 1:
             switch = _('İndiki Oyun: {game}').format(game=game.chat.title)
@@ -682,6 +672,7 @@ def reply_to_query(update: Update, context: CallbackContext):
                  switch_pm_text=switch, switch_pm_parameter='select')
 
 
+@game_serial
 @game_locales
 @user_locale
 def process_result(update: Update, context: CallbackContext):
@@ -698,7 +689,7 @@ def process_result(update: Update, context: CallbackContext):
     except (KeyError, AttributeError):
         return
 
-    logger.debug("Axtarılan nəticə: " + result_id)
+    logger.debug("Axtarılan nəticə: %s", result_id)
 
     result_id, anti_cheat = result_id.split(':')
     last_anti_cheat = player.anti_cheat
@@ -710,10 +701,10 @@ def process_result(update: Update, context: CallbackContext):
         # First 5 characters are 'mode_', the rest is the gamemode.
         mode = result_id[5:]
         game.set_mode(mode)
-        logger.info("Oyun modu dəyişildi {mode}".format(mode = mode))
+        logger.info("Oyun modu dəyişildi %s", mode)
         send_async(context.bot, chat.id, text=__("Oyun modu dəyişildi {mode}".format(mode = mode)))
         return
-    elif len(result_id) == 36:  # UUID result
+    elif result_id.startswith(GREY_PREFIX):
         return
     elif int(anti_cheat) != last_anti_cheat:
         send_async(context.bot, chat.id,
@@ -732,17 +723,15 @@ def process_result(update: Update, context: CallbackContext):
         do_play_card(context.bot, player, result_id)
 
     if game_is_running(game):
-        nextplayer_message = (
-            __("Növbəti oyunçu: {name}", multi=game.translate)
-            .format(name=display_name(game.current_player.user)))
-        choice = [[InlineKeyboardButton(text=_("Seçiminizi Edin!"), switch_inline_query_current_chat='')]]
-        send_async(context.bot, chat.id,
-                        text=nextplayer_message,
-                        reply_markup=InlineKeyboardMarkup(choice))
+        send_next_player(context.bot, game)
 
 
 # Add all handlers to the dispatcher and run the bot
-dispatcher.add_handler(InlineQueryHandler(reply_to_query))
+# Oyun handler-ləri özləri qrupun növbəsinə düşür (bax: utils.game_serial):
+# dispatcher axınını gözlətmirlər, bir qrup da birdən çox axın tutmur.
+# Inline sorğular yalnız oxuyur - növbəyə düşmür, birbaşa axında işlənir
+dispatcher.add_handler(InlineQueryHandler(reply_to_query,
+                                          run_async=ASYNC_GAME_HANDLERS))
 dispatcher.add_handler(ChosenInlineResultHandler(process_result, pass_job_queue=True))
 # 🟢 Lobby (qeydiyyat menyusu) düymələri - catch-all select_game-dən ƏVVƏL
 # qeydiyyatdan keçirilməlidir ki, öz callback_data-larını "oğurlamasın"
@@ -774,5 +763,39 @@ dispatcher.add_error_handler(error)
 # bitirmə mexanizmi budur
 updater.job_queue.run_repeating(check_inactive_lobbies_job, interval=20, first=20)
 
-start_bot(updater)
-updater.idle()
+# Mongo bağlantı hovuzunun istifadəsi bot işləyərkən də log-a düşür
+if MONGO_STATS_INTERVAL > 0:
+    updater.job_queue.run_repeating(
+        lambda context: database.log_pool_stats(),
+        interval=MONGO_STATS_INTERVAL, first=MONGO_STATS_INTERVAL)
+
+
+def setup_storage():
+    """Backend-i və ondan asılı fon yazıcılarını bot başlayanda yaradır"""
+    storage.setup()
+    user_setting.setup()
+    broadcast_store.setup()
+
+
+def setup_shard(index):
+    """Bot SHARDS prosesə bölündükdə hər prosesdə (bax: shards.py) çağırılır"""
+    setup_storage()
+    # Köçürmə bir dəfə, yalnız birinci prosesdə
+    if index == 0:
+        user_setting.migrate_profiles()
+
+    # Digər proseslərdəki qələbələr bu prosesin reytinq siyahısına düşmür,
+    # ona görə siyahı dəqiqədə bir bazadan yenidən oxunur
+    if leaderboard.available():
+        updater.job_queue.run_repeating(
+            lambda context: leaderboard.invalidate(), interval=60, first=60)
+
+
+if __name__ == '__main__':
+    if SHARDS > 1:
+        shards.main(SHARDS)
+    else:
+        setup_storage()
+        user_setting.migrate_profiles()
+        start_bot(updater)
+        updater.idle()
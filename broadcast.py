@@ -9,17 +9,18 @@
 
 import logging
 import threading
-import time
+from collections import Counter
 
 from telegram import Update
 from telegram.error import RetryAfter, Unauthorized, BadRequest, TelegramError
 from telegram.ext import CommandHandler, MessageHandler, Filters, CallbackContext
 
 from config import SUDO_USERS
+from outbox import outbox, BROADCAST
 from shared_vars import dispatcher
 from broadcast_store import (
-    add_served_chat, add_served_user, get_served_chats, get_served_users,
-    _log_broadcast_error,
+    add_served_chat, add_served_user, count_served_chats, count_served_users,
+    get_served_chats, get_served_users, _log_broadcast_error,
 )
 
 logger = logging.getLogger(__name__)
@@ -59,88 +60,125 @@ def new_member_handler(update: Update, context: CallbackContext):
         logger.error(f"new_member_handler xətası: {e}")
 
 
-def _forward_to_target(bot, target_id, source_chat_id, source_message_id, kind):
-    """Bir qrup/istifadəçiyə mesajı YALNIZ BİR DƏFƏ göndərməyə cəhd edir.
+class _Tally(object):
+    """Növbəyə (outbox) verilmiş göndərmələrin nəticələrini sayır."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.queued = 0
+        self.done = 0
+        self._cond = threading.Condition()
+
+    def expect(self):
+        with self._cond:
+            self.queued += 1
+
+    def add(self, kind, result):
+        with self._cond:
+            self.counts[kind, result] += 1
+            self.done += 1
+            self._cond.notify_all()
+
+    def wait(self):
+        """Növbəyə verilmiş bütün göndərmələr bitənə qədər gözləyir."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.done >= self.queued)
+
+
+def _forward_result(kind, target_id, error):
+    """Bir göndərmənin nəticəsi.
     QƏSDƏN heç bir təkrar (retry) cəhd EDİLMİR - çünki RetryAfter xətasından
     sonra ikinci cəhd bəzən eyni şəxsə mesajın İKİ DƏFƏ getməsinə səbəb
     olurdu. Rate-limit-ə düşən hədəf sadəcə "uğursuz" sayılır, təkrar
     göndərilmir.
     Return: 'sent' | 'blocked' | 'failed'"""
-    try:
-        bot.forward_message(target_id, source_chat_id, source_message_id)
+    if error is None:
         return "sent"
-    except RetryAfter as e:
-        _log_broadcast_error(kind, target_id, f"RetryAfter: {e.retry_after}s (təkrar cəhd edilmədi)")
+    if isinstance(error, RetryAfter):
+        _log_broadcast_error(kind, target_id, f"RetryAfter: {error.retry_after}s (təkrar cəhd edilmədi)")
         return "failed"
-    except Unauthorized as e:
+    if isinstance(error, Unauthorized):
         # İstifadəçi botu bloklayıb, botu silib, ya da botla HEÇ VAXT şəxsi
         # (/start) əlaqəyə keçməyib - Telegram-ın özü bu mesajı ötürməyə
         # icazə vermir (platform məhdudiyyəti, koddan düzəldilə bilməz).
-        _log_broadcast_error(kind, target_id, f"Unauthorized: {e}")
+        _log_broadcast_error(kind, target_id, f"Unauthorized: {error}")
         return "blocked"
-    except BadRequest as e:
-        _log_broadcast_error(kind, target_id, f"BadRequest: {e}")
-        return "failed"
-    except TelegramError as e:
-        _log_broadcast_error(kind, target_id, f"TelegramError: {e}")
+    if isinstance(error, BadRequest):
+        _log_broadcast_error(kind, target_id, f"BadRequest: {error}")
         return "failed"
-    except Exception as e:
-        _log_broadcast_error(kind, target_id, str(e))
+    if isinstance(error, TelegramError):
+        _log_broadcast_error(kind, target_id, f"TelegramError: {error}")
         return "failed"
+    _log_broadcast_error(kind, target_id, str(error))
+    return "failed"
+
+
+def _forward_to_target(bot, target_id, source_chat_id, source_message_id, kind, tally):
+    """Mesajı bir qrup/istifadəçiyə göndərmək üçün ən aşağı prioritetlə
+    növbəyə (outbox) verir. Növbə doludursa yer açılana qədər gözləyir -
+    beləliklə broadcast oyun mesajlarını heç vaxt sıxışdırmır və sürəti
+    OUTBOX_BROADCAST_RATE ilə məhdudlaşır."""
+    def done(result, error):
+        tally.add(kind, _forward_result(kind, target_id, error))
+
+    tally.expect()
+    queued = outbox.put(bot.forward_message,
+                        (target_id, source_chat_id, source_message_id),
+                        chat_id=target_id, priority=BROADCAST, retry=False,
+                        callback=done, block=True)
+    if not queued:
+        done(None, "bot dayandırılır, göndərilmədi")
 
 
 def _run_broadcast(bot, source_chat_id, source_message_id, status_msg, fallback_msg):
     """Reklamın faktiki göndərilməsi - bu, ayrıca arxa fon thread-də işləyir
     ki, botun əsas dispatcher-i (oyun, digər əmrlər) HEÇ VAXT bloklanmasın."""
-    served_chats = get_served_chats()
-    served_users = get_served_users()
+    # Siyahılar yaddaşa yüklənmir - sənədlər göndərildikcə oxunur
+    logger.info(f"/broadcast başladı: təxminən {count_served_chats()} qrup, {count_served_users()} istifadəçi qeydə alınıb.")
 
-    logger.info(f"/broadcast başladı: {len(served_chats)} qrup, {len(served_users)} istifadəçi qeydə alınıb.")
-
-    sent_chats = failed_chats = 0
-    for chat in served_chats:
+    tally = _Tally()
+    for chat in get_served_chats():
         try:
-            chat_id = chat["chat_id"]
-            result = _forward_to_target(bot, chat_id, source_chat_id, source_message_id, "chat")
-            if result == "sent":
-                sent_chats += 1
-            else:
-                failed_chats += 1
-            time.sleep(0.3)
+            _forward_to_target(bot, chat["chat_id"], source_chat_id, source_message_id, "chat", tally)
         except Exception as e:
             logger.error(f"Qrup emalı zamanı gözlənilməz xəta ({chat}): {e}")
-            failed_chats += 1
+            tally.expect()
+            tally.add("chat", "failed")
 
-    sent_users = blocked_users = failed_users = 0
-    for u in served_users:
+    for u in get_served_users():
         try:
-            uid = u["user_id"]
-            result = _forward_to_target(bot, uid, source_chat_id, source_message_id, "user")
-            if result == "sent":
-                sent_users += 1
-            elif result == "blocked":
-                blocked_users += 1
-            else:
-                failed_users += 1
-            time.sleep(0.3)
+            _forward_to_target(bot, u["user_id"], source_chat_id, source_message_id, "user", tally)
         except Exception as e:
             logger.error(f"İstifadəçi emalı zamanı gözlənilməz xəta ({u}): {e}")
-            failed_users += 1
+            tally.expect()
+            tally.add("user", "failed")
+
+    tally.wait()
+    counts = tally.counts
+
+    sent_chats = counts["chat", "sent"]
+    failed_chats = counts["chat", "blocked"] + counts["chat", "failed"]
+    sent_users = counts["user", "sent"]
+    blocked_users = counts["user", "blocked"]
+    failed_users = counts["user", "failed"]
+
+    total_chats = sent_chats + failed_chats
+    total_users = sent_users + blocked_users + failed_users
 
     summary = (
         f"✅ *Reklam prosesi bitdi!*\n\n"
-        f"👥 *Qruplar* (cəmi {len(served_chats)}):\n"
+        f"👥 *Qruplar* (cəmi {total_chats}):\n"
         f"   ✔️ Uğurlu: {sent_chats}\n"
         f"   ❌ Uğursuz: {failed_chats}\n\n"
-        f"👤 *İstifadəçilər* (cəmi {len(served_users)}):\n"
+        f"👤 *İstifadəçilər* (cəmi {total_users}):\n"
         f"   ✔️ Uğurlu: {sent_users}\n"
         f"   🚫 Bloklayıb / botu heç vaxt başlatmayıb: {blocked_users}\n"
         f"   ❌ Digər xəta: {failed_users}\n"
     )
 
     logger.info(
-        f"/broadcast bitdi: qruplar {sent_chats}/{len(served_chats)} uğurlu, "
-        f"istifadəçilər {sent_users}/{len(served_users)} uğurlu "
+        f"/broadcast bitdi: qruplar {sent_chats}/{total_chats} uğurlu, "
+        f"istifadəçilər {sent_users}/{total_users} uğurlu "
         f"({blocked_users} bloklanıb, {failed_users} digər xəta)."
     )
 
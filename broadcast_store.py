@@ -4,105 +4,276 @@
 # /broadcast üçün qrup və şəxsi istifadəçi siyahısı. Domino botundakı EYNİ
 # məntiq: bir dəfə yazılan qeyd HEÇ VAXT silinmir (bot restart olsa belə).
 #
-# QEYD (GERİYƏ UYĞUNLUQ): Bu kolleksiyalarda tarix boyu İKİ fərqli sxem
-# istifadə olunub - köhnə sənədlərdə identifikator "_id" sahəsindədir, yeni
-# sənədlərdə isə açıq "chat_id"/"user_id" sahəsindədir. get_served_chats()/
-# get_served_users() HƏR İKİ formatı normallaşdıraraq HƏMİŞƏ "chat_id"/
-# "user_id" açarı ilə qaytarır ki, çağıran kod (broadcast.py) sxem
-# fərqindən asılı olmadan işləsin - əks halda köhnə formatlı bir sənəd
-# bütün broadcast dövrəsini səssizcə yarımçıq kəsə bilərdi.
+# Siyahılar storage.py vasitəsilə "chats" və "broadcast_users" adı ilə
+# saxlanılır. Mongo-da hər sənəd yalnız {"_id": <chat/user id>}-dir. Tarix
+# boyu İKİ fərqli sxem istifadə olunub - köhnə sənədlərdə identifikator
+# "_id" sahəsində, sonrakılarda isə açıq "chat_id"/"user_id" sahəsində idi.
+# storage.migrate_to_canonical() ikinci formatı bir dəfəlik (partiyalarla,
+# yarıda kəsilsə davam etdirilə bilən şəkildə) "_id" formatına köçürür və
+# bitdiyini "migrations" kolleksiyasında qeyd edir. get_served_chats()/
+# get_served_users() yenə də {"chat_id"/"user_id": ...} qaytarır ki,
+# broadcast.py dəyişməsin.
+#
+# track_activity HƏR mesajda add_served_* çağırır. Ona görə artıq tanınan
+# ID-lər (KnownIds) yaddaşda saxlanılır və heç bir DB sorğusu getmir. Yeni
+# ID-lər növbəyə düşür və ServedTracker onları bir neçə saniyədən bir toplu
+# upsert edir. Tanınan ID-lər bot başlayanda fonda bazadan yüklənir.
 
+import atexit
+import hashlib
 import logging
+import math
+import threading
 
-from database import db
+from config import BROADCAST_KNOWN_MAX, BROADCAST_BLOOM_CAPACITY, \
+    BROADCAST_FLUSH_SECONDS
+from storage import get_storage
 
 logger = logging.getLogger(__name__)
 
-chats_collection = db["chats"] if db is not None else None
-bc_users_collection = db["broadcast_users"] if db is not None else None
 
+class BloomFilter:
+    """Çox böyük ID çoxluqları üçün yaddaşa qənaətli (ehtimallı) çoxluq."""
 
-def add_served_chat(chat_id):
-    if chats_collection is None:
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) /
+                               math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, id):
+        digest = hashlib.blake2b(str(id).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, id):
+        for pos in self._positions(id):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, id):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7))
+                   for pos in self._positions(id))
+
+
+class KnownIds:
+    """
+    Artıq yazılmış ID-lər. Dəqiq çoxluq max_size ilə məhduddur; dolandan
+    sonra gələn ID-lər Bloom filtrində saxlanılır (nadir səhv "tanınır"
+    cavabı mümkündür). bloom_capacity verilməyibsə, filtrin tutumu
+    max_size qədərdir.
+    """
+
+    def __init__(self, max_size, bloom_capacity=0):
+        self.max_size = max_size
+        self.bloom_capacity = bloom_capacity or max(max_size, 1)
+        self.ids = set()
+        self.bloom = None
+
+    def add(self, id):
+        if len(self.ids) < self.max_size:
+            self.ids.add(id)
+            return
+        # Filtr yalnız çoxluq dolanda yaradılır
+        if self.bloom is None:
+            self.bloom = BloomFilter(self.bloom_capacity)
+        self.bloom.add(id)
+
+    def __contains__(self, id):
+        if id in self.ids:
+            return True
+        return self.bloom is not None and id in self.bloom
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class ServedTracker:
+    """
+    Bir siyahı üçün: tanınan ID-lər + toplu yazılacaq yeni ID-lər. field
+    köhnə sxemdəki sahənin adıdır ("chat_id"/"user_id").
+    """
+
+    def __init__(self, store, name, field,
+                 interval=BROADCAST_FLUSH_SECONDS,
+                 max_size=BROADCAST_KNOWN_MAX,
+                 bloom_capacity=BROADCAST_BLOOM_CAPACITY):
+        self.store = store
+        self.name = name
+        self.field = field
+        self.migrated = False
+        self.interval = interval
+        self.known = KnownIds(max_size, bloom_capacity)
+        self.hits = 0
+        self.writes = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        # Köçürmə həm yazma axınından, həm /broadcast-dan çağırılır
+        self._migrate_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, id):
+        if id in self.known:
+            self.hits += 1
+            return
+
+        with self._lock:
+            self._pending.add(id)
+            if self._thread is None:
+                self._start()
+
+    def _start(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f"served_{self.field}", daemon=True)
+        self._thread.start()
+
+    def migrate(self):
+        """Köhnə sxemdən köçürmə hələ bitməyibsə, onu (davam) etdirir.
+        Return: köçürmə bitibsə True"""
+        with self._migrate_lock:
+            if self.migrated:
+                return True
+            try:
+                self.migrated = self.store.prepare_ids(self.name, self.field)
+            except Exception as e:
+                logger.error(f"{self.field} siyahısı köçürülərkən xəta: {e}")
+            return self.migrated
+
+    def load(self):
+        """Mövcud ID-ləri tanınanlara əlavə edir."""
+        try:
+            for id in self.store.iter_ids(self.name, batch_size=10000):
+                self.known.add(id)
+        except Exception as e:
+            logger.error(f"Tanınan ID-lər yüklənərkən xəta: {e}")
+
+    def start(self):
+        """Tanınan ID-ləri fonda yükləyir və yazma axınını başladır."""
+        with self._lock:
+            if self._thread is None:
+                self._start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, set()
+
+        if not pending:
+            return
+
+        try:
+            self.store.add_ids(self.name, pending)
+        except Exception as e:
+            logger.error(f"{self.field} siyahısı yazılarkən xəta: {e}")
+            with self._lock:
+                self._pending |= pending
+            return
+
+        self.writes += len(pending)
+        for id in pending:
+            self.known.add(id)
+
+    def _run(self):
+        self.migrate()
+        self.load()
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+
+# Siyahılar ilk lazım olanda yaradılır (bax: setup) ki, modulu import etmək
+# bazaya qoşulmasın
+served_chats = None
+served_users = None
+
+_setup_lock = threading.Lock()
+_created = False
+
+
+def setup():
+    """
+    Seçilmiş backend üzərində siyahıları yaradır və tanınan ID-ləri fonda
+    yükləməyə başlayır. Bot başlayanda çağırılır, çağırılmayıbsa ilk
+    istifadədə.
+    """
+    global served_chats, served_users, _created
+
+    if _created:
         return
-    try:
-        # Əvvəlcə köhnə formatda (yalnız _id) qeyd olub-olmadığını yoxla ki,
-        # təkrar (dublikat) sənəd yaranmasın
-        existing = chats_collection.find_one(
-            {"$or": [{"chat_id": chat_id}, {"_id": chat_id}]}
-        )
-        if existing:
+
+    with _setup_lock:
+        if _created:
             return
-        chats_collection.update_one(
-            {"chat_id": chat_id},
-            {"$setOnInsert": {"chat_id": chat_id}},
-            upsert=True,
-        )
-    except Exception as e:
-        logger.error(f"Qrup yaddaşa yazılarkən xəta: {e}")
-
-
-def get_served_chats() -> list:
-    """Hər sənədi HƏMİŞƏ {'chat_id': <id>} formatında qaytarır - köhnə
-    formatlı sənədlər (yalnız _id) də daxil olmaqla. Eyni ID üçün BİRDƏN
-    ARTIQ sənəd olsa belə (əvvəlki sxem versiyalarından qalma), nəticədə
-    hər ID YALNIZ BİR DƏFƏ görünür."""
-    if chats_collection is None:
-        return []
-    seen = set()
-    result = []
-    try:
-        for doc in chats_collection.find({}):
-            chat_id = doc.get("chat_id")
-            if chat_id is None:
-                chat_id = doc.get("_id")
-            if chat_id is not None and chat_id not in seen:
-                seen.add(chat_id)
-                result.append({"chat_id": chat_id})
-    except Exception as e:
-        logger.error(f"Qruplar oxunarkən xəta: {e}")
-    return result
+
+        store = get_storage()
+        if store is not None:
+            served_chats = ServedTracker(store, "chats", "chat_id")
+            served_users = ServedTracker(store, "broadcast_users", "user_id")
+            for tracker in (served_chats, served_users):
+                tracker.start()
+                atexit.register(tracker.flush)
+        _created = True
+
+
+def add_served_chat(chat_id):
+    setup()
+    if served_chats is not None:
+        served_chats.add(chat_id)
+
+
+def get_served_chats(batch_size=1000):
+    """Saxlanılan qrupları bir-bir {'chat_id': <id>} kimi qaytarır
+    (generator) - hamısı birdən yaddaşa yüklənmir."""
+    setup()
+    yield from _iter_served(served_chats, "chat_id", batch_size)
 
 
 def add_served_user(user_id):
-    if bc_users_collection is None:
+    setup()
+    if served_users is not None:
+        served_users.add(user_id)
+
+
+def get_served_users(batch_size=1000):
+    """Saxlanılan istifadəçiləri bir-bir {'user_id': <id>} kimi qaytarır
+    (generator)."""
+    setup()
+    yield from _iter_served(served_users, "user_id", batch_size)
+
+
+def count_served_chats():
+    setup()
+    return _count_served(served_chats)
+
+
+def count_served_users():
+    setup()
+    return _count_served(served_users)
+
+
+def _iter_served(tracker, field, batch_size):
+    if tracker is None:
+        return
+    # Köçürmə bitməyibsə siyahıda hələ köhnə sənədlər (_id=ObjectId) var
+    if not tracker.migrate():
+        logger.error(f"{field} siyahısı köçürülməyib, oxunmur")
         return
     try:
-        existing = bc_users_collection.find_one(
-            {"$or": [{"user_id": user_id}, {"_id": user_id}]}
-        )
-        if existing:
-            return
-        bc_users_collection.update_one(
-            {"user_id": user_id},
-            {"$setOnInsert": {"user_id": user_id}},
-            upsert=True,
-        )
+        for id in tracker.store.iter_ids(tracker.name, batch_size):
+            yield {field: id}
     except Exception as e:
-        logger.error(f"İstifadəçi yaddaşa yazılarkən xəta: {e}")
-
-
-def get_served_users() -> list:
-    """Hər sənədi HƏMİŞƏ {'user_id': <id>} formatında qaytarır - köhnə
-    formatlı sənədlər (yalnız _id) də daxil olmaqla. Eyni ID üçün BİRDƏN
-    ARTIQ sənəd olsa belə (əvvəlki sxem versiyalarından qalma), nəticədə
-    hər ID YALNIZ BİR DƏFƏ görünür - bu, eyni istifadəçiyə reklamın 2-3
-    dəfə getməsinin qarşısını alır."""
-    if bc_users_collection is None:
-        return []
-    seen = set()
-    result = []
+        logger.error(f"{field} siyahısı oxunarkən xəta: {e}")
+
+
+def _count_served(tracker):
+    if tracker is None:
+        return 0
     try:
-        for doc in bc_users_collection.find({}):
-            user_id = doc.get("user_id")
-            if user_id is None:
-                user_id = doc.get("_id")
-            if user_id is not None and user_id not in seen:
-                seen.add(user_id)
-                result.append({"user_id": user_id})
+        return tracker.store.count_ids(tracker.name)
     except Exception as e:
-        logger.error(f"İstifadəçilər oxunarkən xəta: {e}")
-    return result
+        logger.error(f"Siyahının sayı oxunarkən xəta: {e}")
+        return 0
 
 
 def _log_broadcast_error(kind, entity_id, error_message):
@@ -297,54 +297,122 @@ STICKERS_OPTIONS = {
     "option_info": "BQADBAADxAIAAl9XmQABC5v3Z77VLfEC",
 }
 
+CARD_PACKS = {
+    "classic": CARDS_CLASSIC,
+    "classic_colorblind": CARDS_CLASSIC_COLORBLIND,
+}
+
 # TODO: Support multiple card packs
 # For now, just use classic colorblind
+CARD_PACK = "classic_colorblind"
+
 STICKERS = {
-    **CARDS_CLASSIC_COLORBLIND["normal"],
+    **CARD_PACKS[CARD_PACK]["normal"],
     **STICKERS_OPTIONS,
 }
 
 STICKERS_GREY = {
-    **CARDS_CLASSIC_COLORBLIND["not_playable"],
+    **CARD_PACKS[CARD_PACK]["not_playable"],
 }
 
 
 class Card(object):
-    """This class represents an UNO card"""
+    """
+    This class represents an UNO card.
 
-    def __init__(self, color, value, special=None):
-        self.color = color
-        self.value = value
-        self.special = special
+    There is exactly one instance for each of the 54 card identities (see
+    CARDS). The constructor and from_str hand out these shared instances, so
+    cards are immutable and compare, sort and hash without any string
+    formatting. The color a wild card is played as belongs to the game
+    (Game.last_color), not to the card.
+    """
 
-    def __str__(self):
-        if self.special:
-            return self.special
+    __slots__ = ('color', 'value', 'special', 'index', '_str', '_repr',
+                 '_colored_reprs')
+
+    def __new__(cls, color, value, special=None):
+        try:
+            if special:
+                return _CARDS_BY_STR[special]
+            return _CARDS_BY_KEY[(color, value)]
+        except KeyError:
+            raise ValueError('No such card: %r %r %r' % (color, value, special))
+
+    @classmethod
+    def _make(cls, color, value, special=None):
+        """Builds one of the interned instances, only used to fill CARDS"""
+        card = object.__new__(cls)
+        _set = object.__setattr__
+        _set(card, 'color', color)
+        _set(card, 'value', value)
+        _set(card, 'special', special)
+        _set(card, 'index', None)
+
+        if special:
+            name = ' '.join([s.capitalize() for s in special.split('_')])
+            _set(card, '_str', special)
+            _set(card, '_repr', COLOR_ICONS[BLACK] + name)
+            _set(card, '_colored_reprs', {
+                color: COLOR_ICONS[color] + COLOR_ICONS[BLACK] + name
+                for color in COLORS
+            })
         else:
-            return '%s_%s' % (self.color, self.value)
+            _set(card, '_str', '%s_%s' % (color, value))
+            _set(card, '_repr', COLOR_ICONS[color] + value.capitalize())
+            _set(card, '_colored_reprs', {})
+
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Card objects are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Card objects are immutable')
+
+    def __reduce__(self):
+        return from_str, (self._str,)
+
+    def __str__(self):
+        return self._str
 
     def __repr__(self):
-        if self.special:
-            return '%s%s%s' % (COLOR_ICONS.get(self.color, ''),
-                               COLOR_ICONS[BLACK],
-                               ' '.join([s.capitalize()
-                                         for s in self.special.split('_')]))
-        else:
-            return '%s%s' % (COLOR_ICONS[self.color], self.value.capitalize())
+        return self._repr
 
-    def __eq__(self, other):
-        """Needed for sorting the cards"""
-        return str(self) == str(other)
+    def colored_repr(self, color):
+        """Like repr, but shows the color a wild card was played as"""
+        return self._colored_reprs.get(color, self._repr)
+
+    def __hash__(self):
+        return self.index
 
     def __lt__(self, other):
         """Needed for sorting the cards"""
-        return str(self) < str(other)
+        return self.index < other.index
+
+
+def _build_cards():
+    cards = [Card._make(color, value) for color in COLORS for value in VALUES]
+    cards += [Card._make(None, None, special) for special in SPECIALS]
+
+    # Sort by sticker key, so the index is also the sort order
+    cards.sort(key=str)
+    for index, card in enumerate(cards):
+        object.__setattr__(card, 'index', index)
+
+    return tuple(cards)
+
+
+# All distinct cards, ordered by their index
+CARDS = _build_cards()
+
+_CARDS_BY_STR = {str(card): card for card in CARDS}
+_CARDS_BY_KEY = {(card.color, card.value): card
+                 for card in CARDS if not card.special}
 
 
 def from_str(string):
     """Decodes a Card object from a string"""
-    if string not in SPECIALS:
-        color, value = string.split('_')
-        return Card(color, value)
-    else:
-        return Card(None, None, string)
+    try:
+        return _CARDS_BY_STR[string]
+    except KeyError:
+        raise ValueError('No such card: %r' % string)
@@ -46,9 +46,20 @@ if isinstance(OPEN_LOBBY, str):
 if isinstance(ENABLE_TRANSLATIONS, str):
     ENABLE_TRANSLATIONS = ENABLE_TRANSLATIONS.lower() in ("yes", "true", "t", "1")
 
+# Oyun handler-ləri WORKERS axınlarında işləsin ki, fərqli qruplardakı
+# oyunlar paralel getsin (eyni qrupun yeniləmələri gəliş sırası ilə
+# qrupun növbəsinə düşür, bax: utils.game_serial)
+ASYNC_GAME_HANDLERS = os.getenv("ASYNC_GAME_HANDLERS", config.get("async_game_handlers", True))
+
+if isinstance(ASYNC_GAME_HANDLERS, str):
+    ASYNC_GAME_HANDLERS = ASYNC_GAME_HANDLERS.lower() in ("yes", "true", "t", "1")
+
 DEFAULT_GAMEMODE = os.getenv("DEFAULT_GAMEMODE", config.get("default_gamemode", "fast"))
 MIN_PLAYERS = int(os.getenv("MIN_PLAYERS", config.get("min_players", 2)))
 
+# DEBUG səviyyəsində oyun mühərriki hər kartı loglayır
+LOG_LEVEL = os.getenv("LOG_LEVEL", config.get("log_level", "INFO")).upper()
+
 # =======================================================
 # MongoDB (bütün data - statistika/reytinq/broadcast - burada saxlanılır)
 # =======================================================
@@ -56,6 +67,97 @@ MIN_PLAYERS = int(os.getenv("MIN_PLAYERS", config.get("min_players", 2)))
 # Təhlükəsizlik üçün bağlantı sətri koda yazılmır.
 MONGO_URL = os.getenv("MONGO", config.get("mongo_url"))
 
+# Məlumatların harada saxlanılacağı: "mongo", "sqlite" (SQLITE_PATH
+# faylında) və ya "memory" (bot dayananda itir - test/benchmark üçün)
+STORAGE = os.getenv("STORAGE", config.get("storage", "mongo")).lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", config.get("sqlite_path", "uno.sqlite3"))
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", config.get("mongo_db_name", "uno_bot_db"))
+
+# Bağlantı hovuzu: WORKERS handler axını + fon yazıcıları üçün bir neçə
+# əlavə bağlantı. Vaxt limitləri millisaniyədir (socket üçün 0 - limitsiz).
+MONGO_POOL_SIZE = int(os.getenv("MONGO_POOL_SIZE", config.get("mongo_pool_size", WORKERS + 8)))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", config.get("mongo_min_pool_size", 0)))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", config.get("mongo_timeout_ms", 5000)))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", config.get("mongo_socket_timeout_ms", 20000)))
+# Write concern ("1", "majority", ...) və sıxılma ("zlib", "zstd,zlib", ...
+# boş - sıxılma yoxdur)
+MONGO_WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", config.get("mongo_write_concern", "1"))
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", config.get("mongo_compressors", "zlib"))
+# Hovuzun istifadəsi (database.pool_stats) bu qədər saniyədən bir log-a
+# yazılır, 0 - yalnız bot dayananda. Adminlər /dbstats ilə də baxa bilər.
+MONGO_STATS_INTERVAL = float(os.getenv("MONGO_STATS_INTERVAL", config.get("mongo_stats_interval", 600)))
+
+# UserSetting dəyişiklikləri bu qədər saniyədən bir (və ya bu qədər
+# istifadəçi yığılanda) toplu şəkildə yazılır
+SETTINGS_FLUSH_SECONDS = float(os.getenv("SETTINGS_FLUSH_SECONDS", config.get("settings_flush_seconds", 5)))
+SETTINGS_FLUSH_SIZE = int(os.getenv("SETTINGS_FLUSH_SIZE", config.get("settings_flush_size", 500)))
+
+# Oxunmuş UserSetting sənədləri bu qədər saniyə və ən çox bu qədər
+# istifadəçi üçün yaddaşda saxlanılır
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", config.get("settings_cache_ttl", 300)))
+SETTINGS_CACHE_SIZE = int(os.getenv("SETTINGS_CACHE_SIZE", config.get("settings_cache_size", 10000)))
+
+# Oynanan kartların sayı yaddaşda yığılır və bu qədər saniyədən bir
+# yazılır; yazılmamış saylar bu faylda saxlanılır
+CARDS_FLUSH_SECONDS = float(os.getenv("CARDS_FLUSH_SECONDS", config.get("cards_flush_seconds", 10)))
+CARDS_SPILL_FILE = os.getenv("CARDS_SPILL_FILE", config.get("cards_spill_file", "cards_played.spill.json"))
+
+# Broadcast siyahısı üçün yaddaşda saxlanılan tanınmış ID-lərin sayı, ondan
+# sonrakı ID-lər üçün Bloom filtrinin tutumu (0 - BROADCAST_KNOWN_MAX qədər)
+# və yeni ID-lərin toplu yazılma intervalı
+BROADCAST_KNOWN_MAX = int(os.getenv("BROADCAST_KNOWN_MAX", config.get("broadcast_known_max", 1000000)))
+BROADCAST_BLOOM_CAPACITY = int(os.getenv("BROADCAST_BLOOM_CAPACITY", config.get("broadcast_bloom_capacity", 0)))
+BROADCAST_FLUSH_SECONDS = float(os.getenv("BROADCAST_FLUSH_SECONDS", config.get("broadcast_flush_seconds", 5)))
+
+# Oyunları bu qədər prosesə bölmək (bax: shards.py). 1-dən çox olduqda
+# əsas proses yalnız yeniləmələri qəbul edib qrupun prosesinə ötürür.
+# Proseslər ortaq backend (mongo və ya sqlite) istifadə etməlidir -
+# STORAGE=memory ilə bot başlamır (bax: shards.main).
+SHARDS = int(os.getenv("SHARDS", config.get("shards", 1)))
+
+# Yeniləmələrin qəbulu: WEBHOOK_URL boşdursa long polling, əks halda
+# webhook. Telegram yeniləmələri WEBHOOK_URL-ə göndərir, reverse proxy isə
+# onları WEBHOOK_LISTEN:WEBHOOK_PORT ünvanına, WEBHOOK_PATH yoluna ötürür.
+# WEBHOOK_SECRET verilibsə, bu başlığı olmayan sorğular rədd edilir.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", config.get("webhook_url", ""))
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", config.get("webhook_listen", "127.0.0.1"))
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", config.get("webhook_port", 8080)))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", config.get("webhook_path", "/webhook"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", config.get("webhook_secret", ""))
+# Telegram-ın webhook-a eyni anda açdığı bağlantıların maksimumu (1-100)
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", config.get("webhook_max_connections", 40)))
+# Emal olunmağı gözləyən yeniləmələrin maksimumu; növbə doludursa webhook
+# 503 qaytarır və Telegram yeniləməni sonra yenidən göndərir, shard isə
+# ingress-i gözlədir
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", config.get("update_queue_size", 1000)))
+
+# Göndərilən mesajlar növbəsi (bax: outbox.py). Telegram-ın limitlərinə
+# uyğun: bütün bot üzrə saniyədə OUTBOX_GLOBAL_RATE mesaj, bir qrupa
+# dəqiqədə OUTBOX_GROUP_RATE mesaj (OUTBOX_GROUP_BURST-ə qədəri dərhal),
+# şəxsi söhbətə saniyədə OUTBOX_PRIVATE_RATE mesaj, /broadcast üçün isə
+# saniyədə ən çox OUTBOX_BROADCAST_RATE mesaj. 0 - limit yoxdur.
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", config.get("outbox_global_rate", 30)))
+OUTBOX_GROUP_RATE = float(os.getenv("OUTBOX_GROUP_RATE", config.get("outbox_group_rate", 20)))
+OUTBOX_GROUP_BURST = int(os.getenv("OUTBOX_GROUP_BURST", config.get("outbox_group_burst", 20)))
+OUTBOX_PRIVATE_RATE = float(os.getenv("OUTBOX_PRIVATE_RATE", config.get("outbox_private_rate", 1)))
+OUTBOX_PRIVATE_BURST = int(os.getenv("OUTBOX_PRIVATE_BURST", config.get("outbox_private_burst", 3)))
+OUTBOX_BROADCAST_RATE = float(os.getenv("OUTBOX_BROADCAST_RATE", config.get("outbox_broadcast_rate", 5)))
+# Növbədəki mesajların maksimumu (broadcast ən çox yarısını tuta bilər) və
+# mesajları göndərən axınların sayı
+OUTBOX_MAX_PENDING = int(os.getenv("OUTBOX_MAX_PENDING", config.get("outbox_max_pending", 5000)))
+OUTBOX_SENDERS = int(os.getenv("OUTBOX_SENDERS", config.get("outbox_senders", 8)))
+
+# Oyunu bitirmə yerinə görə verilən xallar: 1-ci yer, 2-ci yer, ...
+# (siyahıdan kənar yerlər və oyunu tərk edənlər 0 xal alır)
+PLACE_POINTS = os.getenv("PLACE_POINTS", config.get("place_points", [10, 6, 4, 2]))
+if isinstance(PLACE_POINTS, str):
+    PLACE_POINTS = [int(x) for x in PLACE_POINTS.split(",") if x.strip()]
+PLACE_POINTS = tuple(int(x) for x in PLACE_POINTS)
+
+# Köhnə "profiles" kolleksiyası user_settings-ə bu ölçülü partiyalarla
+# köçürülür
+PROFILES_MIGRATION_BATCH = int(os.getenv("PROFILES_MIGRATION_BATCH", config.get("profiles_migration_batch", 500)))
+
 # /broadcast əmrini yalnız bu Telegram ID-lərindəki şəxslər işlədə bilər
 SUDO_USERS = os.getenv("SUDO_USERS", config.get("sudo_users", ""))
 if isinstance(SUDO_USERS, str):
@@ -22,9 +22,41 @@ from random import shuffle
 import logging
 
 import card as c
+import engine_log
 from card import Card
 from errors import DeckEmptyError
 
+logger = logging.getLogger(__name__)
+
+
+def _classic_cards():
+    # The classic card set
+    cards = list()
+    for color in c.COLORS:
+        for value in c.VALUES:
+            cards.append(Card(color, value))
+            if not value == c.ZERO:
+                cards.append(Card(color, value))
+    for special in c.SPECIALS:
+        cards.extend([Card(None, None, special=special)] * 4)
+    return tuple(cards)
+
+
+def _wild_cards():
+    # The wild card set
+    cards = list()
+    for color in c.COLORS:
+        for value in c.WILD_VALUES:
+            cards.extend([Card(color, value)] * 4)
+    for special in c.SPECIALS:
+        cards.extend([Card(None, None, special=special)] * 6)
+    return tuple(cards)
+
+
+# Cards are shared, so every new deck is just a copy of one of these
+CLASSIC_CARDS = _classic_cards()
+WILD_CARDS = _wild_cards()
+
 
 class Deck(object):
     """ This class represents a deck of cards """
@@ -32,57 +64,67 @@ class Deck(object):
     def __init__(self):
         self.cards = list()
         self.graveyard = list()
-        self.logger = logging.getLogger(__name__)
-
-        self.logger.debug(self.cards)
 
     def shuffle(self):
         """Shuffles the deck"""
-        self.logger.debug("Kartları qarışdırır")
+        if engine_log.debug:
+            logger.debug("Kartları qarışdırır")
         shuffle(self.cards)
 
     def draw(self):
         """Draws a card from this deck"""
-        try:
-            card = self.cards.pop()
-            self.logger.debug("Kart Götürülür" + str(card))
-            return card
-        except IndexError:
-            if len(self.graveyard):
-                while len(self.graveyard):
-                    self.cards.append(self.graveyard.pop())
-                self.shuffle()
-                return self.draw()
-            else:
+        if not self.cards:
+            self._reshuffle_graveyard_()
+
+        card = self.cards.pop()
+        if engine_log.debug:
+            logger.debug("Kart Götürülür %s", card)
+        return card
+
+    def draw_many(self, amount):
+        """
+        Draws several cards from this deck, in the order draw would return
+        them. The graveyard is shuffled back in at most once. If there are
+        still not enough cards, no card is drawn and DeckEmptyError is raised.
+        """
+        if amount <= 0:
+            return list()
+
+        if amount > len(self.cards):
+            self._reshuffle_graveyard_()
+            if amount > len(self.cards):
                 raise DeckEmptyError()
 
+        cards = self.cards[-amount:]
+        del self.cards[-amount:]
+        cards.reverse()
+
+        if engine_log.debug:
+            logger.debug("%d kart götürülür", amount)
+        return cards
+
+    def _reshuffle_graveyard_(self):
+        # Put the shuffled graveyard below the cards that are left
+        if not self.graveyard:
+            raise DeckEmptyError()
+
+        cards = self.graveyard
+        shuffle(cards)
+        cards.extend(self.cards)
+
+        self.cards = cards
+        self.graveyard = list()
+
     def dismiss(self, card):
         """Returns a card to the deck"""
-        if card.special:
-            card.color = None
         self.graveyard.append(card)
 
     def _fill_classic_(self):
         # Fill deck with the classic card set
-        self.cards.clear()
-        for color in c.COLORS:
-            for value in c.VALUES:
-                self.cards.append(Card(color, value))
-                if not value == c.ZERO:
-                    self.cards.append(Card(color, value))
-        for special in c.SPECIALS:
-            for _ in range(4):
-                self.cards.append(Card(None, None, special=special))
+        self.cards[:] = CLASSIC_CARDS
         self.shuffle()
 
     def _fill_wild_(self):
         # Fill deck with a wild card set
-        self.cards.clear()
-        for color in c.COLORS:
-            for value in c.WILD_VALUES:
-                for _ in range(4):
-                    self.cards.append(Card(color, value))
-        for special in c.SPECIALS:
-            for _ in range(6):
-                self.cards.append(Card(None, None, special=special))
+        self.cards[:] = WILD_CARDS
         self.shuffle()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Logging for the game engine.
+
+The engine logs something for every card that is checked, drawn or played.
+Those calls are wrapped in ``if engine_log.debug:``, so while debug logging
+is off no message is formatted and no logger is asked. Call refresh() after
+changing log levels at runtime.
+
+start_listener() moves the handlers of the root logger behind a queue, so
+the threads that handle updates never wait for log output.
+"""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Modules that check the debug flag
+ENGINE_LOGGERS = ('card', 'deck', 'game', 'hand', 'player', 'playability')
+
+debug = False
+
+_listener = None
+
+
+def refresh():
+    """Updates the debug flag from the levels of the engine loggers"""
+    global debug
+    debug = any(logging.getLogger(name).isEnabledFor(logging.DEBUG)
+                for name in ENGINE_LOGGERS)
+    return debug
+
+
+def start_listener():
+    """
+    Replaces the handlers of the root logger with a QueueHandler and writes
+    the records with the old handlers in a listener thread
+    """
+    global _listener
+
+    root = logging.getLogger()
+    if _listener or not root.handlers:
+        return
+
+    handlers = list(root.handlers)
+    for handler in handlers:
+        root.removeHandler(handler)
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, *handlers,
+                              respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_listener)
+
+
+def stop_listener():
+    """Writes the records that are still queued and restores the handlers"""
+    global _listener
+
+    if not _listener:
+        return
+
+    listener, _listener = _listener, None
+    listener.stop()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+
+    for handler in listener.handlers:
+        root.addHandler(handler)
+
+
+def setup(level=logging.INFO, fmt=None):
+    """Configures logging for the bot and starts the listener thread"""
+    logging.basicConfig(format=fmt, level=level)
+    start_listener()
+    refresh()
@@ -23,12 +23,15 @@ from config import ADMIN_LIST, OPEN_LOBBY, DEFAULT_GAMEMODE, ENABLE_TRANSLATIONS
 from datetime import datetime
 
 from deck import Deck
+from game_stats import GameStats
 import card as c
+import engine_log
+
+logger = logging.getLogger(__name__)
+
 
 class Game(object):
     """ This class represents a game of UNO """
-    current_player = None
-    reversed = False
     choosing_color = False
     started = False
     draw_counter = 0
@@ -43,10 +46,21 @@ class Game(object):
     def __init__(self, chat):
         self.chat = chat
         self.last_card = None
+        self.last_color = None
 
-        self.deck = Deck()
+        # Players in seating order, the index of the current player and
+        # the direction of play (1 or -1)
+        self.seats = list()
+        self.current_seat = None
+        self.direction = 1
+        self._players = tuple()
 
-        self.logger = logging.getLogger(__name__)
+        # Increased whenever something changes that players can see, so
+        # the inline results of a player can be cached until then
+        self.version = 0
+
+        self.deck = Deck()
+        self.stats = GameStats()
 
         # 🟢 Qeydiyyat (lobby) menyusu üçün
         self.lobby_message_id = None
@@ -60,18 +74,82 @@ class Game(object):
 
     @property
     def players(self):
-        """Returns a list of all players in this game"""
-        players = list()
-        if not self.current_player:
-            return players
-
-        current_player = self.current_player
-        itplayer = current_player.next
-        players.append(current_player)
-        while itplayer and itplayer != current_player:
-            players.append(itplayer)
-            itplayer = itplayer.next
-        return players
+        """
+        Returns all players in this game in seating order. The tuple is only
+        rebuilt when a player joins or leaves.
+        """
+        return self._players
+
+    @property
+    def current_player(self):
+        if not self.seats:
+            return None
+        return self.seats[self.current_seat]
+
+    @property
+    def reversed(self):
+        return self.direction < 0
+
+    def turn_order(self):
+        """Returns all players, starting with the current one"""
+        seats = self.seats
+        seat = self.current_seat
+        if not seats:
+            return list()
+        if self.direction > 0:
+            return seats[seat:] + seats[:seat]
+        return seats[seat::-1] + seats[:seat:-1]
+
+    def add_player(self, player):
+        """Seats a new player behind the current player"""
+        seats = self.seats
+        if not seats:
+            seats.append(player)
+            self.current_seat = 0
+        elif self.direction < 0:
+            seats.insert(self.current_seat + 1, player)
+        elif self.current_seat:
+            seats.insert(self.current_seat, player)
+            self.current_seat += 1
+        else:
+            seats.append(player)
+
+        self._update_seats()
+
+    def remove_player(self, player):
+        """
+        Removes a player from the seating order. If it was their turn, the
+        next player becomes the current player.
+        """
+        seat = player.seat
+        del self.seats[seat]
+
+        if seat < self.current_seat:
+            self.current_seat -= 1
+        elif seat == self.current_seat and self.seats:
+            if self.direction < 0:
+                self.current_seat -= 1
+            self.current_seat %= len(self.seats)
+
+        player.seat = None
+        self._update_seats()
+
+    def _update_seats(self):
+        for seat, player in enumerate(self.seats):
+            player.seat = seat
+        self._players = tuple(self.seats)
+        self.version += 1
+
+    @property
+    def last_card(self):
+        return self._last_card
+
+    @last_card.setter
+    def last_card(self, card):
+        # Cards are shared between games, so the color a wild card is
+        # played as lives here and is set by choose_color
+        self._last_card = card
+        self.last_color = card.color if card else None
 
     def start(self):
         if self.mode == None or self.mode != "wild":
@@ -82,22 +160,29 @@ class Game(object):
         self._first_card_()
         self.started = True
         self.last_activity = datetime.now()
+        self.version += 1
 
     def set_mode(self, mode):
         self.mode = mode
+        self.version += 1
 
     def reverse(self):
         """Reverses the direction of game"""
-        self.reversed = not self.reversed
+        self.direction = -self.direction
+        self.version += 1
 
     def turn(self):
         """Marks the turn as over and change the current player"""
-        self.logger.debug("Növbəti Oyunçu")
-        self.current_player = self.current_player.next
-        self.current_player.drew = False
-        self.current_player.turn_started = datetime.now()
+        if engine_log.debug:
+            logger.debug("Növbəti Oyunçu")
+        self.current_seat = ((self.current_seat + self.direction) %
+                             len(self.seats))
+        current_player = self.seats[self.current_seat]
+        current_player.drew = False
+        current_player.turn_started = datetime.now()
         self.choosing_color = False
         self.last_activity = datetime.now()
+        self.version += 1
 
     def _first_card_(self):
         # In case that the player did not select a game mode
@@ -121,19 +206,24 @@ class Game(object):
         """
         self.deck.dismiss(self.last_card)
         self.last_card = card
+        self.version += 1
+
+        if engine_log.debug:
+            logger.debug("Oynanılan kart %r", card)
 
-        self.logger.info("Oynanılan kart " + repr(card))
         if card.value == c.SKIP:
             self.turn()
         elif card.special == c.DRAW_FOUR:
             self.draw_counter += 4
-            self.logger.debug("Götürülən kartların sayı 4 ə artırıldı")
+            if engine_log.debug:
+                logger.debug("Götürülən kartların sayı 4 ə artırıldı")
         elif card.value == c.DRAW_TWO:
             self.draw_counter += 2
-            self.logger.debug("Götürülən kartların sayı 2 ə artırıldı")
+            if engine_log.debug:
+                logger.debug("Götürülən kartların sayı 2 ə artırıldı")
         elif card.value == c.REVERSE:
             # Special rule for two players
-            if self.current_player == self.current_player.next.next:
+            if len(self.seats) <= 2:
                 self.turn()
             else:
                 self.reverse()
@@ -142,10 +232,11 @@ class Game(object):
         if card.special not in (c.CHOOSE, c.DRAW_FOUR):
             self.turn()
         else:
-            self.logger.debug("Rəng Seçilir...")
+            if engine_log.debug:
+                logger.debug("Rəng Seçilir...")
             self.choosing_color = True
 
     def choose_color(self, color):
         """Carries out the color choosing and turns the game"""
-        self.last_card.color = color
+        self.last_color = color
         self.turn()
@@ -19,15 +19,26 @@
 
 
 import logging
+import threading
+from weakref import WeakValueDictionary
 
 from game import Game
 from player import Player
 from errors import (AlreadyJoinedError, LobbyClosedError, NoGameInChatError,
                     NotEnoughPlayersError)
 from promotions import send_promotion_async
+from result_cache import cache as result_cache
 
 class GameManager(object):
-    """ Manages all running games by using a confusing amount of dicts """
+    """
+    Manages all running games by using a confusing amount of dicts
+
+    Everything that changes a game runs while holding the lock of its chat,
+    see chat_lock and utils.game_serial, so games in different chats are
+    played in parallel. The dicts below are shared by all chats and are only
+    changed under self._lock, which is never held while waiting for a chat
+    lock.
+    """
 
     def __init__(self):
         self.chatid_games = dict()
@@ -35,50 +46,81 @@ class GameManager(object):
         self.userid_current = dict()
         self.remind_dict = dict()
 
+        # Indexes for the lookups done on every update. They are kept in
+        # sync by new_game, join_game, leave_game, end_game and remove_game.
+        self.user_chat_players = dict()  # (user_id, chat_id) -> Player
+        self.chatid_active = dict()  # chat_id -> newest game in the chat
+        self.running_games = set()
+
+        # Called with (user_id, chat_id or None) whenever the game a user
+        # plays in inline mode changes, under self._lock
+        self.current_listeners = list()
+
+        self._lock = threading.RLock()
+        self._chat_locks = WeakValueDictionary()
+        self._chat_locks_lock = threading.Lock()
+
         self.logger = logging.getLogger(__name__)
 
+    def chat_lock(self, chat_id):
+        """ The lock that serializes all changes to the games of a chat """
+        with self._chat_locks_lock:
+            lock = self._chat_locks.get(chat_id)
+            if lock is None:
+                lock = self._chat_locks[chat_id] = threading.RLock()
+            return lock
+
+    def set_current(self, user_id, player):
+        """ Selects the game a user plays in inline mode, None to clear it """
+        with self._lock:
+            if player is None:
+                self.userid_current.pop(user_id, None)
+            else:
+                self.userid_current[user_id] = player
+
+            for listener in self.current_listeners:
+                listener(user_id, player.game.chat.id if player else None)
+
     def new_game(self, chat):
         """
         Create a new game in this chat
         """
         chat_id = chat.id
 
-        self.logger.debug("Yeni Oyun yaradılır bu Qrupda  " + str(chat_id))
+        self.logger.debug("Yeni Oyun yaradılır bu Qrupda %s", chat_id)
         game = Game(chat)
 
-        if chat_id not in self.chatid_games:
-            self.chatid_games[chat_id] = list()
+        with self._lock:
+            if chat_id not in self.chatid_games:
+                self.chatid_games[chat_id] = list()
 
-        # remove old games
-        for g in list(self.chatid_games[chat_id]):
-            if not g.players:
-                self.chatid_games[chat_id].remove(g)
+            # remove old games
+            for g in list(self.chatid_games[chat_id]):
+                if not g.players:
+                    self.chatid_games[chat_id].remove(g)
+                    self.running_games.discard(g)
 
-        self.chatid_games[chat_id].append(game)
+            self.chatid_games[chat_id].append(game)
+            self.chatid_active[chat_id] = game
+            self.running_games.add(game)
         return game
 
     def join_game(self, user, chat):
         """ Create a player from the Telegram user and add it to the game """
-        self.logger.info("Joining game with id " + str(chat.id))
+        self.logger.info("Joining game with id %s", chat.id)
 
-        try:
-            game = self.chatid_games[chat.id][-1]
-        except (KeyError, IndexError):
+        game = self.chatid_active.get(chat.id)
+        if game is None:
             raise NoGameInChatError()
 
         if not game.open:
             raise LobbyClosedError()
 
-        if user.id not in self.userid_players:
-            self.userid_players[user.id] = list()
-
-        players = self.userid_players[user.id]
-
         # Don not re-add a player and remove the player from previous games in
         # this chat, if he is in one of them
-        for player in players:
-            if player in game.players:
-                raise AlreadyJoinedError()
+        player = self.user_chat_players.get((user.id, chat.id))
+        if player and player.game is game:
+            raise AlreadyJoinedError()
 
         try:
             self.leave_game(user, chat)
@@ -87,35 +129,25 @@ class GameManager(object):
         except NotEnoughPlayersError:
             self.end_game(chat, user)
 
-            if user.id not in self.userid_players:
-                self.userid_players[user.id] = list()
-
-            players = self.userid_players[user.id]
-
         player = Player(game, user)
         if game.started:
             player.draw_first_hand()
 
-        players.append(player)
-        self.userid_current[user.id] = player
+        # Load the player's career totals now, so the final standings can be
+        # rendered from the cache without waiting on the database
+        game.stats.joined(user.id)
+
+        with self._lock:
+            self.userid_players.setdefault(user.id, list()).append(player)
+            self.set_current(user.id, player)
+            self.user_chat_players[user.id, chat.id] = player
 
     def leave_game(self, user, chat):
         """ Remove a player from its current game """
 
         player = self.player_for_user_in_chat(user, chat)
-        players = self.userid_players.get(user.id, list())
 
         if not player:
-            games = self.chatid_games[chat.id]
-            for g in games:
-                for p in g.players:
-                    if p.user.id == user.id:
-                        if p == g.current_player:
-                            g.turn()
-
-                        p.leave()
-                        return
-
             raise NoGameInChatError
 
         game = player.game
@@ -127,22 +159,27 @@ class GameManager(object):
             game.turn()
 
         player.leave()
-        players.remove(player)
+        result_cache.evict_player(player)
 
-        # If this is the selected game, switch to another
-        if self.userid_current.get(user.id, None) is player:
-            if players:
-                self.userid_current[user.id] = players[0]
-            else:
-                del self.userid_current[user.id]
-                del self.userid_players[user.id]
+        with self._lock:
+            players = self.userid_players.get(user.id, list())
+            players.remove(player)
+            del self.user_chat_players[user.id, chat.id]
+
+            # If this is the selected game, switch to another
+            if self.userid_current.get(user.id, None) is player:
+                if players:
+                    self.set_current(user.id, players[0])
+                else:
+                    self.set_current(user.id, None)
+                    del self.userid_players[user.id]
 
     def end_game(self, chat, user):
         """
         End a game
         """
 
-        self.logger.info("Qrupdaki Oyun" + str(chat.id) + " bitdi")
+        self.logger.info("Qrupdaki Oyun %s bitdi", chat.id)
         send_promotion_async(chat, chance=0.15)
 
         # Find the correct game instance to end
@@ -151,41 +188,65 @@ class GameManager(object):
         if not player:
             raise NoGameInChatError
 
-        game = player.game
+        self.remove_game(player.game)
 
-        # Clear game
-        for player_in_game in game.players:
-            this_users_players = \
-                self.userid_players.get(player_in_game.user.id, list())
+    def remove_game(self, game):
+        """
+        Remove a game and all of its players without any further
+        notifications, e.g. when a lobby times out
+        """
+        chat_id = game.chat.id
 
-            try:
-                this_users_players.remove(player_in_game)
-            except ValueError:
-                pass
+        with self._lock:
+            # Clear game
+            for player_in_game in game.players:
+                user_id = player_in_game.user.id
+                this_users_players = self.userid_players.get(user_id, list())
 
-            if this_users_players:
                 try:
-                    self.userid_current[player_in_game.user.id] = this_users_players[0]
-                except KeyError:
+                    this_users_players.remove(player_in_game)
+                except ValueError:
                     pass
+
+                if self.user_chat_players.get((user_id, chat_id)) is \
+                        player_in_game:
+                    del self.user_chat_players[user_id, chat_id]
+
+                if this_users_players:
+                    self.set_current(user_id, this_users_players[0])
+                else:
+                    self.userid_players.pop(user_id, None)
+                    self.set_current(user_id, None)
+
+            self.running_games.discard(game)
+
+            games = self.chatid_games.get(chat_id, list())
+            if game in games:
+                games.remove(game)
+
+            if games:
+                self.chatid_active[chat_id] = games[-1]
             else:
-                try:
-                    del self.userid_players[player_in_game.user.id]
-                except KeyError:
-                    pass
+                self.chatid_games.pop(chat_id, None)
+                self.chatid_active.pop(chat_id, None)
 
-                try:
-                    del self.userid_current[player_in_game.user.id]
-                except KeyError:
-                    pass
+        result_cache.evict_game(game)
+        # Also write the results of games that were ended early
+        game.stats.end()
 
-        self.chatid_games[chat.id].remove(game)
-        if not self.chatid_games[chat.id]:
-            del self.chatid_games[chat.id]
+    def games_by_chat(self):
+        """ A snapshot of (chat_id, games) for all chats with games """
+        with self._lock:
+            return [(chat_id, list(games))
+                    for chat_id, games in self.chatid_games.items()]
 
     def player_for_user_in_chat(self, user, chat):
-        players = self.userid_players.get(user.id, list())
-        for player in players:
-            if player.game.chat.id == chat.id:
-                return player
-        return None
+        return self.user_chat_players.get((user.id, chat.id))
+
+    def active_game(self, chat_id):
+        """ Returns the newest game in this chat, or None """
+        return self.chatid_active.get(chat_id)
+
+    def is_running(self, game):
+        """ Returns False once a game has been ended or removed """
+        return game in self.running_games
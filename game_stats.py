@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Oyun ərzində oyunçuların nəticələrini (oynadığı oyun, qələbə, ad)
+yaddaşda yığır, oynanan kartları isə CardCounter-ə ötürür. Oyunçu oyundan çıxanda və ya oyun bitəndə
+commit() onları StatsWriter-ə verir, o da hamısını bir ardıcıl bulk_write
+ilə fonda yazır - kart oynama və final sıralama mesajı Mongo-nu gözləmir.
+"""
+
+import threading
+from collections import Counter, OrderedDict
+
+import user_setting
+from levels import place_points
+
+
+class GameStats(object):
+    """Bir oyunun oyunçularının nəticələri"""
+
+    def __init__(self):
+        self.results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _result(self, user_id):
+        result = self.results.get(user_id)
+        if result is None:
+            result = self.results[user_id] = [Counter(), None]
+        return result
+
+    def joined(self, user_id):
+        """
+        Oyunçunun sənədini keşə yükləyir ki, final sıralama (UserSetting.peek)
+        onun əvvəlki qələbələrini bazaya getmədən tapsın
+        """
+        user_setting.UserSetting.get(id=user_id)
+
+    def card_played(self, user_id):
+        # Kartlar oyundan asılı olmayaraq CardCounter-də sayılır
+        if user_setting.card_counter is not None:
+            user_setting.card_counter.add(user_id)
+
+    def finished(self, user_id, name, place=None):
+        """
+        Oyunçu oyunu `place`-ci yerdə bitirdi (1 - qələbə) və ya tərk etdi
+        (place=None - xal yoxdur). Xallar qələbə ilə eyni yazıya düşür.
+        """
+        with self._lock:
+            result = self._result(user_id)
+            result[0]["games_played"] += 1
+            if place == 1:
+                result[0]["first_places"] += 1
+            points = place_points(place)
+            if points:
+                result[0]["total_points"] += points
+            result[1] = name
+
+    def take(self, user_ids=None):
+        """Yığılmış nəticələri (id, artımlar, ad) kimi qaytarır və silir"""
+        with self._lock:
+            if user_ids is None:
+                user_ids = list(self.results)
+
+            taken = list()
+            for user_id in user_ids:
+                result = self.results.pop(user_id, None)
+                if result and (result[0] or result[1]):
+                    taken.append((user_id, dict(result[0]), result[1]))
+            return taken
+
+    def commit(self, user_ids=None):
+        """Nəticələri yazılmağa göndərir, Mongo-nu gözləmir"""
+        taken = self.take(user_ids)
+        if taken and user_setting.stats_writer is not None:
+            user_setting.stats_writer.submit(taken)
+
+    def end(self):
+        """Oyun bitdi: hər şeyi, oynanmış kartlar da daxil, yazmağa göndərir"""
+        self.commit()
+        if user_setting.card_counter is not None:
+            user_setting.card_counter.request_flush()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import card as c
+
+
+class Hand(object):
+    """
+    This class represents the cards in a player's hand.
+    Instead of a list of cards, it keeps a count for each of the card
+    identities in card.CARDS, so adding and removing a card is O(1) and
+    iterating over the hand always yields the cards in sorted order.
+    The card that was added last is remembered, because after drawing a
+    player may only play the card they drew. The version is increased on
+    every change.
+    """
+
+    __slots__ = ('counts', 'last', 'version', '_size')
+
+    def __init__(self, cards=()):
+        self.counts = [0] * len(c.CARDS)
+        self.last = None
+        self.version = 0
+        self._size = 0
+        self.extend(cards)
+
+    def add(self, card):
+        """Adds a card to the hand"""
+        self.counts[card.index] += 1
+        self._size += 1
+        self.last = card
+        self.version += 1
+
+    def extend(self, cards):
+        """Adds several cards to the hand"""
+        for card in cards:
+            self.add(card)
+
+    def remove(self, card):
+        """Removes one copy of a card, raises ValueError if there is none"""
+        counts = self.counts
+        if not counts[card.index]:
+            raise ValueError('%r is not in the hand' % card)
+
+        counts[card.index] -= 1
+        self._size -= 1
+        self.version += 1
+        if card is self.last and not counts[card.index]:
+            self.last = None
+
+    def clear(self):
+        """Removes all cards from the hand"""
+        self.counts = [0] * len(c.CARDS)
+        self.last = None
+        self._size = 0
+        self.version += 1
+
+    def count(self, card):
+        """Returns how many copies of a card are in the hand"""
+        return self.counts[card.index]
+
+    def items(self):
+        """Yields (card, count) for each distinct card, in sorted order"""
+        for card, count in zip(c.CARDS, self.counts):
+            if count:
+                yield card, count
+
+    def distinct(self):
+        """Yields each distinct card once, in sorted order"""
+        for card, count in zip(c.CARDS, self.counts):
+            if count:
+                yield card
+
+    def __iter__(self):
+        for card, count in zip(c.CARDS, self.counts):
+            for _ in range(count):
+                yield card
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, card):
+        return bool(self.counts[card.index])
+
+    def __repr__(self):
+        return 'Hand(%r)' % list(self)
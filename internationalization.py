@@ -19,6 +19,8 @@
 
 
 import gettext
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import wraps
 
 from locales import available_locales
@@ -27,6 +29,11 @@ from shared_vars import gm
 
 GETTEXT_DOMAIN = 'unobot'
 GETTEXT_DIR = 'locales'
+DEFAULT_LOCALE = 'en_US'
+
+# Every thread (and every context copied into a worker) has its own stack.
+# The stacks are tuples, so a copied context never shares a list.
+_locale_stack = ContextVar('locale_stack', default=())
 
 
 class _Underscore(object):
@@ -42,27 +49,43 @@ class _Underscore(object):
             in available_locales.keys()
             if locale != 'en_US'  # No translation file for az_Az
         }
-        self.locale_stack = list()
+
+    @property
+    def locale_stack(self):
+        """The locales of the current thread or context, newest last"""
+        return _locale_stack.get()
 
     def push(self, locale):
-        self.locale_stack.append(locale)
+        _locale_stack.set(_locale_stack.get() + (locale,))
 
     def pop(self):
-        if self.locale_stack:
-            return self.locale_stack.pop()
+        stack = _locale_stack.get()
+        if stack:
+            _locale_stack.set(stack[:-1])
+            return stack[-1]
         else:
             return None
 
+    @contextmanager
+    def using(self, *locales):
+        """Pushes the locales for the duration of the block"""
+        token = _locale_stack.set(_locale_stack.get() + locales)
+        try:
+            yield
+        finally:
+            _locale_stack.reset(token)
+
     @property
     def code(self):
-        if self.locale_stack:
-            return self.locale_stack[-1]
+        stack = _locale_stack.get()
+        if stack:
+            return stack[-1]
         else:
             return None
 
     def __call__(self, singular, plural=None, n=1, locale=None):
         if not locale:
-            locale = self.locale_stack[-1]
+            locale = self.code or DEFAULT_LOCALE
 
         if locale not in self.translators.keys():
             if n == 1:
@@ -105,13 +128,12 @@ def user_locale(func):
         us = UserSetting.get(id=user.id)
 
         if us and us.lang != 'en':
-            _.push(us.lang)
+            locale = us.lang
         else:
-            _.push('en_US')
+            locale = DEFAULT_LOCALE
 
-        result = func(update, context, *pargs, **kwargs)
-        _.pop()
-        return result
+        with _.using(locale):
+            return func(update, context, *pargs, **kwargs)
     return wrapped
 
 
@@ -119,7 +141,7 @@ def game_locales(func):
     @wraps(func)
     def wrapped(update, context, *pargs, **kwargs):
         user, chat = _user_chat_from_update(update)
-        player = gm.player_for_user_in_chat(user, chat)
+        player = gm.player_for_user_in_chat(user, chat) if chat else None
         locales = list()
 
         if player:
@@ -129,20 +151,32 @@ def game_locales(func):
                 if us and us.lang != 'en':
                     loc = us.lang
                 else:
-                    loc = 'en_US'
+                    loc = DEFAULT_LOCALE
 
                 if loc in locales:
                     continue
 
-                _.push(loc)
                 locales.append(loc)
 
-        result = func(update, context, *pargs, **kwargs)
+        with _.using(*locales):
+            return func(update, context, *pargs, **kwargs)
+    return wrapped
+
 
-        while _.code:
-            _.pop()
+def carry_locales(func):
+    """
+    Binds func to the locales of the caller, so it translates the same way
+    when it runs later in another thread, e.g. through dispatcher.run_async
+    """
+    locales = _.locale_stack
 
-        return result
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        token = _locale_stack.set(locales)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _locale_stack.reset(token)
     return wrapped
 
 
@@ -150,7 +184,11 @@ def _user_chat_from_update(update):
     user = update.effective_user
     chat = update.effective_chat
 
-    if chat is None and user is not None and user.id in gm.userid_current:
-        chat = gm.userid_current.get(user.id).game.chat
+    if chat is None and user is not None:
+        # Inline queries run outside the chat queues, so the player may
+        # leave the game at any moment
+        player = gm.userid_current.get(user.id)
+        if player is not None:
+            chat = player.game.chat
 
     return user, chat
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# /rating üçün ən çox qələbə qazanan oyunçuların yaddaşdakı siyahısı.
+#
+# Siyahı ilk /rating-də first_places indeksi ilə (top_winners) bir dəfə
+# oxunur, sonra hər qələbə yazılanda (StatsWriter) yalnız həmin oyunçunun
+# sənədi oxunaraq yenilənir. Hazır mesaj mətni dil üzrə saxlanılır və yalnız
+# siyahı dəyişəndə yenidən qurulur - /rating sorğu göndərmir.
+
+import logging
+import threading
+
+import user_setting
+from levels import compute_level
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    """Ən yaxşı `size` oyunçu: [(qələbə, ad, id, səviyyə, rütbə), ...]"""
+
+    def __init__(self, store=None, size=25):
+        self._store = store
+        self.size = size
+        self.loads = 0
+        self._rows = None
+        self._texts = dict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        """Verilməyibsə, user_setting-in backend-i (ilk lazım olanda)"""
+        if self._store is None:
+            self._store = user_setting.setup()
+        return self._store
+
+    def available(self):
+        return self.store is not None
+
+    @staticmethod
+    def _row(id, wins, name):
+        level, rank_name = compute_level(wins)
+        return (wins, name, id, level, rank_name)
+
+    def load(self):
+        """Siyahını bazadan yenidən oxuyur və (surətini) qaytarır."""
+        with self._lock:
+            return list(self._load())
+
+    def _load(self):
+        docs = self.store.top_winners(self.size)
+        self._rows = [self._row(doc["_id"], int(doc["first_places"]),
+                                doc.get("name"))
+                      for doc in docs]
+        self._changed()
+        self.loads += 1
+        return self._rows
+
+    def _current(self):
+        # self._lock altında: yoxlama, oxuma və surət arasında invalidate()
+        # siyahını silə bilməsin
+        if self._rows is None:
+            return self._load()
+        return self._rows
+
+    def rows(self):
+        with self._lock:
+            return list(self._current())
+
+    def update(self, id, wins, name=None):
+        """Oyunçunun yeni qələbə sayını siyahıya tətbiq edir."""
+        with self._lock:
+            rows = self._rows
+            if rows is None:
+                return
+
+            old = next((row for row in rows if row[2] == id), None)
+            if old is not None:
+                rows.remove(old)
+                name = name or old[1]
+                if len(rows) + 1 >= self.size and wins < old[0]:
+                    # Yerinə kimin keçəcəyi bilinmir - növbəti dəfə oxunur
+                    self._rows = None
+                    self._changed()
+                    return
+
+            full = len(rows) >= self.size
+            if wins > 0 and (not full or wins > rows[-1][0]):
+                rows.append(self._row(id, wins, name))
+                rows.sort(key=lambda row: -row[0])
+                del rows[self.size:]
+            elif old is None:
+                return
+            self._changed()
+
+    def refresh(self, id, wins=None):
+        """
+        user_setting.win_listeners üçün: qələbə yazılandan sonra oyunçunun
+        sənədini oxuyur (wins verilibsə, onu istifadə edir).
+        """
+        if self._rows is None:
+            # Hələ oxunmayıb - ilk oxunuşda onsuz da təzə olacaq
+            return
+
+        name = None
+        if wins is None:
+            try:
+                doc = self.store.get_user(id)
+            except Exception as e:
+                logger.error(f"Reytinq yenilənərkən xəta: {e}")
+                self.invalidate()
+                return
+            if doc is None:
+                return
+            wins = int(doc.get("first_places", 0) or 0)
+            name = doc.get("name")
+        self.update(id, wins, name)
+
+    def invalidate(self):
+        with self._lock:
+            self._rows = None
+            self._changed()
+
+    def text(self, locale, render):
+        """render(rows) nəticəsini dil üzrə yadda saxlayır."""
+        text = self._texts.get(locale)
+        if text is not None:
+            return text
+
+        with self._lock:
+            rows = list(self._current())
+            version = self._version
+
+        text = render(rows)
+        with self._lock:
+            if version == self._version:
+                self._texts[locale] = text
+        return text
+
+    def _changed(self):
+        self._version += 1
+        self._texts = dict()
+
+
+leaderboard = Leaderboard()
+user_setting.win_listeners.append(leaderboard.refresh)
@@ -6,6 +6,8 @@
 # artır. Xallar (qələbə sayı) üst-üstə toplandıqca səviyyə və rütbə adı
 # avtomatik yüksəlir. Hamı 1-ci səviyyə və ilk addan başlayır.
 
+from config import PLACE_POINTS
+
 # (lazımi_qələbə_sayı, səviyyə, rütbə_adı)
 LEVELS = [
     (0,   1,  "🔰 Yeni Başlayan"),
@@ -33,6 +35,13 @@ def compute_level(wins: int):
     return level, rank_name
 
 
+def place_points(place: int) -> int:
+    """Oyunu `place`-ci yerdə bitirənin qazandığı xal (total_points)."""
+    if place and 0 < place <= len(PLACE_POINTS):
+        return PLACE_POINTS[place - 1]
+    return 0
+
+
 def place_label(place: int) -> str:
     """Yer nömrəsini emoji ilə göstərir (1-ci, 2-ci, 3-cü, 4-cü...)."""
     if place == 1:
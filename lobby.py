@@ -18,7 +18,8 @@ from errors import NoGameInChatError
 from shared_vars import gm
 from user_setting import UserSetting
 from levels import compute_level
-from utils import display_name
+from outbox import LOBBY
+from utils import display_name, send_async
 
 logger = logging.getLogger(__name__)
 
@@ -88,21 +89,15 @@ def close_lobby_tracking(game):
 
 def get_open_lobby(chat_id):
     """Bu qrupda hələ başlamamış (lobby mərhələsində olan) oyun varsa qaytarır."""
-    games = gm.chatid_games.get(chat_id)
-    if not games:
-        return None
-    game = games[-1]
-    if not game.started:
+    game = gm.active_game(chat_id)
+    if game is not None and not game.started:
         return game
     return None
 
 
 def get_active_game(chat_id):
     """Bu qrupda HƏR HANSI aktiv oyun (lobby VƏ YA artıq başlamış) varsa qaytarır."""
-    games = gm.chatid_games.get(chat_id)
-    if not games:
-        return None
-    return games[-1]
+    return gm.active_game(chat_id)
 
 
 def force_end_game(chat, game):
@@ -116,11 +111,7 @@ def force_end_game(chat, game):
         except NoGameInChatError:
             pass
 
-    games_list = gm.chatid_games.get(chat.id)
-    if games_list and game in games_list:
-        games_list.remove(game)
-        if not games_list:
-            del gm.chatid_games[chat.id]
+    gm.remove_game(game)
 
 
 def check_inactive_lobbies_job(context: CallbackContext):
@@ -132,66 +123,75 @@ def check_inactive_lobbies_job(context: CallbackContext):
     now = datetime.now()
     threshold = now - timedelta(minutes=LOBBY_TIMEOUT_MINUTES)
 
-    for chat_id, games in list(gm.chatid_games.items()):
-        for game in list(games):
+    for chat_id, games in gm.games_by_chat():
+        # Handler-lərlə eyni anda eyni oyuna toxunmamaq üçün (bax:
+        # GameManager.chat_lock)
+        with gm.chat_lock(chat_id):
+            for game in games:
+                if gm.is_running(game):
+                    _check_inactive_game(bot, chat_id, game, threshold)
 
-            if not game.started:
-                # ---- Qeydiyyat (lobby) mərhələsi hərəkətsizdirsə ----
-                last_activity = game.last_lobby_activity
-                if not last_activity or last_activity >= threshold:
-                    continue
 
-                players_count = len(game.players)
+def _check_inactive_game(bot, chat_id, game, threshold):
+    """Bir oyunu yoxlayır; çağıran qrupun kilidini saxlayır."""
+    if not game.started:
+        # ---- Qeydiyyat (lobby) mərhələsi hərəkətsizdirsə ----
+        last_activity = game.last_lobby_activity
+        if not last_activity or last_activity >= threshold:
+            return
 
-                try:
-                    if game.lobby_message_id is not None:
-                        try:
-                            bot.delete_message(chat_id, game.lobby_message_id)
-                        except Exception:
-                            pass
-
-                    games.remove(game)
-                    if not games:
-                        del gm.chatid_games[chat_id]
-
-                    if players_count < MIN_PLAYERS:
-                        text = (
-                            f"⏳ **Oyun Dayandırıldı**\n"
-                            f"Qeydiyyat başlayandan **{LOBBY_TIMEOUT_MINUTES} dəqiqə** keçdi, "
-                            f"lakin ən az {MIN_PLAYERS} oyunçu qoşulmadı. "
-                            f"Yeni oyun üçün /uno yazın ✅"
-                        )
-                    else:
-                        text = (
-                            f"⏳ **Oyun Dayandırıldı**\n"
-                            f"Qeydiyyat başlayandan **{LOBBY_TIMEOUT_MINUTES} dəqiqə** keçdi. "
-                            f"Kifayət qədər oyunçu olsa da, oyun başladılmadı. "
-                            f"Yeni oyun üçün /uno yazın ✅"
-                        )
-
-                    bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown")
-                    logger.info(f"Lobby timeout ilə bağlandı. Chat ID: {chat_id}")
-                except Exception as e:
-                    logger.error(f"Lobby timeout bildirişi göndərilərkən xəta: {e}")
+        players_count = len(game.players)
 
+        try:
+            if game.lobby_message_id is not None:
+                try:
+                    bot.delete_message(chat_id, game.lobby_message_id)
+                except Exception:
+                    pass
+
+            gm.remove_game(game)
+
+            if players_count < MIN_PLAYERS:
+                text = (
+                    f"⏳ **Oyun Dayandırıldı**\n"
+                    f"Qeydiyyat başlayandan **{LOBBY_TIMEOUT_MINUTES} dəqiqə** keçdi, "
+                    f"lakin ən az {MIN_PLAYERS} oyunçu qoşulmadı. "
+                    f"Yeni oyun üçün /uno yazın ✅"
+                )
             else:
-                # ---- Artıq başlamış, amma hərəkətsiz qalmış oyun ----
-                last_activity = getattr(game, "last_activity", None)
-                if not last_activity or last_activity >= threshold:
-                    continue
+                text = (
+                    f"⏳ **Oyun Dayandırıldı**\n"
+                    f"Qeydiyyat başlayandan **{LOBBY_TIMEOUT_MINUTES} dəqiqə** keçdi. "
+                    f"Kifayət qədər oyunçu olsa da, oyun başladılmadı. "
+                    f"Yeni oyun üçün /uno yazın ✅"
+                )
+
+            send_async(bot, chat_id=chat_id, text=text, parse_mode="Markdown",
+                       priority=LOBBY)
+            logger.info(f"Lobby timeout ilə bağlandı. Chat ID: {chat_id}")
+        except Exception as e:
+            logger.error(f"Lobby timeout bildirişi göndərilərkən xəta: {e}")
+
+    else:
+        # ---- Artıq başlamış, amma hərəkətsiz qalmış oyun ----
+        last_activity = getattr(game, "last_activity", None)
+        if not last_activity or last_activity >= threshold:
+            return
 
-                try:
-                    force_end_game(game.chat, game)
-                    bot.send_message(
-                        chat_id=chat_id,
-                        text=(
-                            f"⏳ **Oyun Dayandırıldı**\n"
-                            f"Oyunda **{LOBBY_TIMEOUT_MINUTES} dəqiqədir** heç bir hərəkət "
-                            f"olmadığı üçün avtomatik sonlandırıldı. "
-                            f"Yeni oyun üçün /uno yazın ✅"
-                        ),
-                        parse_mode="Markdown",
-                    )
-                    logger.info(f"Hərəkətsizlik səbəbindən oyun sonlandırıldı. Chat ID: {chat_id}")
-                except Exception as e:
-                    logger.error(f"Hərəkətsiz oyun sonlandırılarkən xəta: {e}")
+        try:
+            force_end_game(game.chat, game)
+            send_async(
+                bot,
+                chat_id=chat_id,
+                text=(
+                    f"⏳ **Oyun Dayandırıldı**\n"
+                    f"Oyunda **{LOBBY_TIMEOUT_MINUTES} dəqiqədir** heç bir hərəkət "
+                    f"olmadığı üçün avtomatik sonlandırıldı. "
+                    f"Yeni oyun üçün /uno yazın ✅"
+                ),
+                parse_mode="Markdown",
+                priority=LOBBY,
+            )
+            logger.info(f"Hərəkətsizlik səbəbindən oyun sonlandırıldı. Chat ID: {chat_id}")
+        except Exception as e:
+            logger.error(f"Hərəkətsiz oyun sonlandırılarkən xəta: {e}")
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+"""
+Queue for everything the bot sends to Telegram.
+
+Telegram allows about 30 messages per second overall and about 20 per
+minute in a group, and answers with 429 (RetryAfter) when they are
+exceeded. Instead of sending every message from its own worker thread,
+send_async and answer_async put the messages in this queue, and a few
+sender threads send them as fast as token buckets per chat and for the
+whole bot allow.
+
+Messages have a priority class: gameplay before lobby before broadcast.
+Within a chat the best class goes first, and when the global bucket is the
+limit the chats with the best waiting class go first. The queue is
+bounded; a broadcast waits for space and may only fill half of it. When it
+is full, another message pushes out the newest waiting message of a worse
+class, and is only dropped if there is none. stats() reports the queue
+length, drops, retries and how long messages waited.
+"""
+
+import atexit
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+from telegram.error import RetryAfter
+
+from config import OUTBOX_GLOBAL_RATE, OUTBOX_GROUP_RATE, \
+    OUTBOX_GROUP_BURST, OUTBOX_PRIVATE_RATE, OUTBOX_PRIVATE_BURST, \
+    OUTBOX_BROADCAST_RATE, OUTBOX_MAX_PENDING, OUTBOX_SENDERS
+
+logger = logging.getLogger(__name__)
+
+GAMEPLAY, LOBBY, BROADCAST = range(3)
+PRIORITIES = ('gameplay', 'lobby', 'broadcast')
+
+
+class TokenBucket(object):
+    """ Allows rate sends per second, saving up at most burst of them """
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.stamp = now
+
+    def _refill(self, now):
+        if now > self.stamp:
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+
+    def delay(self, now):
+        """Seconds until the next send is allowed, 0 if it is right now"""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        if self.rate:
+            self._refill(now)
+            self.tokens -= 1
+
+    def full(self, now):
+        if not self.rate:
+            return True
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class Job(object):
+    """ One call to the Bot API that waits in the queue """
+
+    __slots__ = ('func', 'args', 'kwargs', 'chat_id', 'priority', 'retry',
+                 'callback', 'queued')
+
+    def __init__(self, func, args, kwargs, chat_id, priority, retry,
+                 callback, queued):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.chat_id = chat_id
+        self.priority = priority
+        self.retry = retry
+        self.callback = callback
+        self.queued = queued
+
+
+class _Chat(object):
+    """ The waiting jobs and the bucket of one chat """
+
+    __slots__ = ('bucket', 'queues', 'count', 'not_before')
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.queues = tuple(deque() for _ in PRIORITIES)
+        self.count = 0
+        self.not_before = 0.0
+
+    def best(self):
+        for priority, queue in enumerate(self.queues):
+            if queue:
+                return priority
+        return None
+
+    def pop(self):
+        self.count -= 1
+        return self.queues[self.best()].popleft()
+
+
+class Outbox(object):
+    """
+    Sends queued Bot API calls from a few threads, within the rate limits.
+
+    Chats that have jobs are either in the ready heap, ordered by their best
+    priority, or in the waiting heap until their bucket has a token again.
+    Jobs without a chat (inline query answers) are not rate limited and go
+    before everything else.
+    """
+
+    def __init__(self, global_rate=OUTBOX_GLOBAL_RATE,
+                 group_rate=OUTBOX_GROUP_RATE / 60,
+                 group_burst=OUTBOX_GROUP_BURST,
+                 private_rate=OUTBOX_PRIVATE_RATE,
+                 private_burst=OUTBOX_PRIVATE_BURST,
+                 broadcast_rate=OUTBOX_BROADCAST_RATE,
+                 max_pending=OUTBOX_MAX_PENDING, senders=OUTBOX_SENDERS,
+                 clock=time.monotonic):
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.max_pending = max_pending
+        self.senders = senders
+        self.clock = clock
+
+        now = clock()
+        self._global = TokenBucket(global_rate, global_rate, now)
+        self._broadcast = TokenBucket(broadcast_rate, broadcast_rate, now)
+
+        self._lock = threading.Lock()
+        self._jobs = threading.Condition(self._lock)
+        self._space = threading.Condition(self._lock)
+        self._chats = dict()
+        self._direct = deque()
+        self._ready = list()  # (priority, seq, chat_id)
+        self._waiting = list()  # (not before, seq, chat_id)
+        self._seq = itertools.count()
+        self._prune_at = 1024
+        self._threads = list()
+        self._stopped = False
+
+        self.pending = [0] * len(PRIORITIES)
+        self.peak_pending = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.throttled = 0
+        self.blocked_puts = 0
+        self.dropped = [0] * len(PRIORITIES)
+        self._waited = [0.0] * len(PRIORITIES)
+        self._done = [0] * len(PRIORITIES)
+
+    def _limit(self, priority):
+        if priority == BROADCAST:
+            return self.max_pending // 2
+        return self.max_pending
+
+    def put(self, func, args=(), kwargs=None, chat_id=None,
+            priority=GAMEPLAY, retry=True, callback=None, block=False,
+            timeout=None):
+        """
+        Queues func(*args, **kwargs), a Bot API call for chat_id. Jobs
+        without a chat_id are not rate limited.
+
+        retry: send again after a RetryAfter instead of failing
+        callback: called with (result, error) once the job is done
+        block: wait for space (at most timeout seconds) if the queue is full
+
+        If the queue is full, the newest waiting job of a worse class is
+        dropped to make space; it fails with an error. Returns False if the
+        job was dropped because the queue is full.
+        """
+        evicted = None
+        with self._lock:
+            if self._stopped:
+                return False
+
+            limit = self._limit(priority)
+            if sum(self.pending) >= limit:
+                evicted = self._evict(priority)
+            if sum(self.pending) >= limit and block:
+                self.blocked_puts += 1
+                self._space.wait_for(
+                    lambda: sum(self.pending) < limit or self._stopped,
+                    timeout)
+
+            if sum(self.pending) >= limit or self._stopped:
+                self._dropped(priority)
+                queued = False
+            else:
+                now = self.clock()
+                job = Job(func, args, kwargs or dict(), chat_id, priority,
+                          retry, callback, now)
+                self._queue(job, now)
+                queued = True
+
+                if not self._threads and self.senders:
+                    self._start()
+
+        if evicted is not None:
+            self._report(evicted, None, RuntimeError("Outbox is full"))
+        return queued
+
+    def _dropped(self, priority):
+        self.dropped[priority] += 1
+        if self.dropped[priority] % 1000 == 1:
+            logger.warning("Outbox is full, %d %s messages dropped",
+                           self.dropped[priority], PRIORITIES[priority])
+
+    def _evict(self, priority):
+        """
+        Takes the newest waiting job of the worst class below priority out
+        of the queue (from the chat seen last), under self._lock. This only
+        happens when the queue is full, so looking through the chats is
+        fine. Returns the job or None.
+        """
+        for worse in range(len(PRIORITIES) - 1, priority, -1):
+            if not self.pending[worse]:
+                continue
+            for chat in reversed(self._chats.values()):
+                if chat.queues[worse]:
+                    chat.count -= 1
+                    self.pending[worse] -= 1
+                    self._dropped(worse)
+                    return chat.queues[worse].pop()
+        return None
+
+    def _queue(self, job, now, first=False):
+        """ Adds a job and schedules its chat, under self._lock """
+        self.pending[job.priority] += 1
+        total = sum(self.pending)
+        if total > self.peak_pending:
+            self.peak_pending = total
+
+        if job.chat_id is None:
+            self._direct.append(job)
+            self._jobs.notify()
+            return
+
+        chat = self._chats.get(job.chat_id)
+        if chat is None:
+            if len(self._chats) >= self._prune_at:
+                self._prune(now)
+            chat = self._chats[job.chat_id] = _Chat(self._bucket(job.chat_id,
+                                                                 now))
+
+        best = chat.best()
+        queue = chat.queues[job.priority]
+        if first:
+            queue.appendleft(job)
+        else:
+            queue.append(job)
+        chat.count += 1
+
+        # A chat with jobs is always in one of the heaps; it is added again
+        # when a better class arrives, the stale entry is skipped later
+        if best is None or job.priority < best:
+            heapq.heappush(self._ready,
+                           (job.priority, next(self._seq), job.chat_id))
+            self._jobs.notify()
+
+    def _bucket(self, chat_id, now):
+        if str(chat_id).startswith('-'):
+            return TokenBucket(self.group_rate, self.group_burst, now)
+        return TokenBucket(self.private_rate, self.private_burst, now)
+
+    def _prune(self, now):
+        """ Forgets idle chats whose bucket has filled up again """
+        for chat_id, chat in list(self._chats.items()):
+            if not chat.count and chat.not_before <= now and \
+                    chat.bucket.full(now):
+                del self._chats[chat_id]
+        self._prune_at = max(1024, len(self._chats) * 2)
+
+    def poll(self):
+        """
+        Takes the next job that may be sent now. Returns (job, None), or
+        (None, seconds) when nothing may be sent for that long (None: until
+        a job arrives).
+        """
+        with self._lock:
+            return self._poll(self.clock())
+
+    def _poll(self, now):
+        if self._direct:
+            job = self._direct.popleft()
+            self._taken(job, now)
+            return job, None
+
+        while self._waiting and self._waiting[0][0] <= now:
+            _, seq, chat_id = heapq.heappop(self._waiting)
+            chat = self._chats.get(chat_id)
+            if chat is not None and chat.count:
+                heapq.heappush(self._ready, (chat.best(), seq, chat_id))
+
+        while self._ready:
+            priority, seq, chat_id = self._ready[0]
+
+            delay = self._global.delay(now)
+            if priority == BROADCAST:
+                delay = max(delay, self._broadcast.delay(now))
+            if delay:
+                return None, self._sooner(delay, now)
+
+            heapq.heappop(self._ready)
+            chat = self._chats.get(chat_id)
+            if chat is None or not chat.count:
+                continue
+
+            wait = max(chat.bucket.delay(now), chat.not_before - now)
+            if wait > 0:
+                self.throttled += 1
+                heapq.heappush(self._waiting, (now + wait, seq, chat_id))
+                continue
+
+            job = chat.pop()
+            chat.bucket.take(now)
+            self._global.take(now)
+            if job.priority == BROADCAST:
+                self._broadcast.take(now)
+
+            if chat.count:
+                heapq.heappush(self._ready,
+                               (chat.best(), next(self._seq), chat_id))
+
+            self._taken(job, now)
+            return job, None
+
+        return None, self._sooner(None, now)
+
+    def _sooner(self, delay, now):
+        if self._waiting:
+            wait = self._waiting[0][0] - now
+            return wait if delay is None else min(delay, wait)
+        return delay
+
+    def _taken(self, job, now):
+        self.pending[job.priority] -= 1
+        self._waited[job.priority] += now - job.queued
+        self._done[job.priority] += 1
+        self._space.notify_all()
+
+    def deliver(self, job):
+        """ Calls the Bot API for a job taken with poll() """
+        try:
+            result = job.func(*job.args, **job.kwargs)
+        except RetryAfter as e:
+            with self._lock:
+                self.retried += 1
+                now = self.clock()
+                if job.retry and not self._stopped:
+                    self._queue(job, now, first=True)
+                chat = self._chats.get(job.chat_id)
+                if chat is not None:
+                    chat.not_before = now + e.retry_after
+                    if chat.count:
+                        heapq.heappush(self._waiting,
+                                       (chat.not_before, next(self._seq),
+                                        job.chat_id))
+                        self._jobs.notify()
+                if job.retry and not self._stopped:
+                    return
+            self._finish(job, None, e)
+        except Exception as e:
+            self._finish(job, None, e)
+        else:
+            self._finish(job, result, None)
+
+    def _finish(self, job, result, error):
+        with self._lock:
+            if error is None:
+                self.sent += 1
+            else:
+                self.failed += 1
+        self._report(job, result, error)
+
+    def _report(self, job, result, error):
+        if job.callback:
+            try:
+                job.callback(result, error)
+            except Exception:
+                logger.exception("Outbox callback failed")
+        elif error is not None:
+            logger.error("Sending to %s failed: %s", job.chat_id, error)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while True:
+                    if self._stopped:
+                        return
+                    job, wait = self._poll(self.clock())
+                    if job:
+                        break
+                    self._jobs.wait(wait)
+            self.deliver(job)
+
+    def _start(self):
+        for i in range(self.senders):
+            thread = threading.Thread(target=self._run,
+                                      name='outbox_%d' % i, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """ Stops the sender threads, jobs still queued are not sent """
+        with self._lock:
+            self._stopped = True
+            self._jobs.notify_all()
+            self._space.notify_all()
+            threads, self._threads = self._threads, list()
+
+        for thread in threads:
+            thread.join()
+
+    def stats(self):
+        """ Queue length, throughput and back-pressure counters """
+        with self._lock:
+            return {
+                "pending": dict(zip(PRIORITIES, self.pending)),
+                "peak_pending": self.peak_pending,
+                "max_pending": self.max_pending,
+                "sent": self.sent,
+                "failed": self.failed,
+                "retried": self.retried,
+                "throttled": self.throttled,
+                "blocked_puts": self.blocked_puts,
+                "dropped": dict(zip(PRIORITIES, self.dropped)),
+                "average_wait_ms": {
+                    name: round(self._waited[i] / self._done[i] * 1000, 1)
+                    if self._done[i] else 0.0
+                    for i, name in enumerate(PRIORITIES)},
+                "chats": len(self._chats),
+            }
+
+
+outbox = Outbox()
+
+
+def _log_stats():
+    if outbox.sent or outbox.failed:
+        logger.info("Outbox: %s", outbox.stats())
+
+
+atexit.register(_log_stats)
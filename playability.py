@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Decides which cards can be played, using a table built at import time"""
+
+import card as c
+
+# Kind of draw the next player has to answer
+NO_DRAW = 0
+DRAW_TWO_PENDING = 1
+DRAW_FOUR_PENDING = 2
+
+# Values in a table row
+NOT_PLAYABLE = 0
+PLAYABLE = 1
+PLAYABLE_SAME_COLOR = 2  # Playing +4 while holding one of these is a bluff
+
+
+def pending_draw(last, draw_counter):
+    """Returns the kind of draw that is pending on the last card"""
+    if not draw_counter:
+        return NO_DRAW
+    if last.value == c.DRAW_TWO:
+        return DRAW_TWO_PENDING
+    if last.special == c.DRAW_FOUR:
+        return DRAW_FOUR_PENDING
+    return NO_DRAW
+
+
+def _card_playable(last, color, pending, card):
+    """Check a single card if it can be played"""
+    if card.color != color and card.value != last.value and not card.special:
+        # Neither the color nor the value match
+        return False
+    elif pending == DRAW_TWO_PENDING and card.value != c.DRAW_TWO:
+        # The player has to draw and can only answer with another +2
+        return False
+    elif pending == DRAW_FOUR_PENDING:
+        # The player has to draw and cannot answer
+        return False
+    elif last.special and card.special:
+        # A color chooser or +4 can't be played on another one
+        return False
+    elif not color:
+        # The color of the last card has not been chosen yet
+        return False
+    return True
+
+
+def _build_table():
+    table = dict()
+    for last in c.CARDS:
+        for color in (None,) + c.COLORS:
+            for pending in (NO_DRAW, DRAW_TWO_PENDING, DRAW_FOUR_PENDING):
+                row = bytearray(len(c.CARDS))
+                for card in c.CARDS:
+                    if _card_playable(last, color, pending, card):
+                        row[card.index] = (PLAYABLE_SAME_COLOR
+                                           if card.color == color
+                                           else PLAYABLE)
+                table[last.index, color, pending] = bytes(row)
+    return table
+
+
+# (last card index, effective color, pending draw) -> row indexed by card
+TABLE = _build_table()
+
+
+def playable_cards(last, color, draw_counter, cards):
+    """
+    Returns the cards that can be played on the last card, and whether
+    playing a +4 right now would be a bluff
+    """
+    row = TABLE[last.index, color, pending_draw(last, draw_counter)]
+
+    playable = list()
+    bluffing = False
+    for card in cards:
+        playable_as = row[card.index]
+        if playable_as:
+            playable.append(card)
+            if playable_as == PLAYABLE_SAME_COLOR:
+                bluffing = True
+
+    return playable, bluffing
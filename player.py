@@ -18,37 +18,27 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 
-import logging
 from datetime import datetime
 
-import card as c
-from errors import DeckEmptyError
+import playability
+from hand import Hand
 
 
 class Player(object):
     """
     This class represents a player.
-    It is basically a doubly-linked ring list with the option to reverse the
-    direction. On initialization, it will connect itself to a game and its
-    other players by placing itself behind the current player.
+    Players are seated in Game.seats, and next and prev follow the seating
+    order in the current direction of the game. On initialization, a player
+    takes the seat behind the current player.
     """
 
     def __init__(self, game, user):
-        self.cards = list()
+        self.cards = Hand()
         self.game = game
         self.user = user
-        self.logger = logging.getLogger(__name__)
-
-        # Check if this player is the first player in this game.
-        if game.current_player:
-            self.next = game.current_player
-            self.prev = game.current_player.prev
-            game.current_player.prev.next = self
-            game.current_player.prev = self
-        else:
-            self._next = self
-            self._prev = self
-            game.current_player = self
+
+        self.seat = None
+        game.add_player(self)
 
         self.bluffing = False
         self.drew = False
@@ -56,29 +46,20 @@ class Player(object):
         self.turn_started = datetime.now()
 
     def draw_first_hand(self):
-        try:
-            for _ in range(7):
-                self.cards.append(self.game.deck.draw())
-        except DeckEmptyError:
-            for card in self.cards:
-                self.game.deck.dismiss(card)
-
-            raise
+        """Draws 7 cards, or none at all if the deck runs out"""
+        self.cards.extend(self.game.deck.draw_many(7))
 
     def leave(self):
-        """Removes player from the game and closes the gap in the list"""
-        if self.next == self:
+        """Removes player from the game and closes the gap in the seats"""
+        if self.seat is None or self.next is self:
             return
 
-        self.next.prev = self.prev
-        self.prev.next = self.next
-        self.next = None
-        self.prev = None
+        self.game.remove_player(self)
 
         for card in self.cards:
             self.game.deck.dismiss(card)
 
-        self.cards = list()
+        self.cards.clear()
 
     def __repr__(self):
         return repr(self.user)
@@ -87,40 +68,37 @@ class Player(object):
         return str(self.user)
 
     @property
-    def next(self):
-        return self._next if not self.game.reversed else self._prev
+    def cards(self):
+        return self._cards
 
-    @next.setter
-    def next(self, player):
-        if not self.game.reversed:
-            self._next = player
-        else:
-            self._prev = player
+    @cards.setter
+    def cards(self, cards):
+        self._cards = cards if isinstance(cards, Hand) else Hand(cards)
 
     @property
-    def prev(self):
-        return self._prev if not self.game.reversed else self._next
+    def next(self):
+        if self.seat is None:
+            return None
+        seats = self.game.seats
+        return seats[(self.seat + self.game.direction) % len(seats)]
 
-    @prev.setter
-    def prev(self, player):
-        if not self.game.reversed:
-            self._prev = player
-        else:
-            self._next = player
+    @property
+    def prev(self):
+        if self.seat is None:
+            return None
+        seats = self.game.seats
+        return seats[(self.seat - self.game.direction) % len(seats)]
 
     def draw(self):
         """Draws 1+ cards from the deck, depending on the draw counter"""
         _amount = self.game.draw_counter or 1
 
         try:
-            for _ in range(_amount):
-                self.cards.append(self.game.deck.draw())
-
-        except DeckEmptyError:
-            raise
+            self.cards.extend(self.game.deck.draw_many(_amount))
 
         finally:
             self.game.draw_counter = 0
+            self.game.version += 1
             self.drew = True
 
     def play(self, card):
@@ -129,56 +107,22 @@ class Player(object):
         self.game.play_card(card)
 
     def playable_cards(self):
-        """Returns a list of the cards this player can play right now"""
-
-        playable = list()
-        last = self.game.last_card
-
-        self.logger.debug("Sonuncu kart oldu" + str(last))
+        """
+        Returns a list of the cards this player can play right now, each
+        distinct card only once
+        """
 
-        cards = self.cards
+        cards = self.cards.distinct()
         if self.drew:
-            cards = self.cards[-1:]
+            cards = (self.cards.last,) if self.cards.last else ()
 
         # You may only play a +4 if you have no cards of the correct color
-        self.bluffing = False
-        for card in cards:
-            if self._card_playable(card):
-                self.logger.debug("Uyğunlaşır!")
-                playable.append(card)
-
-                self.bluffing = (self.bluffing or card.color == last.color)
+        playable, self.bluffing = playability.playable_cards(
+            self.game.last_card, self.game.last_color,
+            self.game.draw_counter, cards)
 
         # You may not play a chooser or +4 as your last card
-        if len(self.cards) == 1 and self.cards[0].special:
+        if len(self.cards) == 1 and next(iter(self.cards)).special:
             return list()
 
         return playable
-
-    def _card_playable(self, card):
-        """Check a single card if it can be played"""
-
-        is_playable = True
-        last = self.game.last_card
-        self.logger.debug("Kart yoxlanılır " + str(card))
-
-        if (card.color != last.color and card.value != last.value and
-                not card.special):
-            self.logger.debug("Kartın rəngi və ya rəqəmi uyğun gəlmir")
-            is_playable = False
-        elif last.value == c.DRAW_TWO and not \
-                card.value == c.DRAW_TWO and self.game.draw_counter:
-            self.logger.debug("Oyuçu kart çəkməlidir və qarşılıq verə bilməz")
-            is_playable = False
-        elif last.special == c.DRAW_FOUR and self.game.draw_counter:
-            self.logger.debug("Oyuçu kart çəkməlidir və qarşılıq verə bilməz")
-            is_playable = False
-        elif (last.special == c.CHOOSE or last.special == c.DRAW_FOUR) and \
-                (card.special == c.CHOOSE or card.special == c.DRAW_FOUR):
-            self.logger.debug("Reng seçici kartı başqa karta oynamaq olmaz")
-            is_playable = False
-        elif not last.color:
-            self.logger.debug("Sonuncu kartın rəngi düz deyil")
-            is_playable = False
-
-        return is_playable
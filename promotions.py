@@ -20,16 +20,15 @@ def get_promotion():
     return random.choices(list(PROMOTIONS.keys()), weights=list(PROMOTIONS.values()))[0]
 
 def send_promotion(chat, chance=1.0):
-    """ (Maybe) send a promotion message """
-    if random.random() <= chance:
-        chat.send_message(get_promotion(), parse_mode='HTML')
+    """ (Maybe) send a promotion message, through the outbox """
+    from outbox import LOBBY
+    from utils import send_async
 
+    if random.random() <= chance:
+        send_async(chat.bot, chat.id, text=get_promotion(),
+                   parse_mode='HTML', priority=LOBBY)
 
-def send_promotion_async(chat, chance=1.0):
-    """ Send a promotion message asynchronously """
 
-    from utils import dispatcher, error
-    try:
-        dispatcher.run_async(send_promotion, chat, chance=chance)
-    except Exception as e:
-        error(None, None, e)
+# Sending is queued in the outbox, so there is nothing left to run in the
+# background
+send_promotion_async = send_promotion
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Cache for the inline results of players in running games.
+
+Telegram sends an inline query on every keystroke and every time a player
+opens the inline panel, while the results only change when the game or
+the hand of the player changes. Each player keeps the results that were
+built last, together with the state they were built for.
+"""
+
+import threading
+
+
+class ResultCache(object):
+    """ Keeps the last inline results per player, grouped by game """
+
+    def __init__(self):
+        self.games = dict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(player, locales):
+        """The state the inline results of a player depend on"""
+        game = player.game
+        return (game.version, player.cards, player.cards.version,
+                player.anti_cheat, tuple(locales), game.mode)
+
+    def get(self, player, key):
+        """Returns the cached results for this key, or None"""
+        with self._lock:
+            entry = self.games.get(player.game, {}).get(player)
+
+            if entry and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            return None
+
+    def put(self, player, key, results):
+        with self._lock:
+            self.games.setdefault(player.game, dict())[player] = (key,
+                                                                  results)
+
+    def evict_game(self, game):
+        """Drops the results of all players of a finished game"""
+        with self._lock:
+            if self.games.pop(game, None) is not None:
+                self.evictions += 1
+
+    def evict_player(self, player):
+        with self._lock:
+            players = self.games.get(player.game)
+            if players:
+                players.pop(player, None)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'games': len(self.games),
+                'players': sum(len(p) for p in self.games.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hit_rate,
+            }
+
+
+cache = ResultCache()
@@ -20,15 +20,81 @@
 
 """Defines helper functions to build the inline result list"""
 
-from uuid import uuid4
+from types import MappingProxyType
 
 from telegram import InlineQueryResultArticle, InputTextMessageContent, \
-    InlineQueryResultCachedSticker as Sticker
+    InlineQueryResultCachedSticker as Sticker, TelegramObject
 
 import card as c
 from utils import display_color, display_color_group, display_name
 from internationalization import _, __
 
+# Cards that can not be played are sent with ids like grey_r_5_0, where
+# the number tells duplicates in the hand apart
+GREY_PREFIX = 'grey_'
+
+
+class PrebuiltResult(TelegramObject):
+    """
+    An inline result with a payload that was serialized in advance.
+    Only the id, and for cards that can not be played the game info, are
+    added when the result is sent.
+    """
+
+    __slots__ = ('id', 'payload', 'input_message_content')
+
+    def __init__(self, id, payload, input_message_content=None):
+        self.id = id
+        self.payload = payload
+        self.input_message_content = input_message_content
+
+    def to_dict(self):
+        data = dict(self.payload)
+        data['id'] = self.id
+        if self.input_message_content:
+            data['input_message_content'] = \
+                self.input_message_content.to_dict()
+        return data
+
+
+class CardResults(object):
+    """
+    The serialized sticker results for every card of a sticker pack,
+    indexed by Card.index
+    """
+
+    def __init__(self, stickers, grey_stickers):
+        self.playable = tuple(self._payload(stickers[str(card)])
+                              for card in c.CARDS)
+        self.grey = tuple(self._payload(grey_stickers[str(card)])
+                          for card in c.CARDS)
+        self.text = tuple(self._payload(stickers[str(card)],
+                                        text_mode_content(card))
+                          for card in c.CARDS)
+
+    @staticmethod
+    def _payload(sticker, content=None):
+        return MappingProxyType(
+            Sticker('', sticker_file_id=sticker,
+                    input_message_content=content).to_dict())
+
+
+def text_mode_content(card):
+    """The message that is sent when a card is played in text mode"""
+    return InputTextMessageContent(
+        "Kart oynanıldı: {card}".format(
+            card=repr(card).replace('4 Çek', '+4').replace('Çek', '+2')),
+        parse_mode=None, disable_web_page_preview=None)
+
+
+def grey_id(card, copy=0):
+    return '%s%s_%d' % (GREY_PREFIX, card, copy)
+
+
+# One pool per card pack, games are dealt card.CARD_PACK
+CARD_RESULTS = {name: CardResults(pack["normal"], pack["not_playable"])
+                for name, pack in c.CARD_PACKS.items()}
+
 
 def add_choose_color(results, game):
     """Add choose color options"""
@@ -65,7 +131,7 @@ def player_list(game):
               "{name} ({number} kart)",
               len(player.cards))
             .format(name=player.user.first_name, number=len(player.cards))
-            for player in game.players]
+            for player in game.turn_order()]
 
 
 def add_no_game(results):
@@ -193,32 +259,77 @@ def add_call_bluff(results, game):
     )
 
 
-def add_card(game, card, results, can_play):
-    """Add an option that represents a card"""
+def add_card(game, card, results, can_play, copy=0, info=None):
+    """
+    Add an option that represents a card. Cards that can not be played
+    show the game info, pass info to share it between several cards.
+    """
+
+    pool = CARD_RESULTS[c.CARD_PACK]
 
     if can_play:
         if game.mode != "text":
-            results.append(
-                Sticker(str(card), sticker_file_id=c.STICKERS[str(card)])
-        )
-        if game.mode == "text":
-            results.append(
-                Sticker(str(card), sticker_file_id=c.STICKERS[str(card)], input_message_content=InputTextMessageContent("Kart oynanıldı: {card}".format(card=repr(card).replace('4 Çek', '+4').replace('Çek', '+2').replace('Reng Seçici', 'Reng Seçici')))
-        ))
+            payload = pool.playable[card.index]
+        else:
+            payload = pool.text[card.index]
+
+        results.append(PrebuiltResult(str(card), payload))
     else:
         results.append(
-            Sticker(str(uuid4()), sticker_file_id=c.STICKERS_GREY[str(card)],
-                    input_message_content=game_info(game))
+            PrebuiltResult(grey_id(card, copy), pool.grey[card.index],
+                           info or game_info(game))
         )
 
 
+def add_player_options(player, results):
+    """Add the cards and options of a player in a started game"""
+    game = player.game
+
+    if player is not game.current_player:
+        info = game_info(game)
+        for card, count in player.cards.items():
+            for i in range(count):
+                add_card(game, card, results, False, i, info)
+
+    elif game.choosing_color:
+        add_choose_color(results, game)
+        add_other_cards(player, results, game)
+
+    else:
+        if not player.drew:
+            add_draw(player, results)
+
+        else:
+            add_pass(results, game)
+
+        if game.last_card.special == c.DRAW_FOUR and game.draw_counter:
+            add_call_bluff(results, game)
+
+        playable = set(player.playable_cards())
+        info = None
+
+        for card, count in player.cards.items():
+            can_play = card in playable
+            if count > 1 or not can_play:
+                info = info or game_info(game)
+
+            add_card(game, card, results, can_play, 0, info)
+
+            # Duplicates are not allowed
+            for i in range(1, count):
+                add_card(game, card, results, False, i, info)
+
+        add_gameinfo(game, results)
+
+
 def game_info(game):
     players = player_list(game)
     return InputTextMessageContent(
         _("İndiki oyunçu: {name}")
         .format(name=display_name(game.current_player.user)) +
         "\n" +
-        _("Sonuncu kart: {card}").format(card=repr(game.last_card)) +
+        _("Sonuncu kart: {card}").format(
+            card=game.last_card.colored_repr(game.last_color)) +
         "\n" +
         _("Oyunçu: {player_list}",
           "Oyunçular: {player_list}",
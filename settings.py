@@ -21,6 +21,7 @@
 from telegram import ReplyKeyboardMarkup, Update
 from telegram.ext import CommandHandler, Filters, MessageHandler, CallbackContext
 
+from outbox import LOBBY
 from utils import send_async
 from user_setting import UserSetting
 from shared_vars import dispatcher
@@ -35,7 +36,7 @@ def show_settings(update: Update, context: CallbackContext):
     if update.message.chat.type != 'private':
         send_async(context.bot, chat.id,
                    text=_("Please edit your settings in a private chat with "
-                          "the bot."))
+                          "the bot."), priority=LOBBY)
         return
 
     us = UserSetting.get(id=update.message.from_user.id)
@@ -51,7 +52,7 @@ def show_settings(update: Update, context: CallbackContext):
     kb = [[stats], ['🌍' + ' ' + _("Language")]]
     send_async(context.bot, chat.id, text='🔧' + ' ' + _("Settings"),
                reply_markup=ReplyKeyboardMarkup(keyboard=kb,
-                                                one_time_keyboard=True))
+                                                one_time_keyboard=True), priority=LOBBY)
 
 
 @user_locale
@@ -63,7 +64,7 @@ def kb_select(update: Update, context: CallbackContext):
     if option == '📊':
         us = UserSetting.get(id=user.id)
         us.stats = True
-        send_async(context.bot, chat.id, text=_("Enabled statistics!"))
+        send_async(context.bot, chat.id, text=_("Enabled statistics!"), priority=LOBBY)
 
     elif option == '🌍':
         kb = [[locale + ' - ' + descr]
@@ -71,15 +72,16 @@ def kb_select(update: Update, context: CallbackContext):
               in sorted(available_locales.items())]
         send_async(context.bot, chat.id, text=_("Select locale"),
                    reply_markup=ReplyKeyboardMarkup(keyboard=kb,
-                                                    one_time_keyboard=True))
+                                                    one_time_keyboard=True), priority=LOBBY)
 
     elif option == '❌':
         us = UserSetting.get(id=user.id)
         us.stats = False
         us.first_places = 0
+        us.total_points = 0
         us.games_played = 0
         us.cards_played = 0
-        send_async(context.bot, chat.id, text=_("Deleted and disabled statistics!"))
+        send_async(context.bot, chat.id, text=_("Deleted and disabled statistics!"), priority=LOBBY)
 
 
 @user_locale
@@ -91,9 +93,8 @@ def locale_select(update: Update, context: CallbackContext):
     if option in available_locales:
         us = UserSetting.get(id=user.id)
         us.lang = option
-        _.push(option)
-        send_async(context.bot, chat.id, text=_("Set locale!"))
-        _.pop()
+        with _.using(option):
+            send_async(context.bot, chat.id, text=_("Set locale!"), priority=LOBBY)
 
 def register():
     dispatcher.add_handler(CommandHandler('settdkdkings', show_settings))
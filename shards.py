@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+"""
+Runs the games in several processes, so chats are not all served by one
+interpreter.
+
+The ingress process receives the updates (see start_bot) and hands each
+one to the shard that owns its chat, chat_id modulo the number of shards.
+Every shard runs the handlers with its own GameManager. Inline queries and
+chosen inline results have no chat; they go to the shard of the game the
+user currently plays, which the shards report to the ingress whenever it
+changes (see GameManager.current_listeners). The processes talk over a
+Unix socket with multiprocessing.connection, so everything runs on one
+machine.
+
+    SHARDS=4 python3 bot.py
+"""
+
+import importlib
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from multiprocessing.connection import Client, Listener
+
+from telegram import Update
+from telegram.ext import DispatcherHandlerStop, TypeHandler
+
+from config import SHARDS, STORAGE, OUTBOX_GLOBAL_RATE, CARDS_SPILL_FILE
+
+logger = logging.getLogger(__name__)
+
+AUTHKEY_ENV = 'SHARD_AUTHKEY'
+
+
+class Router(object):
+    """ Decides which shard handles an update """
+
+    def __init__(self, count):
+        self.count = count
+        # user_id -> [(shard, chat_id of the current game there)], the
+        # shard that reported last comes last
+        self.users = dict()
+        self._lock = threading.Lock()
+
+    def shard_for_chat(self, chat_id):
+        return chat_id % self.count
+
+    def set_current(self, shard, user_id, chat_id):
+        """ A shard reports the current game of a user, None for no game """
+        with self._lock:
+            games = [game for game in self.users.get(user_id, ())
+                     if game[0] != shard]
+            if chat_id is not None:
+                games.append((shard, chat_id))
+
+            if games:
+                self.users[user_id] = games
+            else:
+                self.users.pop(user_id, None)
+
+    def current_chat(self, user_id):
+        """ The chat of the game the user plays in inline mode, or None """
+        with self._lock:
+            games = self.users.get(user_id)
+            return games[-1][1] if games else None
+
+    def shard_for(self, update):
+        if update.inline_query or update.chosen_inline_result:
+            user_id = update.effective_user.id
+            chat_id = self.current_chat(user_id)
+            return self.shard_for_chat(user_id if chat_id is None
+                                       else chat_id)
+
+        # select_game: the data is the chat of the game to switch to
+        query = update.callback_query
+        if query and query.data and query.data.lstrip('-').isdigit():
+            return self.shard_for_chat(int(query.data))
+
+        if update.effective_chat:
+            return self.shard_for_chat(update.effective_chat.id)
+        if update.effective_user:
+            return self.shard_for_chat(update.effective_user.id)
+        return 0
+
+
+class Ingress(object):
+    """
+    Starts the shard processes and sends each update to its shard.
+
+    setup names the function every shard calls with its index before it
+    takes updates, as "module:function"; importing the module registers the
+    handlers. Messages from the shards other than current game reports are
+    passed to on_event(shard, message).
+    """
+
+    def __init__(self, count=SHARDS, setup='bot:setup_shard',
+                 on_event=None):
+        self.router = Router(count)
+        self.count = count
+        self.setup = setup
+        self.on_event = on_event
+        self.processes = list()
+        self.connections = [None] * count
+        self.routed = [0] * count
+        self._send_locks = [threading.Lock() for _ in range(count)]
+        self._directory = None
+        self._stopping = False
+
+    def start(self, timeout=60):
+        """ Starts the shards and waits until all of them are connected """
+        self._directory = tempfile.mkdtemp(prefix='uno-shards-')
+        address = os.path.join(self._directory, 'ingress')
+        authkey = os.urandom(32)
+        listener = Listener(address, 'AF_UNIX', authkey=authkey)
+
+        here = os.path.dirname(os.path.abspath(__file__))
+        for index in range(self.count):
+            self.processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(here, 'shards.py'),
+                 str(index), address, self.setup],
+                cwd=here, env=self.shard_env(index, authkey)))
+
+        connections = list()
+
+        def accept():
+            try:
+                for _ in range(self.count):
+                    connection = listener.accept()
+                    connections.append((connection.recv()[1], connection))
+            except (EOFError, OSError):
+                pass
+
+        thread = threading.Thread(target=accept, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        listener.close()
+
+        if len(connections) < self.count:
+            self.stop()
+            raise RuntimeError("Only %d of %d shards started" %
+                               (len(connections), self.count))
+
+        for index, connection in connections:
+            self.connections[index] = connection
+            threading.Thread(target=self._listen, args=(index, connection),
+                             name='shard_%d' % index, daemon=True).start()
+
+        logger.info("Started %d shards", self.count)
+
+    def shard_env(self, index, authkey):
+        """ The environment of a shard process """
+        env = dict(os.environ)
+        env[AUTHKEY_ENV] = authkey.hex()
+        if OUTBOX_GLOBAL_RATE:
+            # Telegram's limit is for the whole bot, so the shards share it
+            env['OUTBOX_GLOBAL_RATE'] = str(OUTBOX_GLOBAL_RATE / self.count)
+        if CARDS_SPILL_FILE:
+            # Every shard counts cards on its own and replays only its own
+            # spill file after a restart
+            root, ext = os.path.splitext(CARDS_SPILL_FILE)
+            env['CARDS_SPILL_FILE'] = '%s.shard%d%s' % (root, index, ext)
+        return env
+
+    def _listen(self, index, connection):
+        while True:
+            try:
+                message = connection.recv()
+            except (EOFError, OSError):
+                if not self._stopping:
+                    logger.error("Shard %d has exited", index)
+                return
+
+            if message[0] == 'current':
+                self.router.set_current(index, message[1], message[2])
+            elif self.on_event:
+                self.on_event(index, message)
+
+    def dispatch(self, update):
+        """ Sends an update to its shard, returns the shard """
+        index = self.router.shard_for(update)
+        try:
+            with self._send_locks[index]:
+                self.connections[index].send(update.to_dict())
+                self.routed[index] += 1
+        except (OSError, ValueError) as e:
+            logger.error("Could not send update %s to shard %d: %s",
+                         update.update_id, index, e)
+        return index
+
+    def route(self, update, context):
+        """ Handler that sends every update to its shard and stops there """
+        self.dispatch(update)
+        raise DispatcherHandlerStop()
+
+    def stop(self, timeout=10):
+        """ Stops the shards after they took the updates sent so far """
+        self._stopping = True
+        for index, connection in enumerate(self.connections):
+            if connection is None:
+                continue
+            # A dispatch() stuck on a shard that stopped taking updates
+            # holds the lock; that shard is killed below
+            if not self._send_locks[index].acquire(timeout=timeout):
+                continue
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            finally:
+                self._send_locks[index].release()
+
+        for process in self.processes:
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+        for connection in self.connections:
+            if connection is not None:
+                connection.close()
+
+        if self._directory:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+
+def check_storage(count, storage=STORAGE):
+    """ Several shards need a storage they all see """
+    if count > 1 and storage == 'memory':
+        raise ValueError("STORAGE=memory is private to each process; "
+                         "SHARDS=%d needs mongo or sqlite" % count)
+
+
+def main(count=SHARDS):
+    """
+    Runs the bot as the ingress process of count shards. The ingress only
+    routes updates: it never sets up the storage, so it has no background
+    writers or card counter of its own.
+    """
+    check_storage(count)
+
+    from shared_vars import dispatcher, updater
+    from start_bot import start_bot
+
+    ingress = Ingress(count)
+    ingress.start()
+    dispatcher.add_handler(TypeHandler(Update, ingress.route), group=-1)
+    try:
+        start_bot(updater)
+        updater.idle()
+    finally:
+        ingress.stop()
+
+
+_connection = None
+_send_lock = threading.Lock()
+
+
+def report(message):
+    """ Sends a message from a shard to the ingress """
+    with _send_lock:
+        _connection.send(message)
+
+
+def run_shard(index, address, setup):
+    """ The main loop of a shard process """
+    global _connection
+
+    authkey = bytes.fromhex(os.environ[AUTHKEY_ENV])
+    _connection = Client(address, 'AF_UNIX', authkey=authkey)
+
+    from shared_vars import gm, updater
+    from start_bot import start_dispatcher
+
+    gm.current_listeners.append(
+        lambda user_id, chat_id: report(('current', user_id, chat_id)))
+
+    module, _, function = setup.partition(':')
+    getattr(importlib.import_module(module), function)(index)
+
+    start_dispatcher(updater)
+    report(('hello', index))
+
+    try:
+        while True:
+            try:
+                data = _connection.recv()
+            except EOFError:
+                break
+            if data is None:
+                break
+            updater.update_queue.put(Update.de_json(data, updater.bot))
+    finally:
+        updater.stop()
+        _connection.close()
+
+
+if __name__ == '__main__':
+    # Started by Ingress as: shards.py <index> <address> <setup>. The
+    # importable module is used, so report() sees the connection.
+    import shards
+    shards.run_shard(int(sys.argv[1]), sys.argv[2], sys.argv[3])
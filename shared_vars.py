@@ -24,9 +24,9 @@ import os
 from telegram.ext import Updater
 
 from game_manager import GameManager
-# Bütün data indi MongoDB-də saxlanılır (bax: database.py, user_setting.py,
-# broadcast_store.py). SQLite/Pony bind-i artıq lazım deyil.
-from database import db
+# Data storage.py-dakı backend-də saxlanılır (STORAGE=mongo/sqlite/memory);
+# user_setting.py və broadcast_store.py onu storage.get_storage() ilə alır,
+# burada heç bir bind lazım deyil.
 
 gm = GameManager()
 updater = Updater(token=TOKEN, workers=WORKERS, use_context=True)
@@ -3,8 +3,12 @@ import re
 from telegram import ParseMode, Update
 from telegram.ext import CommandHandler, CallbackContext
 
-from user_setting import UserSetting, users_collection
+import database
+from config import SUDO_USERS
+from user_setting import UserSetting
+from leaderboard import leaderboard
 from levels import compute_level, LEVELS
+from outbox import LOBBY
 from utils import send_async
 from shared_vars import dispatcher
 from internationalization import _, user_locale
@@ -51,15 +55,10 @@ def help_handler(update: Update, context: CallbackContext):
       "✅ /open — Oyuna girişləri aç\n"
       "🛑 /stop — Oyunu dayandır\n")
 
-    def _send():  
-      update.message.chat.send_message(  
-          help_text,  
-          parse_mode=ParseMode.HTML,  
-          disable_web_page_preview=True,  
-      )  
-      send_promotion(update.effective_chat)  
-
-    context.dispatcher.run_async(_send)
+    send_async(context.bot, update.message.chat_id, text=help_text,
+               parse_mode=ParseMode.HTML, disable_web_page_preview=True,
+               priority=LOBBY)
+    send_promotion(update.effective_chat)
 
 @user_locale
 def modes(update: Update, context: CallbackContext):
@@ -72,7 +71,7 @@ def modes(update: Update, context: CallbackContext):
       "To change the game mode, the GAME CREATOR has to type the bot nickname and a space, "
       "just like when playing a card, and all gamemode options should appear.")
     send_async(context.bot, update.message.chat_id, text=modes_explanation,
-              parse_mode=ParseMode.HTML, disable_web_page_preview=True) 
+              parse_mode=ParseMode.HTML, disable_web_page_preview=True, priority=LOBBY) 
 
 @user_locale
 def source(update: Update, context: CallbackContext):
@@ -90,14 +89,14 @@ def source(update: Update, context: CallbackContext):
  
     send_async(context.bot, update.message.chat_id, text=source_text + '\n' +  
                                              attributions,  
-               parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+               parse_mode=ParseMode.HTML, disable_web_page_preview=True, priority=LOBBY)
 
 @user_locale
 def news(update: Update, context: CallbackContext):
     """Handler for the /news command"""
     send_async(context.bot, update.message.chat_id,
                text=_("All news here: https://telegram.me/unobotnews"),
-               disable_web_page_preview=True)
+               disable_web_page_preview=True, priority=LOBBY)
 
 @user_locale
 def profile_handler(update: Update, context: CallbackContext):
@@ -107,10 +106,11 @@ def profile_handler(update: Update, context: CallbackContext):
 
     games_played = int(getattr(us, "games_played", 0) or 0) if us else 0
     first_places = int(getattr(us, "first_places", 0) or 0) if us else 0
+    total_points = int(getattr(us, "total_points", 0) or 0) if us else 0
 
     if games_played == 0:
         send_async(context.bot, update.message.chat_id,
-                   text=_("Siz hələ heç bir oyun oynamamısınız. Əvvəlcə ən azından bir oyun oynayın qrupda dostlarnızla: /uno yazaraq oyun başladın!"))
+                   text=_("Siz hələ heç bir oyun oynamamısınız. Əvvəlcə ən azından bir oyun oynayın qrupda dostlarnızla: /uno yazaraq oyun başladın!"), priority=LOBBY)
         return
 
     level, rank_name = compute_level(first_places)
@@ -121,42 +121,47 @@ def profile_handler(update: Update, context: CallbackContext):
         f"⭐ Səviyyə: {level}\n\n"
         f"🎮 Oyun: {games_played}\n"
         f"🏆 Qələbə: {first_places}\n"
+        f"💯 Xal: {total_points}\n"
     )
 
-    send_async(context.bot, update.message.chat_id, text=profile_text)
+    send_async(context.bot, update.message.chat_id, text=profile_text, priority=LOBBY)
 
 
 @user_locale
 def rating_leaderboard(update: Update, context: CallbackContext):
     """Handler for the /rating command - ən çox qələbə qazanan 25 oyunçu"""
-    if users_collection is None:
+    if not leaderboard.available():
         send_async(context.bot, update.message.chat_id,
-                   text=_("Reytinq siyahısı hazırda əlçatan deyil."))
+                   text=_("Reytinq siyahısı hazırda əlçatan deyil."), priority=LOBBY)
         return
 
+    # Siyahı və hazır mətn yaddaşdadır (bax: leaderboard.py)
     try:
-        docs = list(users_collection.find({}).sort("first_places", -1).limit(100))
+        rating_message = leaderboard.text(_.code, render_rating)
     except Exception:
         send_async(context.bot, update.message.chat_id,
-                   text=_("Reytinq siyahısı hazırda əlçatan deyil."))
+                   text=_("Reytinq siyahısı hazırda əlçatan deyil."), priority=LOBBY)
         return
 
-    top = [d for d in docs if int(d.get("first_places", 0) or 0) > 0][:25]
-
-    if not top:
+    if not rating_message:
         send_async(context.bot, update.message.chat_id,
-                   text=_("Reytinq siyahısı hələ boşdur. Oyun oynayın və qalib gəlin!"))
+                   text=_("Reytinq siyahısı hələ boşdur. Oyun oynayın və qalib gəlin!"), priority=LOBBY)
         return
 
+    send_async(context.bot, update.message.chat_id, text=rating_message,
+               parse_mode=ParseMode.MARKDOWN, priority=LOBBY)
+
+
+def render_rating(rows):
+    """Leaderboard sətirlərindən /rating mətni; siyahı boşdursa ''."""
+    if not rows:
+        return ""
+
     rating_message = "👑 *UNO Reytinq Siyahısı:*\n\n"
-    for i, doc in enumerate(top, start=1):
-        name = escape_markdown_symbols(doc.get("name") or "Anonim")
-        wins = int(doc.get("first_places", 0) or 0)
-        level, rank_name = compute_level(wins)
+    for i, (wins, name, _id, level, rank_name) in enumerate(rows, start=1):
+        name = escape_markdown_symbols(name or "Anonim")
         rating_message += f"{i}. {name} — {rank_name} ⭐{level} — *{wins} qələbə*\n"
-
-    send_async(context.bot, update.message.chat_id, text=rating_message,
-               parse_mode=ParseMode.MARKDOWN)
+    return rating_message
 
 
 @user_locale
@@ -179,7 +184,24 @@ def ranks_handler(update: Update, context: CallbackContext):
                  "əmri ilə görə bilərsiniz.")
 
     send_async(context.bot, update.message.chat_id, text="\n".join(lines),
-               parse_mode=ParseMode.MARKDOWN)
+               parse_mode=ParseMode.MARKDOWN, priority=LOBBY)
+
+
+def db_stats_handler(update: Update, context: CallbackContext):
+    """Handler for the /dbstats command - Mongo bağlantı hovuzunun istifadəsi (yalnız adminlər)"""
+    msg = update.message
+    if str(msg.from_user.id) not in SUDO_USERS:
+        msg.reply_text("⛔ Bu əmr yalnız adminlər üçündür.")
+        return
+
+    if not database.connected():
+        msg.reply_text("Mongo bağlantısı yoxdur.")
+        return
+
+    lines = ["📊 Mongo bağlantı hovuzu:"]
+    lines += [f"{name}: {value}"
+              for name, value in database.pool_stats().items()]
+    msg.reply_text("\n".join(lines))
 
 
 def register():
@@ -190,3 +212,4 @@ def register():
     dispatcher.add_handler(CommandHandler('profile', profile_handler))
     dispatcher.add_handler(CommandHandler('rutbeler', ranks_handler))
     dispatcher.add_handler(CommandHandler('modesdkdk', modes))
+    dispatcher.add_handler(CommandHandler('dbstats', db_stats_handler))
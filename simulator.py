@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Plays complete games without Telegram.
+
+The simulator drives Game, Player, Deck and actions.py the same way the
+inline query and chosen result handlers in bot.py do, and sends every
+message to a FakeBot. See benchmarks/gameplay.py for the command line
+harness.
+"""
+
+import itertools
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+# shared_vars creates the Updater on import, which only needs a well-formed
+# token as long as nothing is sent to Telegram
+os.environ.setdefault('TOKEN', '123456:SIMULATOR')
+# The fake bot has no rate limits, so the outbox need not wait for any
+for name in ('OUTBOX_GLOBAL_RATE', 'OUTBOX_GROUP_RATE',
+             'OUTBOX_PRIVATE_RATE', 'OUTBOX_BROADCAST_RATE'):
+    os.environ.setdefault(name, '0')
+
+from telegram import Chat, Update, User
+
+import actions
+import card as c
+import results
+from game import Game
+from internationalization import _
+from player import Player
+from shared_vars import dispatcher, gm
+
+MODES = ('classic', 'fast', 'wild', 'text')
+
+# Results that only show information
+_INFO_RESULTS = ('gameinfo', 'hand', 'nogame')
+
+
+class FakeBot(object):
+    """Stands in for telegram.Bot and remembers what would have been sent"""
+
+    id = 123456
+    username = 'simulator_bot'
+    defaults = None
+
+    def __init__(self, history=1000):
+        self.counts = Counter()
+        self.calls = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._message_id = 0
+
+    def _record(self, method, kwargs):
+        with self._lock:
+            self.counts[method] += 1
+            self.calls.append((method, kwargs))
+            self._message_id += 1
+            return SimpleNamespace(message_id=self._message_id)
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        return self._record('send_message',
+                            dict(kwargs, chat_id=chat_id, text=text))
+
+    def send_sticker(self, chat_id=None, sticker=None, **kwargs):
+        return self._record('send_sticker',
+                            dict(kwargs, chat_id=chat_id, sticker=sticker))
+
+    def answer_inline_query(self, inline_query_id=None, results=None,
+                            **kwargs):
+        return self._record('answer_inline_query',
+                            dict(kwargs, inline_query_id=inline_query_id,
+                                 results=results))
+
+    def edit_message_text(self, **kwargs):
+        return self._record('edit_message_text', kwargs)
+
+    def delete_message(self, chat_id=None, message_id=None, **kwargs):
+        return self._record('delete_message',
+                            dict(kwargs, chat_id=chat_id,
+                                 message_id=message_id))
+
+    def forward_message(self, chat_id=None, from_chat_id=None,
+                        message_id=None, **kwargs):
+        return self._record('forward_message',
+                            dict(kwargs, chat_id=chat_id,
+                                 from_chat_id=from_chat_id,
+                                 message_id=message_id))
+
+    def get_chat_administrators(self, chat_id, **kwargs):
+        return list()
+
+    sendMessage = send_message
+    sendSticker = send_sticker
+    answerInlineQuery = answer_inline_query
+
+
+class FunctionTimer(object):
+    """Adds up the calls and the time spent in selected functions"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.seconds = defaultdict(float)
+
+    @contextmanager
+    def patch(self, owner, name, label=None):
+        """Times owner.name (a class or module attribute) while active"""
+        label = label or name
+        original = getattr(owner, name)
+        calls = self.calls
+        seconds = self.seconds
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                seconds[label] += time.perf_counter() - start
+                calls[label] += 1
+
+        setattr(owner, name, timed)
+        try:
+            yield
+        finally:
+            setattr(owner, name, original)
+
+
+class Report(object):
+    """Outcome of a simulator run"""
+
+    def __init__(self):
+        self.games = 0
+        self.finished = 0
+        self.turns = 0
+        self.seconds = 0.0
+        self.timer = None
+
+    @property
+    def games_per_second(self):
+        return self.games / self.seconds if self.seconds else 0.0
+
+    @property
+    def turns_per_second(self):
+        return self.turns / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        lines = ['%d games (%d finished), %d turns in %.2fs' %
+                 (self.games, self.finished, self.turns, self.seconds),
+                 '%.1f games/s, %.1f turns/s' %
+                 (self.games_per_second, self.turns_per_second)]
+
+        if self.timer:
+            for label, seconds in sorted(self.timer.seconds.items(),
+                                         key=lambda item: -item[1]):
+                calls = self.timer.calls[label]
+                lines.append('  %-18s %8d calls %9.3fs %8.2f µs/call' %
+                             (label, calls, seconds, seconds / calls * 1e6))
+
+        return '\n'.join(lines)
+
+
+def random_strategy(player, options, rng):
+    """Plays a random card if there is one, otherwise draws or passes"""
+    colors = [option for option in options if option in c.COLORS]
+    if colors:
+        return rng.choice(colors)
+
+    cards = [option for option in options
+             if option not in ('draw', 'pass', 'call_bluff')]
+    if cards and rng.random() < 0.9:
+        return rng.choice(cards)
+
+    return rng.choice(options)
+
+
+def scripted_strategy(moves, fallback=random_strategy):
+    """
+    Plays the given result ids in order, as long as they are legal, and
+    falls back to another strategy for everything else
+    """
+    moves = deque(moves)
+
+    def strategy(player, options, rng):
+        if moves and moves[0] in options:
+            return moves.popleft()
+        return fallback(player, options, rng)
+
+    return strategy
+
+
+class Simulator(object):
+    """
+    Plays games through the global GameManager. Use it as a context manager,
+    so the dispatcher threads that deliver the messages are stopped again.
+    """
+
+    def __init__(self, bot=None, strategy=random_strategy, seed=None,
+                 max_turns=2000, timer=None):
+        self.bot = bot or FakeBot()
+        self.strategy = strategy
+        self.rng = random.Random(seed)
+        self.max_turns = max_turns
+        self.timer = timer
+
+        if seed is not None:
+            # The deck is shuffled with the global random module
+            random.seed(seed)
+
+        self._ids = itertools.count(2)
+        self._dispatcher_thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """Starts the dispatcher for the jobs started with run_async"""
+        if dispatcher.running:
+            return
+
+        # The worker threads are named after the bot id, which the real bot
+        # would fetch with getMe
+        if getattr(dispatcher.bot, '_bot', None) is None:
+            dispatcher.bot._bot = User(FakeBot.id, 'Simulator', True,
+                                       username=FakeBot.username)
+
+        ready = threading.Event()
+        self._dispatcher_thread = threading.Thread(
+            target=dispatcher.start, kwargs={'ready': ready},
+            name='simulator_dispatcher', daemon=True)
+        self._dispatcher_thread.start()
+        ready.wait()
+
+    def stop(self):
+        if self._dispatcher_thread:
+            dispatcher.stop()
+            self._dispatcher_thread.join()
+            self._dispatcher_thread = None
+
+    def _new_id(self):
+        return next(self._ids)
+
+    def new_game(self, mode='classic', players=4):
+        """Creates a game, lets players join and deals the first hands"""
+        chat = Chat(-self._new_id(), 'group', title='Simulator',
+                    bot=self.bot)
+        game = gm.new_game(chat)
+        game.mode = mode
+
+        for i in range(players):
+            user_id = self._new_id()
+            user = User(user_id, 'Player %d' % i, False)
+            if not i:
+                game.starter = user
+                game.owner = {user_id}
+            gm.join_game(user, chat)
+
+        game.start()
+        for player in game.players:
+            player.draw_first_hand()
+
+        return game
+
+    def options(self, player):
+        """Builds the inline results the player would see right now"""
+        options = list()
+        results.add_player_options(player, options)
+        return [result.id for result in options
+                if result.id not in _INFO_RESULTS and
+                not result.id.startswith(results.GREY_PREFIX)]
+
+    def apply(self, player, result_id):
+        """Carries out a chosen result like bot.process_result does"""
+        game = player.game
+        player.anti_cheat += 1
+
+        if result_id == 'call_bluff':
+            actions.do_call_bluff(self.bot, player)
+        elif result_id == 'draw':
+            actions.do_draw(self.bot, player)
+        elif result_id == 'pass':
+            game.turn()
+        elif result_id in c.COLORS:
+            game.choose_color(result_id)
+        else:
+            actions.do_play_card(self.bot, player, result_id)
+
+        if gm.is_running(game):
+            actions.send_next_player(self.bot, game)
+
+    def play_game(self, mode='classic', players=4):
+        """Plays one game to the end, returns (turns, finished)"""
+        _.push('en_US')
+        try:
+            game = self.new_game(mode, players)
+
+            turns = 0
+            while gm.is_running(game):
+                if turns >= self.max_turns:
+                    gm.remove_game(game)
+                    return turns, False
+
+                player = game.current_player
+                options = self.options(player)
+                self.apply(player,
+                           self.strategy(player, options, self.rng))
+                turns += 1
+
+            return turns, True
+        finally:
+            _.pop()
+
+    def run(self, games, modes=MODES, players=range(2, 11)):
+        """Plays a number of games, cycling through modes and player counts"""
+        report = Report()
+        modes = list(modes)
+        players = list(players)
+
+        with self._timed():
+            start = time.perf_counter()
+            for i in range(games):
+                turns, finished = self.play_game(
+                    modes[i % len(modes)], players[i % len(players)])
+                report.games += 1
+                report.finished += finished
+                report.turns += turns
+            report.seconds = time.perf_counter() - start
+
+        report.timer = self.timer
+        return report
+
+    def run_concurrent(self, games, threads=8, modes=MODES,
+                       players=range(2, 11), tables=None, skip_chance=0.0):
+        """
+        Plays a number of games from several threads at once through the
+        real handlers of bot.py: every move is an update for
+        dispatcher.process_update, so the games run in the chat queues of
+        utils.game_serial on the dispatcher workers, with ASYNC_GAME_HANDLERS
+        on. Up to `tables` games are running at any time. A thread picks a
+        game that has handled its last updates and sends the current player's
+        chosen result, an inline query of another player and, with
+        skip_chance, a /skip right after it, which must run in that order.
+        """
+        import bot  # noqa: F401 - registers the handlers on the dispatcher
+        import utils
+
+        report = Report()
+        modes = list(modes)
+        players = list(players)
+        tables = tables or threads * 2
+
+        state = threading.Condition()
+        idle = list()
+        busy = set()
+        turns = dict()
+        created = [0]
+        errors = list()
+        failed = threading.Event()
+        update_ids = itertools.count(1)
+
+        def on_error(update, context):
+            errors.append(context.error)
+            failed.set()
+
+        def finish(game, finished):
+            with state:
+                busy.discard(game)
+                report.turns += turns.pop(game)
+                report.finished += finished
+                state.notify_all()
+
+        def handled(game, player, anti_cheat):
+            """ Runs in the chat queue after the updates of a move """
+            try:
+                # The chosen result ran first and was accepted
+                if player.anti_cheat != anti_cheat + 1:
+                    raise AssertionError(
+                        'The move of player %d was not handled in order' %
+                        player.user.id)
+
+                if not gm.is_running(game):
+                    finish(game, True)
+                elif turns[game] >= self.max_turns:
+                    with gm.chat_lock(game.chat.id):
+                        gm.remove_game(game)
+                    finish(game, False)
+                else:
+                    with state:
+                        busy.discard(game)
+                        idle.append(game)
+                        state.notify_all()
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+
+        def send(data):
+            data['update_id'] = next(update_ids)
+            dispatcher.process_update(Update.de_json(data, self.bot))
+
+        def user_data(user):
+            return {'id': user.id, 'first_name': user.first_name,
+                    'is_bot': False}
+
+        def move(game):
+            """ Sends the updates of one move, while the game is idle """
+            turns[game] += 1
+            player = game.current_player
+            anti_cheat = player.anti_cheat
+            result_id = self.strategy(player, self.options(player), self.rng)
+            others = [p for p in game.players if p is not player]
+
+            send({'chosen_inline_result': {
+                'result_id': '%s:%d' % (result_id, anti_cheat),
+                'from': user_data(player.user), 'query': ''}})
+            send({'inline_query': {
+                'id': str(self._new_id()), 'query': '', 'offset': '',
+                'from': user_data(self.rng.choice(others).user)}})
+            if len(game.players) > 2 and self.rng.random() < skip_chance:
+                send({'message': {
+                    'message_id': self._new_id(), 'date': 0, 'text': '/skip',
+                    'entities': [{'type': 'bot_command', 'offset': 0,
+                                  'length': 5}],
+                    'chat': {'id': game.chat.id, 'type': 'group',
+                             'title': game.chat.title},
+                    'from': user_data(self.rng.choice(others).user)}})
+
+            utils.chat_queues.submit(game.chat.id,
+                                     lambda: handled(game, player, anti_cheat))
+
+        def worker():
+            _.push('en_US')
+            try:
+                while not failed.is_set():
+                    index = game = None
+                    with state:
+                        if created[0] < games and len(busy) + len(idle) < tables:
+                            index = created[0]
+                            created[0] += 1
+                        elif idle:
+                            game = idle.pop(self.rng.randrange(len(idle)))
+                            busy.add(game)
+                        elif busy:
+                            state.wait(0.1)
+                            continue
+                        else:
+                            return
+
+                    if index is not None:
+                        game = self.new_game(modes[index % len(modes)],
+                                             players[index % len(players)])
+                        with state:
+                            turns[game] = 0
+                            idle.append(game)
+                            report.games += 1
+                            state.notify_all()
+                        continue
+
+                    move(game)
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+            finally:
+                _.pop()
+
+        workers = [threading.Thread(target=worker,
+                                    name='simulator_%d' % i, daemon=True)
+                   for i in range(threads)]
+
+        real_bot, async_handlers = dispatcher.bot, utils.ASYNC_GAME_HANDLERS
+        dispatcher.bot = self.bot
+        utils.ASYNC_GAME_HANDLERS = True
+        dispatcher.add_error_handler(on_error)
+        start = time.perf_counter()
+        try:
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+        finally:
+            report.seconds = time.perf_counter() - start
+            dispatcher.remove_error_handler(on_error)
+            dispatcher.bot = real_bot
+            utils.ASYNC_GAME_HANDLERS = async_handlers
+
+        if errors:
+            raise errors[0]
+
+        return report
+
+    @contextmanager
+    def _timed(self):
+        if not self.timer:
+            yield
+            return
+
+        with self.timer.patch(Player, 'playable_cards'), \
+                self.timer.patch(Game, 'play_card'), \
+                self.timer.patch(Game, 'turn'), \
+                self.timer.patch(Simulator, 'options', 'build_results'):
+            yield
@@ -17,9 +17,146 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-# Modify this file if you want a different startup sequence, for example using
-# a Webhook
+
+"""
+Starts receiving updates, by long polling or, if WEBHOOK_URL is set, with a
+webhook.
+
+In webhook mode Telegram posts every update to WEBHOOK_URL, and a reverse
+proxy forwards it to the small HTTP server below, which listens on
+WEBHOOK_LISTEN:WEBHOOK_PORT and only accepts posts to WEBHOOK_PATH. The
+server of python-telegram-bot 13 cannot check the secret token and blocks
+when the update queue is full, so this one is used instead: it rejects
+requests without WEBHOOK_SECRET and answers 503 when UPDATE_QUEUE_SIZE
+updates are waiting, so Telegram sends the update again later.
+"""
+
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Full
+
+from telegram import Update
+
+from config import WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, \
+    WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, UPDATE_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Updates are a few kilobytes at most
+MAX_BODY = 1 << 20
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """ Puts the updates Telegram posts into the update queue """
+
+    def do_POST(self):
+        server = self.server
+
+        if self.path != server.path:
+            return self._reply(404)
+
+        if server.secret and not hmac.compare_digest(
+                self.headers.get(SECRET_HEADER, ''), server.secret):
+            return self._reply(403)
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if not 0 < length <= MAX_BODY:
+            return self._reply(413 if length else 400)
+
+        try:
+            data = json.loads(self.rfile.read(length).decode('utf-8'))
+            update = Update.de_json(data, server.bot)
+        except (ValueError, TypeError, KeyError):
+            return self._reply(400)
+
+        try:
+            server.update_queue.put_nowait(update)
+        except Full:
+            server.rejected += 1
+            return self._reply(503)
+
+        server.received += 1
+        self._reply(200)
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug("Webhook: " + format, *args)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """ HTTP server for the webhook, one thread per open connection """
+
+    daemon_threads = True
+    # Telegram opens up to 100 connections at once (socketserver's default
+    # backlog is 5)
+    request_queue_size = 128
+
+    def __init__(self, address, path, secret, bot, update_queue):
+        super(WebhookServer, self).__init__(address, WebhookHandler)
+        self.path = path if path.startswith('/') else '/' + path
+        self.secret = secret
+        self.bot = bot
+        self.update_queue = update_queue
+        self.received = 0
+        self.rejected = 0
+
+
+def start_dispatcher(updater):
+    """
+    Starts the job queue and the dispatcher without fetching any updates,
+    for updates that are put in updater.update_queue by someone else.
+    updater.stop() stops them again.
+    """
+    # The dispatcher takes updates from this queue; bounding it makes the
+    # webhook reject updates (and long polling or a shard's ingress wait)
+    # when it falls behind
+    updater.update_queue.maxsize = UPDATE_QUEUE_SIZE
+
+    updater.job_queue.start()
+    ready = threading.Event()
+    threading.Thread(target=updater.dispatcher.start,
+                     kwargs={'ready': ready}, name='dispatcher').start()
+    ready.wait()
+    updater.running = True
+
+
+def start_webhook(updater, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT,
+                  path=WEBHOOK_PATH, url=WEBHOOK_URL, secret=WEBHOOK_SECRET,
+                  max_connections=WEBHOOK_MAX_CONNECTIONS):
+    """
+    Starts the dispatcher, the job queue and the webhook server, then tells
+    Telegram where to send the updates. updater.stop() (e.g. from
+    updater.idle()) stops them again.
+    """
+    server = WebhookServer((listen, port), path, secret, updater.bot,
+                           updater.update_queue)
+
+    start_dispatcher(updater)
+    threading.Thread(target=server.serve_forever, name='webhook',
+                     daemon=True).start()
+    updater.httpd = server
+
+    updater.bot.set_webhook(url=url, max_connections=max_connections,
+                            secret_token=secret or None)
+    logger.info("Webhook is listening on %s:%d%s", listen,
+                server.server_port, server.path)
+    return server
 
 
 def start_bot(updater):
-    updater.start_polling()
+    # start_polling doesn't go through start_dispatcher
+    updater.update_queue.maxsize = UPDATE_QUEUE_SIZE
+
+    if WEBHOOK_URL:
+        start_webhook(updater)
+    else:
+        updater.start_polling()
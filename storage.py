@@ -0,0 +1,593 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+#
+# Botun saxladığı bütün məlumatlar (istifadəçi ayarları/statistikası,
+# broadcast siyahıları) bu interfeys vasitəsilə yazılıb oxunur. Üç
+# realizasiya var və config.py-dəki STORAGE ilə seçilir:
+#
+#   mongo  - MongoStorage, ortaq MongoClient ilə (bax: database.py)
+#   sqlite - SQLiteStorage, WAL rejimində tək fayl (SQLITE_PATH)
+#   memory - MemoryStorage, proses dayananda hər şey itir (test/benchmark)
+#
+# İstifadəçi sənədləri hər yerdə Mongo-dakı kimi {"_id": id, sahə: dəyər}
+# lüğətləridir. Səviyyə/rütbə qələbələrlə eyni yazıda hesablanır.
+
+import json
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+from pymongo import DESCENDING, DeleteOne, ReplaceOne, UpdateOne
+from pymongo.errors import OperationFailure
+
+from config import STORAGE, SQLITE_PATH
+from database import ensure_indexes, get_db, register_index
+from levels import LEVELS, compute_level
+
+logger = logging.getLogger(__name__)
+
+USERS = "user_settings"
+
+# Yalnız MongoStorage.setup() yaradır
+register_index(USERS, [("first_places", DESCENDING)])
+
+
+class Storage(ABC):
+    """
+    Saxlama interfeysi. Bütün metodlar xəta olanda istisna atır - onları
+    tutmaq çağıran kodun (fon yazıcılarının) işidir.
+    """
+
+    def setup(self):
+        """Bot başlayanda bir dəfə: indekslər, cədvəllər."""
+
+    @abstractmethod
+    def get_user(self, id):
+        """İstifadəçi sənədi və ya None."""
+
+    @abstractmethod
+    def create_user(self, id, defaults):
+        """Sənəd yoxdursa, defaults ilə yaradır; mövcud sənədi qaytarır."""
+
+    @abstractmethod
+    def set_fields(self, updates):
+        """updates: {id: {sahə: dəyər}} - sahələri təyin edir (upsert)."""
+
+    @abstractmethod
+    def add_stats(self, results):
+        """
+        results: [(id, {sahə: artım}, ad), ...] - ardıcıl tətbiq olunur,
+        səviyyə/rütbə yeni first_places-dən hesablanır.
+        """
+
+    @abstractmethod
+    def increment(self, field, counts, batch=None):
+        """
+        counts: {id: artım} - yalnız bir sayğacı artırır. batch=(yazan, id)
+        verilibsə, hər sənəddə artımla eyni yazıda yazanın son partiyası
+        qeyd olunur və eyni partiya təkrar gələndə sənəd dəyişmir.
+        """
+
+    @abstractmethod
+    def top_winners(self, limit):
+        """first_places > 0 olan ən yaxşı `limit` sənəd, azalan sırada."""
+
+    def merge_profiles(self, batch_size, on_batch=None):
+        """
+        Köhnə profil sənədlərini istifadəçi sənədlərinə birləşdirir;
+        on_batch(ids) hər partiyadan sonra çağırılır. Bitibsə True.
+        """
+        return True
+
+    def prepare_ids(self, name, legacy_field):
+        """ID siyahısını istifadədən əvvəl hazırlayır; hazırdırsa True."""
+        return True
+
+    @abstractmethod
+    def add_ids(self, name, ids):
+        """ID-ləri `name` siyahısına əlavə edir (təkrarlar bir dəfə)."""
+
+    @abstractmethod
+    def iter_ids(self, name, batch_size=1000):
+        """Siyahının ID-ləri, partiyalarla oxunur."""
+
+    @abstractmethod
+    def count_ids(self, name):
+        """Siyahıdakı ID-lərin (təxmini) sayı."""
+
+
+def _apply_stats(doc, inc, name):
+    for k, v in inc.items():
+        doc[k] = (doc.get(k) or 0) + v
+    if name:
+        doc["name"] = name
+    doc["level"], doc["rank_name"] = compute_level(doc.get("first_places")
+                                                   or 0)
+
+
+def _apply_increment(doc, field, n, batch=None):
+    if batch is not None:
+        writer, batch_id = batch
+        batches = doc.setdefault("batches", dict())
+        if batches.get(writer) == batch_id:
+            return
+        batches[writer] = batch_id
+    doc[field] = (doc.get(field) or 0) + n
+
+
+# ─── MongoDB ──────────────────────────────────────────────────────────────────
+
+def _level_switch(index, wins):
+    """Mongo ifadəsi: compute_level(wins)[index], yazı zamanı hesablanır."""
+    branches = [{"case": {"$gte": [wins, row[0]]}, "then": row[index]}
+                for row in reversed(LEVELS)]
+    return {"$switch": {"branches": branches, "default": LEVELS[0][index]}}
+
+
+def stats_update(id, inc, name=None):
+    """
+    Nəticələri mövcud dəyərlərin üstünə gələn update. Səviyyə/rütbə yeni
+    first_places-dən eyni yazıda hesablanır.
+    """
+    fields = {k: {"$add": [{"$ifNull": ["$" + k, 0]}, v]}
+              for k, v in inc.items()}
+    if name:
+        fields["name"] = name
+
+    wins = {"$ifNull": ["$first_places", 0]}
+    return UpdateOne({"_id": id}, [
+        {"$set": fields},
+        {"$set": {"level": _level_switch(1, wins),
+                  "rank_name": _level_switch(2, wins)}},
+    ], upsert=True)
+
+
+def increment_update(id, field, n, batch=None):
+    """
+    field-i n qədər artıran update. batch=(yazan, id) verilibsə, partiya
+    sənəddə artımla eyni yazıda qeyd olunur - təkrar göndərilən partiya
+    sayğacı ikinci dəfə artırmır.
+    """
+    if batch is None:
+        return UpdateOne({"_id": id}, {"$inc": {field: n}}, upsert=True)
+
+    writer, batch_id = batch
+    marker = "batches." + writer
+    applied = {"$eq": ["$" + marker, batch_id]}
+    added = {"$add": [{"$ifNull": ["$" + field, 0]}, n]}
+    return UpdateOne({"_id": id}, [
+        {"$set": {field: {"$cond": [applied, "$" + field, added]},
+                  marker: batch_id}},
+    ], upsert=True)
+
+
+def migrate_to_canonical(collection, field, migrations, batch_size=1000):
+    """
+    {"_id": ObjectId, field: id} sənədlərini {"_id": id}-yə köçürür. Hər
+    partiya əvvəlcə yeni sənədi yazır, sonra köhnəni silir - yarıda kəsilsə,
+    növbəti çağırış qalanlardan davam edir. Bitibsə True qaytarır.
+    """
+    marker = f"{collection.name}_canonical_id"
+    if migrations.find_one({"_id": marker, "done": True}):
+        return True
+
+    # Köhnə sxemin unikal indeksi sahəsiz sənədlərə mane olur
+    try:
+        collection.drop_index(f"{field}_1")
+    except OperationFailure:
+        pass
+
+    moved = 0
+    while True:
+        batch = list(collection.find({field: {"$exists": True}},
+                                     {field: 1}).limit(batch_size))
+        if not batch:
+            break
+
+        requests = list()
+        for doc in batch:
+            id = doc[field]
+            if doc["_id"] == id:
+                requests.append(UpdateOne({"_id": id},
+                                          {"$unset": {field: ""}}))
+            else:
+                requests.append(ReplaceOne({"_id": id}, {"_id": id},
+                                           upsert=True))
+                requests.append(DeleteOne({"_id": doc["_id"]}))
+        collection.bulk_write(requests, ordered=True)
+        moved += len(batch)
+
+    migrations.update_one({"_id": marker}, {"$set": {"done": True}},
+                          upsert=True)
+    logger.info(f"{collection.name}: {moved} sənəd _id sxeminə köçürüldü.")
+    return True
+
+
+def profile_merge(profile):
+    """
+    Köhnə mongo_db.py "profiles" sənədini ({user_id, name, total_points,
+    games_played, wins}) user_settings-ə birləşdirən iki update. Hər iki
+    sistem eyni oyunları saydığı üçün oyun/qələbə sayının böyüyü götürülür,
+    xallar isə (user_settings-də əvvəllər yox idi) əlavə olunur.
+    merged_profile bayrağı təkrar işə salınanda ikinci dəfə əlavəyə mane
+    olur.
+    """
+    id = profile["user_id"]
+    name = profile.get("name") or ""
+
+    def maximum(field, value):
+        return {"$max": [{"$ifNull": ["$" + field, 0]}, value or 0]}
+
+    wins = {"$ifNull": ["$first_places", 0]}
+    return [
+        UpdateOne({"_id": id}, {"$setOnInsert": {"name": name}}, upsert=True),
+        UpdateOne({"_id": id, "merged_profile": {"$ne": True}}, [
+            {"$set": {
+                "first_places": maximum("first_places", profile.get("wins")),
+                "games_played": maximum("games_played",
+                                        profile.get("games_played")),
+                "total_points": {"$add": [{"$ifNull": ["$total_points", 0]},
+                                          profile.get("total_points") or 0]},
+                "name": {"$cond": [{"$eq": [{"$ifNull": ["$name", ""]}, ""]},
+                                   name, "$name"]},
+                "merged_profile": True,
+            }},
+            {"$set": {"level": _level_switch(1, wins),
+                      "rank_name": _level_switch(2, wins)}},
+        ]),
+    ]
+
+
+def merge_profiles(db, batch_size, on_batch=None):
+    """
+    "profiles" kolleksiyasını _id sırası ilə partiyalarla user_settings-ə
+    köçürür. Son köçürülmüş _id "migrations"-da saxlanılır - bot işləyərkən
+    (online) və yarıda kəsiləndən sonra davam edə bilir.
+    """
+    migrations = db["migrations"]
+    marker = "profiles_merged"
+    state = migrations.find_one({"_id": marker}) or {}
+    if state.get("done"):
+        return True
+
+    last = state.get("last")
+    merged = 0
+    while True:
+        query = {"_id": {"$gt": last}} if last is not None else {}
+        batch = list(db["profiles"].find(query).sort("_id", 1)
+                     .limit(batch_size))
+        if not batch:
+            break
+
+        requests = list()
+        for profile in batch:
+            if profile.get("user_id") is not None:
+                requests.extend(profile_merge(profile))
+        if requests:
+            db[USERS].bulk_write(requests, ordered=True)
+
+        last = batch[-1]["_id"]
+        migrations.update_one({"_id": marker}, {"$set": {"last": last}},
+                              upsert=True)
+        merged += len(batch)
+        if on_batch is not None:
+            on_batch([profile["user_id"] for profile in batch
+                      if profile.get("user_id") is not None])
+
+    migrations.update_one({"_id": marker}, {"$set": {"done": True}},
+                          upsert=True)
+    logger.info(f"profiles: {merged} profil user_settings-ə birləşdirildi.")
+    return True
+
+
+class MongoStorage(Storage):
+
+    def __init__(self, db):
+        self.db = db
+        self.users = db[USERS]
+
+    def setup(self):
+        ensure_indexes()
+
+    def get_user(self, id):
+        return self.users.find_one({"_id": id})
+
+    def create_user(self, id, defaults):
+        doc = dict(defaults)
+        doc["_id"] = id
+        self.users.update_one({"_id": id}, {"$setOnInsert": doc}, upsert=True)
+        return self.users.find_one({"_id": id}) or doc
+
+    def set_fields(self, updates):
+        self.users.bulk_write(
+            [UpdateOne({"_id": id}, {"$set": fields}, upsert=True)
+             for id, fields in updates.items()],
+            ordered=False)
+
+    def add_stats(self, results):
+        self.users.bulk_write(
+            [stats_update(id, inc, name) for id, inc, name in results],
+            ordered=True)
+
+    def increment(self, field, counts, batch=None):
+        self.users.bulk_write(
+            [increment_update(id, field, n, batch)
+             for id, n in counts.items()],
+            ordered=False)
+
+    def top_winners(self, limit):
+        return list(self.users.find(
+            {"first_places": {"$gt": 0}},
+            {"first_places": 1, "name": 1},
+        ).sort("first_places", DESCENDING).limit(limit))
+
+    def merge_profiles(self, batch_size, on_batch=None):
+        return merge_profiles(self.db, batch_size, on_batch)
+
+    def prepare_ids(self, name, legacy_field):
+        return migrate_to_canonical(self.db[name], legacy_field,
+                                    self.db["migrations"])
+
+    def add_ids(self, name, ids):
+        self.db[name].bulk_write(
+            [ReplaceOne({"_id": id}, {"_id": id}, upsert=True)
+             for id in ids],
+            ordered=False)
+
+    def iter_ids(self, name, batch_size=1000):
+        for doc in self.db[name].find({}, {"_id": 1}, batch_size=batch_size):
+            yield doc["_id"]
+
+    def count_ids(self, name):
+        return self.db[name].estimated_document_count()
+
+
+# ─── SQLite ───────────────────────────────────────────────────────────────────
+
+# ID siyahıları üçün icazə verilən cədvəllər (ad SQL-ə birbaşa düşür)
+ID_TABLES = ("chats", "broadcast_users")
+
+
+class SQLiteStorage(Storage):
+    """
+    Tək fayl, WAL rejimi. Sənəd JSON kimi saxlanılır, first_places isə
+    reytinq indeksi üçün ayrıca sütundadır. Bir bağlantı, bir kilid.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self.setup()
+
+    def setup(self):
+        with self._lock:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {USERS} ("
+                "id INTEGER PRIMARY KEY, "
+                "first_places INTEGER NOT NULL DEFAULT 0, "
+                "doc TEXT NOT NULL)")
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {USERS}_first_places "
+                f"ON {USERS} (first_places DESC)")
+            for name in ID_TABLES:
+                self._conn.execute(f"CREATE TABLE IF NOT EXISTS {name} "
+                                   "(id INTEGER PRIMARY KEY)")
+
+    def _load(self, id):
+        row = self._conn.execute(f"SELECT doc FROM {USERS} WHERE id = ?",
+                                 (id,)).fetchone()
+        if row is None:
+            return None
+        doc = json.loads(row[0])
+        doc["_id"] = id
+        return doc
+
+    def _save(self, doc):
+        fields = {k: v for k, v in doc.items() if k != "_id"}
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {USERS} (id, first_places, doc) "
+            "VALUES (?, ?, ?)",
+            (doc["_id"], fields.get("first_places") or 0,
+             json.dumps(fields)))
+
+    def _update(self, changes):
+        """changes: [(id, funksiya(sənəd))] - bir tranzaksiyada."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for id, change in changes:
+                    doc = self._load(id) or {"_id": id}
+                    change(doc)
+                    self._save(doc)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get_user(self, id):
+        with self._lock:
+            return self._load(id)
+
+    def create_user(self, id, defaults):
+        with self._lock:
+            doc = self._load(id)
+            if doc is None:
+                doc = dict(defaults)
+                doc["_id"] = id
+                self._save(doc)
+            return doc
+
+    def set_fields(self, updates):
+        self._update([(id, lambda doc, fields=fields: doc.update(fields))
+                      for id, fields in updates.items()])
+
+    def add_stats(self, results):
+        self._update([(id, lambda doc, inc=inc, name=name:
+                       _apply_stats(doc, inc, name))
+                      for id, inc, name in results])
+
+    def increment(self, field, counts, batch=None):
+        self._update([(id, lambda doc, n=n:
+                       _apply_increment(doc, field, n, batch))
+                      for id, n in counts.items()])
+
+    def top_winners(self, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, doc FROM {USERS} WHERE first_places > 0 "
+                "ORDER BY first_places DESC LIMIT ?", (limit,)).fetchall()
+        docs = list()
+        for id, doc in rows:
+            doc = json.loads(doc)
+            doc["_id"] = id
+            docs.append(doc)
+        return docs
+
+    def add_ids(self, name, ids):
+        assert name in ID_TABLES
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO {name} (id) VALUES (?)",
+                    [(id,) for id in ids])
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def iter_ids(self, name, batch_size=1000):
+        assert name in ID_TABLES
+        last = None
+        while True:
+            with self._lock:
+                if last is None:
+                    rows = self._conn.execute(
+                        f"SELECT id FROM {name} ORDER BY id LIMIT ?",
+                        (batch_size,)).fetchall()
+                else:
+                    rows = self._conn.execute(
+                        f"SELECT id FROM {name} WHERE id > ? "
+                        "ORDER BY id LIMIT ?", (last, batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0]
+            last = rows[-1][0]
+
+    def count_ids(self, name):
+        assert name in ID_TABLES
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ─── Yaddaş ───────────────────────────────────────────────────────────────────
+
+class MemoryStorage(Storage):
+    """Hər şey lüğətlərdə; qaytarılan sənədlər surətdir."""
+
+    def __init__(self):
+        self.users = dict()
+        self.ids = dict()
+        self._lock = threading.Lock()
+
+    def get_user(self, id):
+        with self._lock:
+            doc = self.users.get(id)
+            return dict(doc) if doc is not None else None
+
+    def create_user(self, id, defaults):
+        with self._lock:
+            doc = self.users.get(id)
+            if doc is None:
+                doc = self.users[id] = dict(defaults, _id=id)
+            return dict(doc)
+
+    def _doc(self, id):
+        doc = self.users.get(id)
+        if doc is None:
+            doc = self.users[id] = {"_id": id}
+        return doc
+
+    def set_fields(self, updates):
+        with self._lock:
+            for id, fields in updates.items():
+                self._doc(id).update(fields)
+
+    def add_stats(self, results):
+        with self._lock:
+            for id, inc, name in results:
+                _apply_stats(self._doc(id), inc, name)
+
+    def increment(self, field, counts, batch=None):
+        with self._lock:
+            for id, n in counts.items():
+                _apply_increment(self._doc(id), field, n, batch)
+
+    def top_winners(self, limit):
+        with self._lock:
+            docs = [dict(doc) for doc in self.users.values()
+                    if (doc.get("first_places") or 0) > 0]
+        docs.sort(key=lambda doc: -doc["first_places"])
+        return docs[:limit]
+
+    def add_ids(self, name, ids):
+        with self._lock:
+            self.ids.setdefault(name, set()).update(ids)
+
+    def iter_ids(self, name, batch_size=1000):
+        with self._lock:
+            ids = list(self.ids.get(name, ()))
+        return iter(ids)
+
+    def count_ids(self, name):
+        with self._lock:
+            return len(self.ids.get(name, ()))
+
+
+_lock = threading.Lock()
+_storage = None
+_created = False
+
+
+def create_storage(kind=STORAGE):
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "sqlite":
+        return SQLiteStorage(SQLITE_PATH)
+    if kind == "mongo":
+        db = get_db()
+        return MongoStorage(db) if db is not None else None
+    raise ValueError(f"Naməlum STORAGE: {kind}")
+
+
+def get_storage():
+    """
+    config.STORAGE ilə seçilmiş ortaq backend, ilk çağırışda yaradılır.
+    Mongo əlçatan deyilsə None - statistika/reytinq/broadcast işləmir.
+    """
+    global _storage, _created
+    with _lock:
+        if not _created:
+            _storage = create_storage()
+            _created = True
+        return _storage
+
+
+def setup():
+    """Bot başlayanda: seçilmiş backend-in indeksləri/cədvəlləri."""
+    store = get_storage()
+    if store is not None:
+        store.setup()
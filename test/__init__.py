@@ -0,0 +1,5 @@
+import os
+
+# shared_vars creates the Updater on import, which needs a well-formed token.
+# The tests never talk to Telegram.
+os.environ.setdefault('TOKEN', '123456:TEST')
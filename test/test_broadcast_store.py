@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+import unittest
+
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+
+from broadcast_store import BloomFilter, KnownIds, ServedTracker, \
+    _iter_served
+from storage import MemoryStorage, migrate_to_canonical
+
+
+class Cursor(list):
+
+    def limit(self, n):
+        return Cursor(self[:n])
+
+
+class Collection(object):
+    """Applies bulk writes to a list of documents instead of MongoDB"""
+
+    name = 'chats'
+
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.requests = list()
+
+    def find(self, query, projection=None, batch_size=None):
+        return Cursor(doc for doc in self.docs
+                      if all(key in doc for key in query))
+
+    def find_one(self, query):
+        for doc in self.docs:
+            if all(doc.get(key) == value for key, value in query.items()):
+                return doc
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.find_one(query)
+        if doc is None:
+            doc = dict(query)
+            self.docs.append(doc)
+        doc.update(update['$set'])
+
+    def drop_index(self, name):
+        pass
+
+    def bulk_write(self, requests, ordered=True):
+        self.requests.append({request._filter['_id']
+                              for request in requests})
+        for request in requests:
+            found = [doc for doc in self.docs
+                     if doc['_id'] == request._filter['_id']]
+            if isinstance(request, DeleteOne):
+                self.docs.remove(found[0])
+            elif isinstance(request, ReplaceOne):
+                if not found:
+                    self.docs.append(dict(request._doc))
+            elif isinstance(request, UpdateOne):
+                for key in request._doc['$unset']:
+                    found[0].pop(key)
+
+
+class Storage(MemoryStorage):
+    """Records the ids of every write"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = list()
+
+    def add_ids(self, name, ids):
+        self.requests.append(set(ids))
+        super().add_ids(name, ids)
+
+
+class SlowMigration(MemoryStorage):
+    """Migrates slowly, and fails while failing is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.failing = False
+        self.running = 0
+        self.overlapped = False
+        self.calls = 0
+
+        self.add_ids('chats', [-1, -2])
+
+    def prepare_ids(self, name, legacy_field):
+        self.calls += 1
+        self.running += 1
+        self.overlapped |= self.running > 1
+        time.sleep(0.05)
+        self.running -= 1
+        if self.failing:
+            raise RuntimeError("migration failed")
+        return True
+
+
+class Test(unittest.TestCase):
+
+    def test_bloom(self):
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(-i)
+
+        self.assertTrue(all(-i in bloom for i in range(1000)))
+        false_positives = sum(i in bloom for i in range(1, 10001))
+        self.assertLess(false_positives, 100)
+
+    def test_known_ids(self):
+        # Past max_size the ids go to a Bloom filter of that size
+        known = KnownIds(2)
+        for i in (1, 2, 3):
+            known.add(i)
+        self.assertIn(2, known)
+        self.assertIn(3, known)
+        self.assertEqual(len(known), 2)
+        self.assertEqual(known.bloom_capacity, 2)
+
+        known = KnownIds(2, bloom_capacity=100)
+        self.assertIsNone(known.bloom)
+        for i in (1, 2, 3):
+            known.add(i)
+        self.assertIn(3, known)
+        self.assertEqual(len(known), 2)
+        self.assertEqual(known.bloom_capacity, 100)
+
+    def test_migrate(self):
+        collection = Collection([{'_id': 'x', 'chat_id': -1}, {'_id': -2},
+                                 {'_id': -3, 'chat_id': -3},
+                                 {'_id': 'y', 'chat_id': -2}])
+        migrations = Collection()
+
+        self.assertTrue(migrate_to_canonical(collection, 'chat_id',
+                                             migrations, batch_size=2))
+        self.assertEqual(sorted(doc['_id'] for doc in collection.docs),
+                         [-3, -2, -1])
+        self.assertTrue(all(len(doc) == 1 for doc in collection.docs))
+
+        # The marker skips the second run
+        writes = len(collection.requests)
+        migrate_to_canonical(collection, 'chat_id', migrations)
+        self.assertEqual(len(collection.requests), writes)
+
+    def test_tracker(self):
+        store = Storage()
+        store.add_ids('chats', [-1, -2])
+        store.requests = list()
+        tracker = ServedTracker(store, 'chats', 'chat_id', max_size=100,
+                                bloom_capacity=0)
+        tracker.load()
+        # Write only when flush is called
+        tracker._thread = True
+
+        for chat_id in (-1, -2, -3, -4, -3):
+            tracker.add(chat_id)
+        self.assertEqual(tracker.hits, 2)
+
+        tracker.flush()
+        self.assertEqual(store.requests, [{-4, -3}])
+
+        tracker.add(-3)
+        tracker.flush()
+        self.assertEqual(len(store.requests), 1)
+
+    def test_tracker_migrate(self):
+        store = SlowMigration()
+        tracker = ServedTracker(store, 'chats', 'chat_id')
+
+        # A failed migration doesn't stream the old documents
+        store.failing = True
+        self.assertEqual(list(_iter_served(tracker, 'chat_id', 10)), [])
+        self.assertFalse(tracker.migrated)
+
+        # Only one thread migrates, the others wait for it
+        store.failing = False
+        threads = [threading.Thread(target=tracker.migrate)
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertFalse(store.overlapped)
+        self.assertEqual(store.calls, 2)
+
+        self.assertEqual(sorted(doc['chat_id'] for doc in
+                                _iter_served(tracker, 'chat_id', 10)),
+                         [-2, -1])
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import pickle
+import unittest
+
+import card as c
+
+
+class Test(unittest.TestCase):
+
+    def test_interned(self):
+        self.assertEqual(len(c.CARDS), 54)
+        self.assertIs(c.Card(c.RED, '5'), c.from_str('r_5'))
+        self.assertIs(c.Card(c.RED, None, c.DRAW_FOUR),
+                      c.Card(None, None, c.DRAW_FOUR))
+        self.assertIs(pickle.loads(pickle.dumps(c.from_str('g_skip'))),
+                      c.from_str('g_skip'))
+
+    def test_immutable(self):
+        card = c.from_str(c.CHOOSE)
+        with self.assertRaises(AttributeError):
+            card.color = c.RED
+
+    def test_order(self):
+        self.assertListEqual([str(card) for card in c.CARDS],
+                             sorted(str(card) for card in c.CARDS))
+        self.assertListEqual(sorted([c.Card(c.YELLOW, '1'),
+                                     c.Card(None, None, c.CHOOSE),
+                                     c.Card(c.BLUE, c.SKIP)]),
+                             [c.Card(c.BLUE, c.SKIP),
+                              c.Card(None, None, c.CHOOSE),
+                              c.Card(c.YELLOW, '1')])
+
+    def test_colored_repr(self):
+        draw_four = c.from_str(c.DRAW_FOUR)
+        self.assertEqual(draw_four.colored_repr(None), repr(draw_four))
+        self.assertTrue(draw_four.colored_repr(c.GREEN)
+                        .startswith(c.COLOR_ICONS[c.GREEN]))
+        self.assertEqual(c.from_str('r_5').colored_repr(c.RED), '❤️5')
+
+    def test_from_str_invalid(self):
+        self.assertRaises(ValueError, c.from_str, 'r_10')
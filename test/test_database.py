@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import unittest
+from unittest import mock
+
+import database
+
+
+class Collection(object):
+
+    def __init__(self):
+        self.indexes = list()
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+
+
+class Test(unittest.TestCase):
+
+    def test_pool_stats(self):
+        stats = database.PoolStats(2)
+        with self.assertLogs('database', 'WARNING'):
+            for _ in range(3):
+                stats.connection_checked_out(None)
+        stats.connection_checked_in(None)
+        stats.connection_check_out_failed(None)
+
+        result = stats.as_dict()
+        self.assertEqual(result['in_use'], 2)
+        self.assertEqual(result['peak_in_use'], 3)
+        self.assertEqual(result['checkouts'], 3)
+        self.assertEqual(result['failed_checkouts'], 1)
+
+    def test_log_pool_stats(self):
+        with mock.patch.object(database, '_client', None), \
+                self.assertNoLogs('database', 'INFO'):
+            database.log_pool_stats()
+
+        with mock.patch.object(database, '_client', object()), \
+                self.assertLogs('database', 'INFO') as logs:
+            database.log_pool_stats()
+        self.assertIn('peak_in_use', logs.output[0])
+
+    def test_write_concern(self):
+        self.assertEqual(database._write_concern('1').document, {'w': 1})
+        self.assertEqual(database._write_concern('majority').document,
+                         {'w': 'majority'})
+
+    def test_ensure_indexes(self):
+        collections = {'a': Collection()}
+        saved = database._client, database._db, database._indexes
+        database._client, database._db = object(), collections
+        database._indexes = list()
+        try:
+            database.register_index('a', 'x', unique=True)
+            self.assertEqual(collections['a'].indexes, [])
+            database.ensure_indexes()
+            self.assertEqual(collections['a'].indexes,
+                             [('x', {'unique': True})])
+        finally:
+            database._client, database._db, database._indexes = saved
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+import card as c
+from deck import Deck
+from errors import DeckEmptyError
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.deck = Deck()
+
+    def test_fill(self):
+        self.deck._fill_classic_()
+        self.assertEqual(len(self.deck.cards), 108)
+        self.assertEqual(self.deck.cards.count(c.Card(None, None, c.CHOOSE)),
+                         4)
+
+        self.deck._fill_wild_()
+        self.assertEqual(len(self.deck.cards), 140)
+        self.assertEqual(self.deck.cards.count(c.Card(c.RED, c.SKIP)), 4)
+
+    def test_draw_many(self):
+        self.deck._fill_classic_()
+        top = self.deck.cards[-3:]
+
+        self.assertListEqual(self.deck.draw_many(3), top[::-1])
+        self.assertEqual(len(self.deck.cards), 105)
+
+    def test_draw_many_reshuffles(self):
+        self.deck.cards = [c.Card(c.RED, '1'), c.Card(c.RED, '2')]
+        self.deck.graveyard = [c.Card(c.BLUE, '1'), c.Card(c.BLUE, '2')]
+
+        drawn = self.deck.draw_many(3)
+
+        self.assertListEqual(drawn[:2], [c.Card(c.RED, '2'),
+                                         c.Card(c.RED, '1')])
+        self.assertIn(drawn[2], (c.Card(c.BLUE, '1'), c.Card(c.BLUE, '2')))
+        self.assertEqual(len(self.deck.cards), 1)
+        self.assertListEqual(self.deck.graveyard, list())
+
+    def test_draw_many_empty(self):
+        self.deck.cards = [c.Card(c.RED, '1')]
+        self.deck.graveyard = [c.Card(c.BLUE, '1')]
+
+        self.assertRaises(DeckEmptyError, self.deck.draw_many, 3)
+        self.assertEqual(len(self.deck.cards), 2)
+
+        self.assertEqual(len(self.deck.draw_many(2)), 2)
+        self.assertRaises(DeckEmptyError, self.deck.draw)
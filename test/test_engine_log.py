@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import unittest
+
+import engine_log
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger('deck')
+        self.level = self.logger.level
+
+    def tearDown(self):
+        self.logger.setLevel(self.level)
+        engine_log.refresh()
+
+    def test_refresh(self):
+        self.logger.setLevel(logging.DEBUG)
+        self.assertTrue(engine_log.refresh())
+        self.assertTrue(engine_log.debug)
+
+        self.logger.setLevel(logging.WARNING)
+        engine_log.refresh()
+        self.assertFalse(engine_log.debug)
+
+    def test_listener(self):
+        records = list()
+
+        class ListHandler(logging.Handler):
+            def emit(self, record):
+                records.append(record.getMessage())
+
+        root = logging.getLogger()
+        handlers = root.handlers[:]
+        handler = ListHandler()
+        root.handlers[:] = [handler]
+
+        try:
+            engine_log.start_listener()
+            self.assertNotIn(handler, root.handlers)
+
+            self.logger.setLevel(logging.INFO)
+            self.logger.info("%d kart", 3)
+
+            engine_log.stop_listener()
+            self.assertEqual(records, ['3 kart'])
+            self.assertEqual(root.handlers, [handler])
+        finally:
+            engine_log.stop_listener()
+            root.handlers[:] = handlers
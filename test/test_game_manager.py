@@ -38,9 +38,9 @@ class Test(unittest.TestCase):
         self.chat1 = Chat(1, 'group')
         self.chat2 = Chat(2, 'group')
 
-        self.user0 = User(0, 'user0')
-        self.user1 = User(1, 'user1')
-        self.user2 = User(2, 'user2')
+        self.user0 = User(0, 'user0', False)
+        self.user1 = User(1, 'user1', False)
+        self.user2 = User(2, 'user2', False)
 
     def test_new_game(self):
         g0 = self.gm.new_game(self.chat0)
@@ -109,3 +109,25 @@ class Test(unittest.TestCase):
         self.assertFalse(0 in self.gm.userid_players)
         self.assertFalse(1 in self.gm.userid_players)
         self.assertFalse(2 in self.gm.userid_players)
+
+    def test_indexes(self):
+        g0 = self.gm.new_game(self.chat0)
+        self.gm.join_game(self.user0, self.chat0)
+        self.gm.join_game(self.user1, self.chat0)
+        self.gm.join_game(self.user2, self.chat0)
+
+        self.assertIs(self.gm.active_game(0), g0)
+        self.assertIs(self.gm.player_for_user_in_chat(self.user1, self.chat0),
+                      self.gm.userid_current[1])
+        self.assertIsNone(self.gm.player_for_user_in_chat(self.user1,
+                                                          self.chat1))
+        self.assertTrue(self.gm.is_running(g0))
+
+        self.gm.leave_game(self.user1, self.chat0)
+        self.assertIsNone(self.gm.player_for_user_in_chat(self.user1,
+                                                          self.chat0))
+
+        self.gm.end_game(self.chat0, self.user0)
+        self.assertFalse(self.gm.is_running(g0))
+        self.assertIsNone(self.gm.active_game(0))
+        self.assertDictEqual(self.gm.user_chat_players, dict())
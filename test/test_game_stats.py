@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+from unittest import mock
+
+from telegram import User
+
+import actions
+import user_setting
+from game_stats import GameStats
+from levels import compute_level, place_points
+from storage import MemoryStorage
+from user_setting import DocumentCache, StatsWriter
+
+
+class Test(unittest.TestCase):
+
+    def test_take(self):
+        stats = GameStats()
+        stats.finished(2, 'Two', place=1)
+        stats.finished(1, 'One')
+
+        self.assertEqual(stats.take([2]), [
+            (2, {'games_played': 1, 'first_places': 1,
+                 'total_points': place_points(1)}, 'Two'),
+        ])
+        self.assertEqual(stats.take(), [
+            (1, {'games_played': 1}, 'One'),
+        ])
+        self.assertEqual(stats.take(), [])
+
+    def test_points(self):
+        stats = GameStats()
+        stats.finished(1, 'One', place=2)
+        stats.finished(2, 'Two', place=99)
+
+        self.assertEqual(stats.take(), [
+            (1, {'games_played': 1, 'total_points': place_points(2)}, 'One'),
+            (2, {'games_played': 1}, 'Two'),
+        ])
+        self.assertEqual(place_points(None), 0)
+
+
+class StandingsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryStorage()
+        self.store.add_stats([(1, {'games_played': 12, 'first_places': 10},
+                               'One')])
+        writer = StatsWriter(self.store)
+        # Write by hand instead of from the background thread
+        writer._thread = True
+
+        patches = {'_created': True, 'store': self.store,
+                   'stats_writer': writer,
+                   'write_behind': None, 'card_counter': None,
+                   'document_cache': DocumentCache(100, ttl=3600)}
+        for name, value in patches.items():
+            patcher = mock.patch.object(user_setting, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.writer = writer
+
+    def standings(self, game):
+        with mock.patch.object(actions, 'send_async') as send:
+            actions.send_final_standings(None, 1, game)
+        return send.call_args[1]['text']
+
+    def test_career_wins(self):
+        user = User(1, 'One', False)
+        game = mock.Mock(finish_order=[user], stats=GameStats())
+        game.stats.joined(user.id)
+
+        game.stats.finished(user.id, 'One', place=1)
+        game.stats.commit()
+        rank_name = compute_level(11)[1]
+        self.assertIn(rank_name, self.standings(game))
+        self.assertNotEqual(rank_name, compute_level(1)[1])
+
+        # The background write moves the wins into the cached document
+        self.writer.write(self.writer._queue.get_nowait())
+        self.assertIsNone(self.writer.pending(user.id))
+        self.assertEqual(user_setting.UserSetting.peek(user.id).first_places,
+                         11)
+
+        # An expired document still serves the standings
+        user_setting.document_cache.ttl = -1
+        user_setting.document_cache.put(user.id,
+                                        self.store.get_user(user.id))
+        self.assertIn(rank_name, self.standings(game))
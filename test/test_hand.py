@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+import card as c
+from hand import Hand
+
+
+class Test(unittest.TestCase):
+
+    def test_add_remove(self):
+        hand = Hand([c.Card(c.RED, '5'), c.Card(c.BLUE, '0')])
+        hand.add(c.Card(c.RED, '5'))
+
+        self.assertEqual(len(hand), 3)
+        self.assertEqual(hand.count(c.Card(c.RED, '5')), 2)
+        self.assertIs(hand.last, c.Card(c.RED, '5'))
+
+        hand.remove(c.Card(c.RED, '5'))
+        self.assertIs(hand.last, c.Card(c.RED, '5'))
+        hand.remove(c.Card(c.RED, '5'))
+        self.assertIsNone(hand.last)
+
+        self.assertNotIn(c.Card(c.RED, '5'), hand)
+        self.assertRaises(ValueError, hand.remove, c.Card(c.RED, '5'))
+        self.assertEqual(len(hand), 1)
+
+    def test_order(self):
+        cards = [c.Card(c.YELLOW, '1'), c.Card(None, None, c.CHOOSE),
+                 c.Card(c.BLUE, c.SKIP), c.Card(c.YELLOW, '1')]
+        hand = Hand(cards)
+
+        self.assertListEqual(list(hand), sorted(cards))
+        self.assertListEqual(list(hand.distinct()), sorted(set(cards)))
+        self.assertListEqual(list(hand.items()),
+                             [(c.Card(c.BLUE, c.SKIP), 1),
+                              (c.Card(None, None, c.CHOOSE), 1),
+                              (c.Card(c.YELLOW, '1'), 2)])
+
+    def test_clear(self):
+        hand = Hand([c.Card(c.GREEN, '2')])
+        hand.clear()
+
+        self.assertEqual(len(hand), 0)
+        self.assertListEqual(list(hand), list())
+        self.assertIsNone(hand.last)
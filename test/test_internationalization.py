@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import threading
+import unittest
+
+from internationalization import _, carry_locales
+
+
+class Test(unittest.TestCase):
+
+    def test_using(self):
+        with _.using('de_DE', 'en_US'):
+            self.assertEqual(_.locale_stack, ('de_DE', 'en_US'))
+            with _.using('es_ES'):
+                self.assertEqual(_.code, 'es_ES')
+            self.assertEqual(_.code, 'en_US')
+        self.assertEqual(_.locale_stack, ())
+
+    def test_threads(self):
+        seen = dict()
+        ready = threading.Barrier(2)
+
+        def handler(locale):
+            with _.using(locale):
+                ready.wait()
+                seen[locale] = _.locale_stack
+
+        threads = [threading.Thread(target=handler, args=(locale,))
+                   for locale in ('de_DE', 'es_ES')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(seen, {'de_DE': ('de_DE',), 'es_ES': ('es_ES',)})
+
+    def test_carry(self):
+        seen = list()
+
+        with _.using('de_DE'):
+            job = carry_locales(lambda: seen.append(_.locale_stack))
+
+        thread = threading.Thread(target=job)
+        thread.start()
+        thread.join()
+        job()
+
+        self.assertEqual(seen, [('de_DE',), ('de_DE',)])
+        self.assertEqual(_.locale_stack, ())
+
+    def test_default(self):
+        self.assertEqual(_('Set locale!'), 'Set locale!')
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import sys
+import threading
+import unittest
+
+from leaderboard import Leaderboard
+
+
+class Storage(object):
+
+    def __init__(self, docs):
+        self.docs = {doc['_id']: doc for doc in docs}
+        self.finds = 0
+
+    def top_winners(self, limit):
+        self.finds += 1
+        docs = [doc for doc in self.docs.values() if doc['first_places'] > 0]
+        docs.sort(key=lambda doc: -doc['first_places'])
+        return docs[:limit]
+
+    def get_user(self, id):
+        return self.docs.get(id)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.store = Storage(
+            [{'_id': i, 'name': 'P%d' % i, 'first_places': i}
+             for i in range(6)])
+        self.board = Leaderboard(self.store, size=3)
+
+    def ids(self):
+        return [row[2] for row in self.board.rows()]
+
+    def test_load(self):
+        self.assertEqual(self.ids(), [5, 4, 3])
+        self.assertEqual(self.board.rows()[0][:2], (5, 'P5'))
+        self.assertEqual(self.board.loads, 1)
+
+    def test_refresh(self):
+        self.board.rows()
+
+        self.store.docs[1]['first_places'] = 2
+        self.board.refresh(1)
+        self.assertEqual(self.ids(), [5, 4, 3])
+
+        self.store.docs[1]['first_places'] = 9
+        self.board.refresh(1)
+        self.assertEqual(self.ids(), [1, 5, 4])
+
+        # A reset makes room for an unknown player, so the board reloads
+        self.store.docs[1]['first_places'] = 0
+        self.board.refresh(1, 0)
+        self.assertEqual(self.ids(), [5, 4, 3])
+        self.assertEqual(self.board.loads, 2)
+
+    def test_text(self):
+        calls = list()
+
+        def render(rows):
+            calls.append(rows)
+            return ' '.join(row[1] for row in rows)
+
+        self.assertEqual(self.board.text('en_US', render), 'P5 P4 P3')
+        self.board.text('en_US', render)
+        self.board.text('az_AZ', render)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.store.finds, 1)
+
+        self.store.docs[3]['first_places'] = 6
+        self.board.refresh(3)
+        self.assertEqual(self.board.text('en_US', render), 'P3 P5 P4')
+        self.assertEqual(len(calls), 3)
+
+    def test_invalidate_while_reading(self):
+        stop = threading.Event()
+
+        def invalidate():
+            while not stop.is_set():
+                self.board.invalidate()
+
+        # Switch threads often, so the reads get interrupted
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        thread = threading.Thread(target=invalidate)
+        thread.start()
+        try:
+            # Every read sees a whole board, never one invalidated between
+            # loading and copying it
+            for _ in range(20000):
+                self.assertEqual(len(self.board.rows()), 3)
+                self.assertEqual(self.board.text('en_US', len), 3)
+        finally:
+            stop.set()
+            thread.join()
+            sys.setswitchinterval(interval)
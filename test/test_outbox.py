@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import threading
+import unittest
+
+from telegram.error import RetryAfter
+
+from outbox import Outbox, GAMEPLAY, LOBBY, BROADCAST
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.sent = list()
+
+    def outbox(self, **kwargs):
+        options = dict(global_rate=0, group_rate=0, private_rate=0,
+                       broadcast_rate=0, max_pending=100, senders=0,
+                       clock=self.clock)
+        options.update(kwargs)
+        return Outbox(**options)
+
+    def put(self, outbox, chat_id, text, **kwargs):
+        return outbox.put(self.sent.append, (text,), chat_id=chat_id,
+                          **kwargs)
+
+    def drain(self, outbox):
+        while True:
+            job, wait = outbox.poll()
+            if job is None:
+                return wait
+            outbox.deliver(job)
+
+    def test_priority_within_chat(self):
+        outbox = self.outbox()
+        self.put(outbox, -1, 'broadcast', priority=BROADCAST)
+        self.put(outbox, -1, 'lobby', priority=LOBBY)
+        self.put(outbox, -1, 'turn', priority=GAMEPLAY)
+        self.put(outbox, -1, 'uno', priority=GAMEPLAY)
+
+        self.drain(outbox)
+        self.assertEqual(self.sent, ['turn', 'uno', 'lobby', 'broadcast'])
+
+    def test_chat_bucket(self):
+        outbox = self.outbox(group_rate=0.5, group_burst=2)
+        for text in ('a', 'b', 'c'):
+            self.put(outbox, -1, text)
+        self.put(outbox, 5, 'private')
+
+        # Chats with jobs take turns
+        wait = self.drain(outbox)
+        self.assertEqual(self.sent, ['a', 'private', 'b'])
+        self.assertAlmostEqual(wait, 2.0)
+
+        self.clock.now += 2
+        self.drain(outbox)
+        self.assertEqual(self.sent[-1], 'c')
+        self.assertEqual(outbox.stats()['throttled'], 1)
+
+    def test_global_bucket_prefers_gameplay(self):
+        outbox = self.outbox(global_rate=1)
+        self.put(outbox, -1, 'broadcast', priority=BROADCAST)
+        self.put(outbox, -2, 'lobby', priority=LOBBY)
+        self.put(outbox, -3, 'turn', priority=GAMEPLAY)
+
+        for _ in range(3):
+            self.drain(outbox)
+            self.clock.now += 1
+
+        self.assertEqual(self.sent, ['turn', 'lobby', 'broadcast'])
+
+    def test_broadcast_bucket(self):
+        outbox = self.outbox(broadcast_rate=1)
+        for chat_id in range(1, 4):
+            self.put(outbox, chat_id, chat_id, priority=BROADCAST)
+        self.put(outbox, -1, 'turn')
+
+        wait = self.drain(outbox)
+        self.assertEqual(self.sent, ['turn', 1])
+        self.assertAlmostEqual(wait, 1.0)
+
+    def test_bounded(self):
+        outbox = self.outbox(max_pending=4)
+
+        self.assertTrue(self.put(outbox, 1, 1, priority=BROADCAST))
+        self.assertTrue(self.put(outbox, 2, 2, priority=BROADCAST))
+        self.assertFalse(self.put(outbox, 3, 3, priority=BROADCAST))
+        self.assertTrue(self.put(outbox, -1, 'a'))
+        self.assertTrue(self.put(outbox, -1, 'b'))
+        # Gameplay pushes the broadcasts out of a full queue
+        self.assertTrue(self.put(outbox, -1, 'c'))
+        self.assertTrue(self.put(outbox, -1, 'd'))
+        self.assertFalse(self.put(outbox, -1, 'e'))
+
+        stats = outbox.stats()
+        self.assertEqual(stats['dropped'], {'gameplay': 1, 'lobby': 0,
+                                            'broadcast': 3})
+        self.assertEqual(stats['peak_pending'], 4)
+
+        self.drain(outbox)
+        self.assertEqual(self.sent, ['a', 'b', 'c', 'd'])
+        self.assertEqual(outbox.stats()['pending'],
+                         {'gameplay': 0, 'lobby': 0, 'broadcast': 0})
+
+    def test_full_evicts_worse(self):
+        outbox = self.outbox(max_pending=4)
+        errors = list()
+        self.put(outbox, 1, 1, priority=BROADCAST)
+        self.put(outbox, 2, 2, priority=BROADCAST,
+                 callback=lambda result, error: errors.append(error))
+        self.put(outbox, -1, 'lobby', priority=LOBBY)
+        self.put(outbox, -1, 'a')
+
+        # The worst class goes first, the newest broadcast before the older
+        self.assertTrue(self.put(outbox, -2, 'b'))
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(self.put(outbox, 3, 'lobby 2', priority=LOBBY))
+        self.assertFalse(self.put(outbox, 4, 'lobby 3', priority=LOBBY))
+        self.assertTrue(self.put(outbox, -2, 'c'))
+
+        self.assertEqual(outbox.stats()['dropped'],
+                         {'gameplay': 0, 'lobby': 2, 'broadcast': 2})
+
+        self.drain(outbox)
+        self.assertEqual(sorted(self.sent), ['a', 'b', 'c', 'lobby'])
+        self.assertEqual(outbox.stats()['pending'],
+                         {'gameplay': 0, 'lobby': 0, 'broadcast': 0})
+
+    def test_blocking_put(self):
+        outbox = self.outbox(max_pending=2)
+        self.put(outbox, 1, 1, priority=BROADCAST)
+
+        queued = list()
+        thread = threading.Thread(target=lambda: queued.append(
+            self.put(outbox, 2, 2, priority=BROADCAST, block=True)))
+        thread.start()
+
+        while not outbox.stats()['blocked_puts']:
+            pass
+        self.assertFalse(queued)
+
+        self.drain(outbox)
+        thread.join()
+        self.assertEqual(queued, [True])
+        self.drain(outbox)
+        self.assertEqual(self.sent, [1, 2])
+
+    def test_retry_after(self):
+        outbox = self.outbox()
+        attempts = list()
+
+        def send(text):
+            attempts.append(text)
+            if len(attempts) == 1:
+                raise RetryAfter(5)
+            self.sent.append(text)
+
+        outbox.put(send, ('turn',), chat_id=-1)
+        self.put(outbox, -1, 'next')
+
+        wait = self.drain(outbox)
+        self.assertEqual(self.sent, [])
+        self.assertAlmostEqual(wait, 5.0)
+
+        self.clock.now += 5
+        self.drain(outbox)
+        self.assertEqual(self.sent, ['turn', 'next'])
+        self.assertEqual(outbox.stats()['retried'], 1)
+
+    def test_no_retry(self):
+        outbox = self.outbox()
+        results = list()
+
+        def send():
+            raise RetryAfter(5)
+
+        outbox.put(send, chat_id=1, retry=False,
+                   callback=lambda result, error: results.append(error))
+        self.drain(outbox)
+
+        self.assertIsInstance(results[0], RetryAfter)
+        self.assertEqual(outbox.stats()['failed'], 1)
+
+    def test_direct(self):
+        outbox = self.outbox(group_rate=1, group_burst=1, global_rate=1)
+        self.put(outbox, -1, 'a')
+        self.put(outbox, -1, 'b')
+        self.put(outbox, None, 'answer')
+
+        self.drain(outbox)
+        self.assertEqual(self.sent, ['answer', 'a'])
+
+    def test_senders(self):
+        outbox = Outbox(global_rate=0, group_rate=0, private_rate=0,
+                        broadcast_rate=0, max_pending=1000, senders=4)
+        done = threading.Semaphore(0)
+
+        for i in range(200):
+            outbox.put(self.sent.append, (i,), chat_id=-(i % 7),
+                       callback=lambda result, error: done.release())
+        for _ in range(200):
+            self.assertTrue(done.acquire(timeout=10))
+        outbox.stop()
+
+        self.assertEqual(sorted(self.sent), list(range(200)))
+        self.assertEqual(outbox.stats()['sent'], 200)
@@ -72,16 +72,46 @@ class Test(unittest.TestCase):
         self.assertEqual(p0, p2.next)
         self.assertEqual(p2, p0.next)
 
+    def test_leave_current(self):
+        p0 = Player(self.game, "Player 0")
+        p1 = Player(self.game, "Player 1")
+        p2 = Player(self.game, "Player 2")
+
+        self.game.turn()
+        self.game.reverse()
+        p1.leave()
+
+        self.assertEqual(p0, self.game.current_player)
+        self.assertTupleEqual(self.game.players, (p0, p2))
+        self.assertIsNone(p1.next)
+
+    def test_turn_order(self):
+        p0 = Player(self.game, "Player 0")
+        p1 = Player(self.game, "Player 1")
+        p2 = Player(self.game, "Player 2")
+
+        self.assertTupleEqual(self.game.players, (p0, p1, p2))
+
+        self.game.turn()
+        self.assertListEqual(self.game.turn_order(), [p1, p2, p0])
+
+        self.game.reverse()
+        self.assertListEqual(self.game.turn_order(), [p1, p0, p2])
+
+        self.game.turn()
+        self.assertEqual(p0, self.game.current_player)
+
     def test_draw(self):
         p = Player(self.game, "Player 0")
         self.game.start()
+        self.game.draw_counter = 0
 
         deck_before = len(self.game.deck.cards)
         top_card = self.game.deck.cards[-1]
 
         p.draw()
 
-        self.assertEqual(top_card, p.cards[-1])
+        self.assertEqual(top_card, p.cards.last)
         self.assertEqual(deck_before, len(self.game.deck.cards) + 1)
 
     def test_draw_two(self):
@@ -106,7 +136,7 @@ class Test(unittest.TestCase):
         expected = [c.Card(c.RED, '0'), c.Card(c.RED, '5'),
                     c.Card(c.GREEN, '5')]
 
-        self.assertListEqual(p.playable_cards(), expected)
+        self.assertListEqual(p.playable_cards(), sorted(expected))
 
     def test_playable_cards_on_draw_two(self):
         p = Player(self.game, "Player 0")
@@ -120,7 +150,7 @@ class Test(unittest.TestCase):
 
         expected = [c.Card(c.RED, c.DRAW_TWO), c.Card(c.GREEN, c.DRAW_TWO)]
 
-        self.assertListEqual(p.playable_cards(), expected)
+        self.assertListEqual(p.playable_cards(), sorted(expected))
 
     def test_playable_cards_on_draw_four(self):
         p = Player(self.game, "Player 0")
@@ -138,6 +168,21 @@ class Test(unittest.TestCase):
 
         self.assertListEqual(p.playable_cards(), expected)
 
+    def test_playable_cards_on_chosen_color(self):
+        p = Player(self.game, "Player 0")
+
+        self.game.last_card = c.Card(None, None, c.CHOOSE)
+
+        p.cards = [c.Card(c.GREEN, '5'), c.Card(c.RED, '5'),
+                   c.Card(None, None, c.DRAW_FOUR)]
+
+        self.assertListEqual(p.playable_cards(), list())
+
+        self.game.choose_color(c.GREEN)
+
+        self.assertListEqual(p.playable_cards(), [c.Card(c.GREEN, '5')])
+        self.assertTrue(p.bluffing)
+
     def test_bluffing(self):
         p = Player(self.game, "Player 0")
         Player(self.game, "Player 01")
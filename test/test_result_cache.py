@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from game import Game
+from player import Player
+from result_cache import ResultCache
+import card as c
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResultCache()
+        self.game = Game(None)
+        self.p0 = Player(self.game, "Player 0")
+        self.p1 = Player(self.game, "Player 1")
+        self.game.start()
+
+    def key(self, player):
+        return self.cache.key(player, ['en_US'])
+
+    def test_hit(self):
+        key = self.key(self.p0)
+        self.assertIsNone(self.cache.get(self.p0, key))
+
+        results = ['result']
+        self.cache.put(self.p0, key, results)
+        self.assertIs(self.cache.get(self.p0, self.key(self.p0)), results)
+        self.assertIsNone(self.cache.get(self.p1, self.key(self.p1)))
+
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 2)
+        self.assertAlmostEqual(self.cache.hit_rate, 1 / 3)
+
+    def test_invalidation(self):
+        key = self.key(self.p0)
+
+        self.p0.cards.add(c.Card(c.RED, '5'))
+        self.assertNotEqual(self.key(self.p0), key)
+
+        key = self.key(self.p0)
+        self.game.turn()
+        self.assertNotEqual(self.key(self.p0), key)
+
+        key = self.key(self.p0)
+        self.p1.draw()
+        self.assertNotEqual(self.key(self.p0), key)
+
+        key = self.key(self.p0)
+        self.assertNotEqual(self.cache.key(self.p0, ['de_DE']), key)
+
+        self.p0.anti_cheat += 1
+        self.assertNotEqual(self.key(self.p0), key)
+
+    def test_evict(self):
+        self.cache.put(self.p0, self.key(self.p0), ['result'])
+        self.cache.put(self.p1, self.key(self.p1), ['result'])
+
+        self.cache.evict_player(self.p0)
+        self.assertIsNone(self.cache.get(self.p0, self.key(self.p0)))
+        self.assertIsNotNone(self.cache.get(self.p1, self.key(self.p1)))
+
+        self.cache.evict_game(self.game)
+        self.assertIsNone(self.cache.get(self.p1, self.key(self.p1)))
+        self.assertEqual(self.cache.stats()['games'], 0)
+        self.assertEqual(self.cache.evictions, 1)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from telegram import InputTextMessageContent, User
+
+import card as c
+import results
+from game import Game
+from internationalization import _
+from player import Player
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        _.push('en_US')
+        self.game = Game(None)
+        self.p0 = Player(self.game, User(0, 'Player 0', False))
+        self.p1 = Player(self.game, User(1, 'Player 1', False))
+        self.game.start()
+
+    def tearDown(self):
+        _.pop()
+
+    def test_pool(self):
+        self.assertEqual(set(results.CARD_RESULTS), set(c.CARD_PACKS))
+        pool = results.CARD_RESULTS[c.CARD_PACK]
+        self.assertEqual(len(pool.playable), len(c.CARDS))
+
+        card = c.Card(c.RED, c.DRAW_TWO)
+        result = results.PrebuiltResult(
+            'r_draw', pool.playable[card.index]).to_dict()
+        self.assertEqual(result, {'id': 'r_draw', 'type': 'sticker',
+                                  'sticker_file_id': c.STICKERS['r_draw']})
+
+        classic = results.CARD_RESULTS['classic'].playable[card.index]
+        self.assertEqual(classic['sticker_file_id'],
+                         c.CARDS_CLASSIC['normal']['r_draw'])
+
+        card = c.Card(c.BLUE, c.THREE)
+        content = pool.text[card.index]
+        self.assertEqual(content['input_message_content'],
+                         {'message_text': 'Kart oynanıldı: 💙3'})
+
+    def test_grey_ids(self):
+        card = c.Card(c.BLUE, c.FIVE)
+        self.p1.cards = [card, card, c.Card(c.GREEN, c.ONE)]
+        if self.game.current_player is self.p1:
+            self.game.turn()
+
+        found = list()
+        results.add_player_options(self.p1, found)
+
+        self.assertEqual([result.id for result in found],
+                         ['grey_b_5_0', 'grey_b_5_1', 'grey_g_1_0'])
+        self.assertIsInstance(found[0].input_message_content,
+                              InputTextMessageContent)
+        self.assertIs(found[0].input_message_content,
+                      found[2].input_message_content)
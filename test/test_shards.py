@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import queue
+import threading
+import time
+import unittest
+
+# The shards create the Updater on import, which only needs a well-formed
+# token as long as nothing is sent to Telegram
+os.environ.setdefault('TOKEN', '123456:SHARDS')
+
+from telegram import Update
+
+import shards
+from config import CARDS_SPILL_FILE
+from shards import Ingress, Router
+
+
+def setup_shard(index):
+    """Handlers of the test shards: every message creates a game"""
+    from telegram import User
+    from telegram.ext import TypeHandler
+    from shared_vars import dispatcher, gm
+
+    # The worker threads are named after the bot, which the real bot would
+    # fetch with getMe
+    dispatcher.bot._bot = User(123456, 'Shard', True, username='shard_bot')
+
+    def handle(update, context):
+        if update.message:
+            chat = update.effective_chat
+            gm.new_game(chat)
+            gm.join_game(update.effective_user, chat)
+            shards.report(('message', update.update_id, os.getpid()))
+        else:
+            shards.report(('inline', update.update_id, os.getpid()))
+
+    dispatcher.add_handler(TypeHandler(Update, handle))
+
+
+def setup_slow_shard(index):
+    """A shard whose dispatcher never gets past its first update"""
+    import threading
+    from telegram import User
+    from telegram.ext import TypeHandler
+    from shared_vars import dispatcher
+
+    dispatcher.bot._bot = User(123456, 'Shard', True, username='shard_bot')
+    stuck = threading.Event()
+    dispatcher.add_handler(TypeHandler(Update, lambda *_: stuck.wait()))
+
+
+def user(user_id):
+    return {'id': user_id, 'first_name': 'User %d' % user_id,
+            'is_bot': False}
+
+
+def message(update_id, chat_id, user_id, text='/new'):
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {'message_id': update_id, 'date': 0, 'text': text,
+                    'chat': {'id': chat_id, 'type': 'group'},
+                    'from': user(user_id)}}, None)
+
+
+def inline_query(update_id, user_id):
+    return Update.de_json({
+        'update_id': update_id,
+        'inline_query': {'id': str(update_id), 'query': '', 'offset': '',
+                         'from': user(user_id)}}, None)
+
+
+def callback_query(update_id, user_id, data):
+    return Update.de_json({
+        'update_id': update_id,
+        'callback_query': {'id': str(update_id), 'chat_instance': '1',
+                           'data': data, 'from': user(user_id),
+                           'message': {'message_id': 1, 'date': 0,
+                                       'chat': {'id': user_id,
+                                                'type': 'private'}}}},
+        None)
+
+
+class Test(unittest.TestCase):
+
+    def test_router(self):
+        router = Router(3)
+
+        self.assertEqual(router.shard_for(message(1, -7, 5)), -7 % 3)
+        self.assertEqual(router.shard_for(callback_query(2, 5, '-8')),
+                         -8 % 3)
+        self.assertEqual(router.shard_for(
+            callback_query(3, 5, 'uno_lobby_join')), 5 % 3)
+
+        # Without a game, inline queries go to the shard of the user
+        self.assertEqual(router.shard_for(inline_query(4, 5)), 5 % 3)
+
+        router.set_current(1, 5, -7)
+        router.set_current(2, 5, -8)
+        self.assertEqual(router.current_chat(5), -8)
+        self.assertEqual(router.shard_for(inline_query(5, 5)), -8 % 3)
+
+        # Leaving the game on one shard falls back to the other one
+        router.set_current(2, 5, None)
+        self.assertEqual(router.current_chat(5), -7)
+        router.set_current(1, 5, None)
+        self.assertIsNone(router.current_chat(5))
+        self.assertFalse(router.users)
+
+    def test_check_storage(self):
+        self.assertRaises(ValueError, shards.check_storage, 2, 'memory')
+        shards.check_storage(1, 'memory')
+        shards.check_storage(2, 'sqlite')
+
+    def test_shard_env(self):
+        ingress = Ingress(2)
+        spill_files = {ingress.shard_env(index, b'key')['CARDS_SPILL_FILE']
+                       for index in range(2)}
+        self.assertEqual(len(spill_files), 2)
+        self.assertNotIn(CARDS_SPILL_FILE, spill_files)
+
+    def test_processes(self):
+        events = queue.Queue()
+        ingress = Ingress(2, setup='test.test_shards:setup_shard',
+                          on_event=lambda index, event:
+                          events.put((index,) + event))
+        ingress.start()
+        try:
+            def wait(count):
+                return sorted((events.get(timeout=30) for _ in range(count)),
+                              key=lambda event: event[2])
+
+            chats = [-10, -11, -12, -13]
+            for update_id, chat_id in enumerate(chats):
+                ingress.dispatch(message(update_id, chat_id, 100 + update_id))
+
+            seen = wait(len(chats))
+            for update_id, chat_id in enumerate(chats):
+                index, kind, seen_id, _pid = seen[update_id]
+                self.assertEqual((kind, seen_id), ('message', update_id))
+                self.assertEqual(index, chat_id % 2)
+
+            # Each shard is its own process
+            self.assertEqual(len({pid for *_, pid in seen}), 2)
+
+            # Inline queries follow the current game of the user, also
+            # after they joined a game on the other shard
+            self.assertEqual(ingress.dispatch(inline_query(10, 101)), 1)
+            self.assertEqual(wait(1)[0][:3], (1, 'inline', 10))
+
+            ingress.dispatch(message(11, -20, 101))
+            self.assertEqual(wait(1)[0][:2], (0, 'message'))
+            self.assertEqual(ingress.dispatch(inline_query(12, 101)), 0)
+            self.assertEqual(wait(1)[0][:3], (0, 'inline', 12))
+
+            self.assertEqual(ingress.routed, [4, 3])
+        finally:
+            ingress.stop()
+
+        for process in ingress.processes:
+            self.assertEqual(process.returncode, 0)
+
+    def test_slow_shard(self):
+        os.environ['UPDATE_QUEUE_SIZE'] = '5'
+        try:
+            ingress = Ingress(1, setup='test.test_shards:setup_slow_shard')
+            ingress.start()
+        finally:
+            del os.environ['UPDATE_QUEUE_SIZE']
+
+        total = 20000
+        sent = []
+        stopped = threading.Event()
+
+        def send():
+            for update_id in range(total):
+                if stopped.is_set():
+                    return
+                ingress.dispatch(message(update_id, -10, 100))
+                sent.append(update_id)
+
+        threading.Thread(target=send, daemon=True).start()
+        try:
+            # The bounded update queue of the shard stops reading from the
+            # connection, so the ingress has to wait instead of the shard
+            # buffering every update
+            while True:
+                count = len(sent)
+                time.sleep(1)
+                if len(sent) == count:
+                    break
+            self.assertLess(len(sent), total // 2)
+        finally:
+            stopped.set()
+            ingress.stop(timeout=1)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from shared_vars import gm
+from simulator import MODES, Simulator, random_strategy, \
+    scripted_strategy
+
+
+class Test(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = Simulator(seed=4)
+        cls.sim.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sim.stop()
+
+    def test_all_modes(self):
+        report = self.sim.run(len(MODES) * 2, MODES, (2, 10))
+
+        self.assertEqual(report.games, 8)
+        self.assertEqual(report.finished, 8)
+        self.assertGreater(report.turns, 0)
+        self.assertFalse(gm.running_games)
+
+    def test_turn_limit(self):
+        self.sim.max_turns = 3
+        try:
+            turns, finished = self.sim.play_game('classic', 3)
+        finally:
+            self.sim.max_turns = 2000
+
+        self.assertEqual(turns, 3)
+        self.assertFalse(finished)
+        self.assertFalse(gm.running_games)
+
+    def test_concurrent(self):
+        # Thousands of moves from 16 threads as updates for the real
+        # handlers, which run in the chat queues of the dispatcher workers,
+        # with inline queries and the occasional /skip in between
+        self.sim.max_turns = 500
+        try:
+            report = self.sim.run_concurrent(60, threads=16, tables=24,
+                                             skip_chance=0.02)
+        finally:
+            self.sim.max_turns = 2000
+
+        self.assertEqual(report.games, 60)
+        self.assertGreater(report.turns, 2000)
+        self.assertFalse(gm.running_games)
+        self.assertFalse(gm.chatid_games)
+        self.assertFalse(gm.chatid_active)
+        self.assertFalse(gm.user_chat_players)
+        self.assertFalse(gm.userid_players)
+        self.assertFalse(gm.userid_current)
+
+    def test_scripted(self):
+        moves = list()
+
+        def fallback(player, options, rng):
+            moves.append(options[-1])
+            return options[-1]
+
+        self.sim.strategy = scripted_strategy(['draw'], fallback)
+        try:
+            turns, finished = self.sim.play_game('classic', 2)
+        finally:
+            self.sim.strategy = random_strategy
+
+        self.assertTrue(finished)
+        self.assertEqual(len(moves), turns - 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import http.client
+import json
+import threading
+import unittest
+from queue import Queue
+from types import SimpleNamespace
+
+from telegram import Update
+from telegram.ext import Dispatcher, JobQueue, TypeHandler
+
+from start_bot import SECRET_HEADER, WebhookServer, start_webhook
+
+
+class FakeTelegram(object):
+    """ Stands in for telegram.Bot and remembers the webhook it was given """
+
+    id = 123456
+    defaults = None
+
+    def __init__(self):
+        self.webhook = None
+
+    def set_webhook(self, **kwargs):
+        self.webhook = kwargs
+        return True
+
+
+def update(update_id, text='/start'):
+    return {'update_id': update_id,
+            'message': {'message_id': update_id, 'date': 0, 'text': text,
+                        'chat': {'id': -1, 'type': 'group'},
+                        'from': {'id': 1, 'first_name': 'A',
+                                 'is_bot': False}}}
+
+
+class Test(unittest.TestCase):
+
+    def post(self, server, body, path='/hook', secret='s3cret'):
+        """Posts like Telegram does and returns the status code"""
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+
+        headers = {'Content-Type': 'application/json'}
+        if secret is not None:
+            headers[SECRET_HEADER] = secret
+
+        connection = http.client.HTTPConnection('127.0.0.1',
+                                                server.server_port,
+                                                timeout=5)
+        try:
+            connection.request('POST', path, body, headers)
+            return connection.getresponse().status
+        finally:
+            connection.close()
+
+    def serve(self, update_queue):
+        server = WebhookServer(('127.0.0.1', 0), 'hook', 's3cret', None,
+                               update_queue)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_start_webhook(self):
+        telegram = FakeTelegram()
+        update_queue = Queue()
+        dispatcher = Dispatcher(telegram, update_queue, workers=1,
+                                use_context=True)
+        job_queue = JobQueue()
+        job_queue.set_dispatcher(dispatcher)
+        updater = SimpleNamespace(bot=telegram, update_queue=update_queue,
+                                  dispatcher=dispatcher, job_queue=job_queue,
+                                  httpd=None, running=False)
+
+        received = list()
+        done = threading.Event()
+
+        def record(update, context):
+            received.append(update.update_id)
+            if len(received) == 50:
+                done.set()
+
+        dispatcher.add_handler(TypeHandler(Update, record))
+
+        server = start_webhook(updater, listen='127.0.0.1', port=0,
+                               path='/hook', url='https://example.com/hook',
+                               secret='s3cret', max_connections=10)
+        try:
+            self.assertIs(updater.httpd, server)
+            self.assertEqual(telegram.webhook,
+                             {'url': 'https://example.com/hook',
+                              'max_connections': 10,
+                              'secret_token': 's3cret'})
+
+            statuses = list()
+            threads = [threading.Thread(
+                target=lambda i=i: statuses.append(
+                    self.post(server, update(i))))
+                for i in range(50)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertTrue(done.wait(5))
+            self.assertEqual(statuses, [200] * 50)
+            self.assertEqual(sorted(received), list(range(50)))
+            self.assertEqual(server.received, 50)
+        finally:
+            server.shutdown()
+            server.server_close()
+            dispatcher.stop()
+            job_queue.stop()
+
+    def test_rejected_requests(self):
+        update_queue = Queue()
+        server = self.serve(update_queue)
+
+        self.assertEqual(self.post(server, update(1), secret=None), 403)
+        self.assertEqual(self.post(server, update(1), secret='wrong'), 403)
+        self.assertEqual(self.post(server, update(1), path='/other'), 404)
+        self.assertEqual(self.post(server, b'{not json'), 400)
+        self.assertEqual(self.post(server, b''), 400)
+        self.assertTrue(update_queue.empty())
+
+        self.assertEqual(self.post(server, update(1)), 200)
+        self.assertEqual(update_queue.get_nowait().message.text, '/start')
+
+    def test_full_queue(self):
+        update_queue = Queue(maxsize=2)
+        server = self.serve(update_queue)
+
+        statuses = [self.post(server, update(i)) for i in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 503])
+        self.assertEqual(server.rejected, 1)
+        self.assertEqual(update_queue.qsize(), 2)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import os
+import tempfile
+import unittest
+
+from levels import compute_level
+from storage import MemoryStorage, SQLiteStorage, Storage, \
+    increment_update, merge_profiles, stats_update
+
+
+class Cursor(list):
+
+    def sort(self, key, direction):
+        return Cursor(sorted(self, key=lambda doc: doc[key]))
+
+    def limit(self, n):
+        return Cursor(self[:n])
+
+
+class Collection(object):
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.requests = list()
+
+    def find(self, query):
+        last = query.get('_id', {}).get('$gt', -1)
+        return Cursor(doc for doc in self.docs if doc['_id'] > last)
+
+    def find_one(self, query):
+        for doc in self.docs:
+            if doc['_id'] == query['_id']:
+                return doc
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.find_one(query)
+        if doc is None:
+            doc = dict(query)
+            self.docs.append(doc)
+        doc.update(update['$set'])
+
+    def bulk_write(self, requests, ordered=True):
+        self.requests.append(requests)
+
+
+class Backend(object):
+    """Tests every backend has to pass"""
+
+    def test_users(self):
+        store = self.store
+        self.assertIsNone(store.get_user(1))
+
+        doc = store.create_user(1, {'stats': False, 'first_places': 0})
+        self.assertEqual(doc, {'_id': 1, 'stats': False, 'first_places': 0})
+        store.set_fields({1: {'stats': True, 'lang': 'en_US'}})
+        self.assertEqual(store.create_user(1, {'stats': False})['stats'],
+                         True)
+
+        store.increment('cards_played', {1: 3, 2: 1})
+        store.increment('cards_played', {1: 2})
+        self.assertEqual(store.get_user(1)['cards_played'], 5)
+        self.assertEqual(store.get_user(2), {'_id': 2, 'cards_played': 1})
+
+    def test_increment_batch(self):
+        store = self.store
+        store.increment('cards_played', {1: 3}, batch=('a', 'x'))
+        store.increment('cards_played', {1: 3, 2: 1}, batch=('a', 'x'))
+        store.increment('cards_played', {1: 1}, batch=('b', 'x'))
+        store.increment('cards_played', {1: 2}, batch=('a', 'y'))
+        self.assertEqual(store.get_user(1)['cards_played'], 6)
+        self.assertEqual(store.get_user(2)['cards_played'], 1)
+
+    def test_stats(self):
+        store = self.store
+        first_level = compute_level(0)[0]
+        for i in range(1, 4):
+            store.add_stats([(i, {'games_played': 1, 'first_places': i}, 'P')])
+        store.add_stats([(1, {'games_played': 1}, None),
+                         (3, {'first_places': 10}, 'Q')])
+        store.add_stats([(4, {'games_played': 1}, 'R')])
+
+        doc = store.get_user(3)
+        self.assertEqual(doc['first_places'], 13)
+        self.assertEqual(doc['name'], 'Q')
+        self.assertEqual((doc['level'], doc['rank_name']), compute_level(13))
+        self.assertEqual(store.get_user(1)['games_played'], 2)
+        self.assertEqual(store.get_user(4)['level'], first_level)
+
+        self.assertEqual([doc['_id'] for doc in store.top_winners(2)], [3, 2])
+        self.assertEqual(len(store.top_winners(10)), 3)
+
+    def test_ids(self):
+        store = self.store
+        self.assertEqual(store.count_ids('chats'), 0)
+        self.assertTrue(store.prepare_ids('chats', 'chat_id'))
+
+        store.add_ids('chats', [-1, -2])
+        store.add_ids('chats', {-2, -3})
+        store.add_ids('broadcast_users', [5])
+
+        self.assertEqual(store.count_ids('chats'), 3)
+        self.assertEqual(sorted(store.iter_ids('chats', batch_size=2)),
+                         [-3, -2, -1])
+        self.assertEqual(list(store.iter_ids('broadcast_users')), [5])
+
+
+class InterfaceTest(unittest.TestCase):
+
+    def test_abstract(self):
+        class Partial(Storage):
+            def get_user(self, id):
+                return None
+
+        self.assertRaises(TypeError, Storage)
+        self.assertRaises(TypeError, Partial)
+
+
+class MemoryTest(Backend, unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryStorage()
+
+    def test_copies(self):
+        self.store.create_user(1, {'name': 'a'})
+        self.store.get_user(1)['name'] = 'b'
+        self.assertEqual(self.store.get_user(1)['name'], 'a')
+
+
+class SQLiteTest(Backend, unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'uno.sqlite3')
+        self.store = SQLiteStorage(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def test_reopen(self):
+        self.store.add_stats([(1, {'first_places': 2}, 'a')])
+        self.store.close()
+
+        self.store = SQLiteStorage(self.path)
+        self.assertEqual(self.store.get_user(1)['first_places'], 2)
+        mode = self.store._conn.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+
+class MongoTest(unittest.TestCase):
+
+    def test_stats_update(self):
+        update = stats_update(1, {'first_places': 1}, 'a')._doc
+        self.assertEqual(update[0]['$set']['name'], 'a')
+        self.assertEqual(update[0]['$set']['first_places'],
+                         {'$add': [{'$ifNull': ['$first_places', 0]}, 1]})
+        self.assertIn('$switch', update[1]['$set']['level'])
+
+    def test_increment_update(self):
+        self.assertEqual(increment_update(1, 'cards_played', 2)._doc,
+                         {'$inc': {'cards_played': 2}})
+
+        update = increment_update(1, 'cards_played', 2, ('a', 'x'))._doc
+        fields = update[0]['$set']
+        self.assertEqual(fields['batches.a'], 'x')
+        self.assertEqual(fields['cards_played']['$cond'][0],
+                         {'$eq': ['$batches.a', 'x']})
+
+    def test_merge_profiles(self):
+        db = {'profiles': Collection([
+            {'_id': i, 'user_id': 100 + i, 'name': 'P', 'wins': i,
+             'total_points': 10 * i, 'games_played': 2 * i}
+            for i in range(5)]),
+              'migrations': Collection(), 'user_settings': Collection()}
+        batches = list()
+
+        self.assertTrue(merge_profiles(db, 2, batches.append))
+        self.assertEqual(batches, [[100, 101], [102, 103], [104]])
+        self.assertEqual(len(db['user_settings'].requests), 3)
+
+        # Every profile is merged at most once
+        guarded = db['user_settings'].requests[0][1]
+        self.assertEqual(guarded._filter,
+                         {'_id': 100, 'merged_profile': {'$ne': True}})
+        self.assertEqual(guarded._doc[0]['$set']['total_points'],
+                         {'$add': [{'$ifNull': ['$total_points', 0]}, 0]})
+
+        self.assertTrue(merge_profiles(db, 2))
+        self.assertEqual(len(db['user_settings'].requests), 3)
+        self.assertEqual(db['migrations'].find_one({'_id': 'profiles_merged'}),
+                         {'_id': 'profiles_merged', 'last': 4, 'done': True})
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
+
+import user_setting
+from storage import MemoryStorage
+from user_setting import CardCounter, DocumentCache, StatsWriter, \
+    WriteBehind
+
+
+class Storage(object):
+    """Records the writes instead of storing them"""
+
+    def __init__(self):
+        self.requests = list()
+        self.fail = False
+
+    def _record(self, request):
+        if self.fail:
+            raise ConnectionError('down')
+        self.requests.append(request)
+
+    def set_fields(self, updates):
+        self._record(('set', dict(updates)))
+
+    def add_stats(self, results):
+        self._record(('stats', list(results)))
+
+    def increment(self, field, counts, batch=None):
+        self._record((field, dict(counts)))
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.store = Storage()
+        self.buffer = WriteBehind(self.store, interval=3600,
+                                  max_pending=100)
+
+    def test_coalesce(self):
+        self.buffer.set(1, {'games_played': 1})
+        self.buffer.set(1, {'games_played': 2, 'name': 'a'})
+        self.buffer.set(2, {'cards_played': 5})
+
+        self.assertEqual(self.buffer.pending(1),
+                         {'games_played': 2, 'name': 'a'})
+
+        self.buffer.flush()
+        self.assertEqual(self.store.requests, [('set', {
+            1: {'games_played': 2, 'name': 'a'},
+            2: {'cards_played': 5},
+        })])
+        self.assertIsNone(self.buffer.pending(1))
+
+        self.buffer.flush()
+        self.assertEqual(len(self.store.requests), 1)
+
+    def test_retry(self):
+        self.buffer.set(1, {'games_played': 1})
+        self.store.fail = True
+        self.buffer.flush()
+
+        self.buffer.set(1, {'name': 'a'})
+        self.assertEqual(self.buffer.pending(1),
+                         {'games_played': 1, 'name': 'a'})
+
+        self.store.fail = False
+        self.buffer.flush()
+        self.assertEqual(self.store.requests,
+                         [('set', {1: {'games_played': 1, 'name': 'a'}})])
+
+
+class SetupTest(unittest.TestCase):
+
+    def test_first_use(self):
+        store = MemoryStorage()
+        get_storage = mock.Mock(return_value=store)
+        with mock.patch.multiple(user_setting, _created=False, store=None,
+                                 write_behind=None, stats_writer=None,
+                                 card_counter=None, CARDS_SPILL_FILE='',
+                                 get_storage=get_storage):
+            get_storage.assert_not_called()
+            self.assertIsNone(user_setting.UserSetting.get(1))
+            self.assertIs(user_setting.store, store)
+            self.assertIsNotNone(user_setting.card_counter)
+
+            user_setting.setup()
+            get_storage.assert_called_once_with()
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = DocumentCache(max_size=2, ttl=3600)
+
+    def test_lru(self):
+        self.cache.put(1, {'name': 'a'})
+        self.cache.put(2, None)
+        self.assertEqual(self.cache.get(1), (True, {'name': 'a'}))
+        self.assertEqual(self.cache.get(2), (True, None))
+
+        self.cache.put(3, {'name': 'c'})
+        self.assertEqual(self.cache.get(1), (False, None))
+        self.assertEqual(self.cache.hits, 2)
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_ttl(self):
+        self.cache.ttl = -1
+        self.cache.put(1, {'name': 'a'})
+        self.assertEqual(self.cache.get(1), (False, None))
+
+    def test_local_writes(self):
+        self.cache.put(1, {'name': 'a'})
+        self.cache.put(2, None)
+        token = self.cache.token()
+
+        self.cache.update(1, {'name': 'b'})
+        self.cache.update(2, {'name': 'b'})
+        self.assertEqual(self.cache.get(1), (True, {'name': 'b'}))
+        self.assertEqual(self.cache.get(2), (False, None))
+
+        # A read that started before the write must not be cached
+        self.cache.put(2, {'name': 'old'}, token)
+        self.assertEqual(self.cache.get(2), (False, None))
+
+
+class StatsTest(unittest.TestCase):
+
+    def test_write(self):
+        store = Storage()
+        writer = StatsWriter(store)
+
+        writer._pending[1] = [Counter(games_played=1, first_places=1), 'a']
+        store.fail = True
+        self.assertFalse(writer.write([(1, {'games_played': 1,
+                                            'first_places': 1}, 'a')]))
+        self.assertEqual(writer.pending(1),
+                         (Counter(games_played=1, first_places=1), 'a'))
+
+        store.fail = False
+        self.assertTrue(writer.write([(1, {'games_played': 1,
+                                           'first_places': 1}, 'a')]))
+        self.assertIsNone(writer.pending(1))
+
+        self.assertEqual(store.requests, [('stats', [
+            (1, {'games_played': 1, 'first_places': 1}, 'a')])])
+
+
+class CardCounterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.spill = os.path.join(self.dir.name, 'spill.json')
+        self.store = Storage()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def counter(self):
+        counter = CardCounter(self.store, 3600, self.spill)
+        # Count without starting the flush thread
+        counter._thread = True
+        return counter
+
+    def test_flush(self):
+        counter = self.counter()
+        counter.add(1)
+        counter.add(1)
+        counter.add(2)
+        self.assertEqual(counter.pending(1), 2)
+
+        counter.flush()
+        self.assertEqual(self.store.requests,
+                         [('cards_played', {1: 2, 2: 1})])
+        self.assertEqual(counter.pending(1), 0)
+        self.assertFalse(os.path.exists(self.spill))
+
+    def test_spill(self):
+        counter = self.counter()
+        counter.add(1, 3)
+        # Every count reaches the spill file before any flush
+        self.assertTrue(os.path.exists(self.spill))
+        self.store.fail = True
+        counter.flush()
+        self.assertTrue(os.path.exists(self.spill))
+
+        # A restart picks up the counts that were not written
+        counter = self.counter()
+        self.assertEqual(counter.pending(1), 3)
+
+        self.store.fail = False
+        counter.flush()
+        self.assertEqual(self.store.requests,
+                         [('cards_played', {1: 3})])
+        self.assertFalse(os.path.exists(self.spill))
+
+    def test_replay(self):
+        self.store = MemoryStorage()
+        counter = self.counter()
+        counter.add(1, 3)
+        counter.add(2)
+
+        # The write lands but the reply is lost, then the bot restarts
+        increment = self.store.increment
+
+        def lost_reply(*args, **kwargs):
+            increment(*args, **kwargs)
+            raise ConnectionError('reset')
+
+        with mock.patch.object(self.store, 'increment', lost_reply):
+            counter.flush()
+        counter.add(1)
+        counter._spill.close()
+        self.assertEqual(self.store.get_user(1)['cards_played'], 3)
+
+        counter = self.counter()
+        self.assertEqual(counter.pending(1), 4)
+        counter.flush()
+        counter.flush()
+        self.assertEqual(self.store.get_user(1)['cards_played'], 4)
+        self.assertEqual(self.store.get_user(2)['cards_played'], 1)
+        self.assertFalse(os.path.exists(self.spill))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import unittest
+
+from utils import ChatQueues
+
+
+class Dispatcher(object):
+    """Runs every job in a thread of its own"""
+
+    def __init__(self):
+        self.jobs = 0
+
+    def run_async(self, func, *args):
+        self.jobs += 1
+        threading.Thread(target=func, args=args, daemon=True).start()
+
+
+class Test(unittest.TestCase):
+
+    def test_serial(self):
+        dispatcher = Dispatcher()
+        queues = ChatQueues(dispatcher)
+        blocked = threading.Event()
+        done = threading.Event()
+        order = list()
+
+        queues.submit(1, blocked.wait)
+        for i in range(5):
+            queues.submit(1, lambda i=i: order.append(i))
+        queues.submit(1, done.set)
+
+        # Another chat is not held up by the first one
+        other = threading.Event()
+        queues.submit(2, other.set)
+        self.assertTrue(other.wait(5))
+
+        self.assertEqual(order, [])
+        self.assertEqual(queues.pending(1), 6)
+        blocked.set()
+        self.assertTrue(done.wait(5))
+
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+        # One worker per chat at a time
+        self.assertEqual(dispatcher.jobs, 2)
@@ -3,28 +3,62 @@
 #
 # Telegram bot to play UNO in group chats
 #
-# ARTIQ Pony ORM/SQLite ƏVƏZİNƏ MongoDB istifadə olunur. Bu sinif köhnə
+# ARTIQ Pony ORM ƏVƏZİNƏ storage.py istifadə olunur (MongoDB, SQLite və ya
+# yaddaş - config.py-dəki STORAGE ilə seçilir). Bu sinif köhnə
 # Pony Entity ilə EYNİ İSTİFADƏ ÜSULUNU saxlayır ki, botun qalan hissəsi
 # (settings.py, actions.py, internationalization.py, simple_commands.py)
 # HEÇ DƏYİŞMƏDƏN işləməyə davam etsin:
 #
 #   UserSetting.get(id=user.id)   -> obyekt və ya None
 #   UserSetting(id=user.id)       -> yeni qeyd yaradır və qaytarır
-#   us.stats = True               -> DƏRHAL Mongo-ya yazılır
-#   us.games_played += 1          -> DƏRHAL Mongo-ya yazılır
+#   us.stats = True               -> yazma buferinə düşür
+#   us.games_played += 1          -> yazma buferinə düşür
 #
-# QEYD: Bütün Mongo əməliyyatları try/except ilə əhatələnib ki, keçici bir
+# Dəyişən sahələr dərhal bazaya getmir: WriteBehind onları yaddaşda
+# "çirkli" kimi saxlayır və hər SETTINGS_FLUSH_SECONDS saniyədən bir (və ya
+# SETTINGS_FLUSH_SIZE istifadəçi yığılanda) bir bulk_write ilə yazır. Eyni
+# sahəyə bir neçə yazı birləşir. Proses daxilində oxumalar (get) hələ
+# yazılmamış dəyərləri də görür, bot dayananda bufer boşaldılır.
+#
+# Oxunan sənədlər DocumentCache-də (LRU + TTL) saxlanılır ki, hər inline
+# sorğuda və lobby yenilənməsində hər oyunçu üçün find_one getməsin. Bu
+# prosesdəki yazılar (nəticə və kart artımları da) keşdəki sənədi yeniləyir.
+#
+# Oyun nəticələri (games_played, first_places, cards_played, name) ayrıca
+# yol ilə gedir: oyun onları GameStats-da yığır, oyunçu çıxanda və ya oyun
+# bitəndə StatsWriter onları bir ardıcıl bulk_write ilə ($inc mənasında)
+# fon axınında yazır, xəta olarsa təkrar cəhd edir. Ən tez-tez dəyişən
+# cards_played isə CardCounter-də toplanır və hər CARDS_FLUSH_SECONDS
+# saniyədən bir $inc ilə yazılır; hər say gələndə diskdəki spill faylına da
+# yazılır ki, bot yenidən başlasa itməsin, partiya id-si isə təkrar yazılan
+# partiyanın ikinci dəfə sayılmasına imkan vermir.
+#
+# QEYD: Bütün baza əməliyyatları try/except ilə əhatələnib ki, keçici bir
 # şəbəkə/DB xətası oyunun əsas məntiqini (kart oynama, sıra keçmə və s.)
 # yarımçıq kəsib "sıradan çıxarmasın" - xəta sadəcə log-a yazılır.
 
+import atexit
+import json
 import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
 
-from database import db
+from config import SETTINGS_FLUSH_SECONDS, SETTINGS_FLUSH_SIZE, \
+    SETTINGS_CACHE_SIZE, SETTINGS_CACHE_TTL, CARDS_FLUSH_SECONDS, \
+    CARDS_SPILL_FILE, PROFILES_MIGRATION_BATCH
 from levels import compute_level
+from storage import get_storage
 
 logger = logging.getLogger(__name__)
 
-users_collection = db["user_settings"] if db is not None else None
+# Backend və fon yazıcıları ilk lazım olanda yaradılır (bax: setup) ki,
+# modulu import etmək bazaya qoşulmasın
+store = None
 
 _DEFAULT_LEVEL, _DEFAULT_RANK = compute_level(0)
 
@@ -34,6 +68,7 @@ DEFAULTS = {
     "first_places": 0,
     "games_played": 0,
     "cards_played": 0,
+    "total_points": 0,
     "use_keyboards": False,
     "name": "",
     "level": _DEFAULT_LEVEL,
@@ -41,43 +76,505 @@ DEFAULTS = {
 }
 
 
+class DocumentCache:
+    """
+    Oxunmuş sənədlərin LRU + TTL keşi. Sənədi olmayan istifadəçilər də
+    (None kimi) yadda saxlanılır.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._docs = OrderedDict()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, id, stale=False):
+        """
+        (tapıldı, sənəd) qaytarır. stale=True olanda vaxtı keçmiş sənəd də
+        qaytarılır - bu prosesdəki yazılar ona onsuz da tətbiq olunur.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._docs.get(id)
+            if entry is None or (entry[0] < now and not stale):
+                self.misses += 1
+                return False, None
+
+            self._docs.move_to_end(id)
+            self.hits += 1
+            return True, entry[1]
+
+    def token(self):
+        """find_one-dan əvvəl götürülür, bax: put."""
+        return self._writes
+
+    def put(self, id, doc, token=None):
+        """
+        Sənədi keşə yazır. token verilibsə və o vaxtdan bəri bu prosesdə
+        yazı olubsa, oxunan sənəd köhnə ola bilər və keşə yazılmır.
+        """
+        with self._lock:
+            if token is not None and token != self._writes:
+                return
+            self._docs[id] = (time.monotonic() + self.ttl, doc)
+            self._docs.move_to_end(id)
+            while len(self._docs) > self.max_size:
+                self._docs.popitem(last=False)
+
+    def update(self, id, fields):
+        """Bu prosesdəki yazını keşdəki sənədə də tətbiq edir."""
+        with self._lock:
+            self._writes += 1
+            entry = self._docs.get(id)
+            if entry is None:
+                return
+            if entry[1] is None:
+                del self._docs[id]
+            else:
+                entry[1].update(fields)
+
+    def increment(self, id, inc, name=None):
+        """Yazılmış nəticələri ($inc) keşdəki sənədə də əlavə edir."""
+        with self._lock:
+            self._writes += 1
+            entry = self._docs.get(id)
+            if entry is None:
+                return
+            if entry[1] is None:
+                del self._docs[id]
+                return
+
+            doc = entry[1]
+            for k, v in inc.items():
+                doc[k] = (doc.get(k) or 0) + v
+            if name:
+                doc["name"] = name
+            if "first_places" in inc:
+                doc["level"], doc["rank_name"] = \
+                    compute_level(doc.get("first_places") or 0)
+
+    def invalidate(self, id):
+        with self._lock:
+            self._writes += 1
+            self._docs.pop(id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._docs),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class WriteBehind:
+    """Dəyişmiş sahələri yığır və toplu şəkildə yazır."""
+
+    def __init__(self, store, interval, max_pending):
+        self.store = store
+        self.interval = interval
+        self.max_pending = max_pending
+        self.flushes = 0
+        self.writes = 0
+        self._dirty = dict()
+        self._inflight = dict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def set(self, id, fields):
+        """Sahələri çirkli kimi qeyd edir, lazım olsa yazmanı tezləşdirir."""
+        with self._lock:
+            self._dirty.setdefault(id, dict()).update(fields)
+            pending = len(self._dirty)
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="user_setting_flush", daemon=True)
+                self._thread.start()
+
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def pending(self, id):
+        """Hələ yazılmamış sahələr (read-your-writes üçün)."""
+        with self._lock:
+            inflight = self._inflight.get(id)
+            dirty = self._dirty.get(id)
+            if not inflight and not dirty:
+                return None
+            fields = dict(inflight or ())
+            fields.update(dirty or ())
+            return fields
+
+    def flush(self):
+        """Yığılmış bütün dəyişiklikləri bir bulk_write ilə yazır."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, dict()
+                self._inflight = dirty
+
+            if not dirty:
+                return
+
+            try:
+                self.store.set_fields(dirty)
+                self.flushes += 1
+                self.writes += len(dirty)
+            except Exception as e:
+                logger.error(f"UserSetting toplu yazılarkən xəta: {e}")
+                # Yazılmayanları geri qaytarırıq - sonradan gələn dəyərlər
+                # köhnələrin üstünə yazılır
+                with self._lock:
+                    for id, fields in dirty.items():
+                        newer = self._dirty.get(id)
+                        if newer:
+                            fields.update(newer)
+                        self._dirty[id] = fields
+            finally:
+                with self._lock:
+                    self._inflight = dict()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+
+class StatsWriter:
+    """
+    Oyun nəticələrini fon axınında, göndərildiyi ardıcıllıqla yazır.
+    Uğursuz yazı uğur qazanana qədər (artan gözləmə ilə) təkrarlanır.
+    """
+
+    def __init__(self, store, max_delay=60):
+        self.store = store
+        self.max_delay = max_delay
+        self.failures = 0
+        self._queue = queue.Queue()
+        self._pending = dict()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, results):
+        """results: [(id, {sahə: artım}, ad), ...]"""
+        if not results:
+            return
+
+        with self._lock:
+            for id, inc, name in results:
+                pending = self._pending.setdefault(id, [Counter(), None])
+                pending[0].update(inc)
+                pending[1] = name or pending[1]
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="user_stats_writer", daemon=True)
+                self._thread.start()
+
+        # Keşdəki sənəd saxlanılır: oxunanda artımlar onun üstünə gəlir
+        self._queue.put(results)
+
+    def pending(self, id):
+        """Hələ yazılmamış artımlar və ad (read-your-writes üçün)."""
+        with self._lock:
+            pending = self._pending.get(id)
+            return (Counter(pending[0]), pending[1]) if pending else None
+
+    def write(self, results):
+        """Bir dəfə yazmağa cəhd edir, uğurlu olsa True qaytarır."""
+        try:
+            self.store.add_stats(results)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Oyun nəticələri yazılarkən xəta: {e}")
+            return False
+
+        # Yazılan artımlar gözləyənlərdən keşdəki sənədə keçir
+        with self._lock:
+            for id, inc, name in results:
+                document_cache.increment(id, inc, name)
+                pending = self._pending.get(id)
+                if pending is None:
+                    continue
+                pending[0].subtract(inc)
+                if not +pending[0]:
+                    del self._pending[id]
+        for id, inc, name in results:
+            if inc.get("first_places"):
+                _notify_wins(id)
+        return True
+
+    def flush(self, attempts=3):
+        """Növbədə qalanları dərhal yazır (bot dayananda)."""
+        while True:
+            try:
+                results = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            for _attempt in range(attempts):
+                if self.write(results):
+                    break
+
+    def _run(self):
+        while True:
+            results = self._queue.get()
+            delay = 1
+            while not self.write(results):
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_delay)
+
+
+class CardCounter:
+    """
+    cards_played saylarını yaddaşda yığır və vaxtaşırı bir bulk_write ilə
+    $inc edir. Hər say elə gələndə spill faylının sonuna yazılır. Yazılan
+    partiyanın id-si sənədlərdə artımla birlikdə qeyd olunur - çöküşdən
+    sonra eyni partiya təkrar göndərilsə, ikinci dəfə sayılmır.
+    """
+
+    def __init__(self, store, interval, spill_file):
+        self.store = store
+        self.interval = interval
+        self.spill_file = spill_file
+        # Sənəddə partiyanın qeyd olunduğu açar - hər spill faylına bir
+        self.writer = re.sub(r"\W", "_",
+                             os.path.basename(spill_file or "cards_played"))
+        self.flushes = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._spill = None
+        self._batch, self._counts = self._load_spill()
+
+    def add(self, id, n=1):
+        with self._lock:
+            self._counts[id] += n
+            self._append_spill({str(id): n})
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="cards_played_flush", daemon=True)
+                self._thread.start()
+
+    def pending(self, id):
+        """Hələ yazılmamış say (read-your-writes üçün)."""
+        with self._lock:
+            n = self._counts.get(id, 0)
+            if self._batch is not None:
+                n += self._batch[1].get(id, 0)
+            return n
+
+    def request_flush(self):
+        """Növbəti yazmanı gözləmədən fon axınında başladır."""
+        self._wake.set()
+
+    def flush(self):
+        """
+        Bir partiya yazır. Uğursuz partiya dəyişmədən (eyni id ilə) təkrar
+        göndərilir, yeni saylar növbəti partiyaya düşür.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._batch is None:
+                    if not self._counts:
+                        return
+                    self._batch = (uuid.uuid4().hex, self._counts)
+                    self._counts = Counter()
+                    self._save_spill()
+                batch_id, counts = self._batch
+
+            try:
+                self.store.increment("cards_played", dict(counts),
+                                     batch=(self.writer, batch_id))
+            except Exception as e:
+                logger.error(f"cards_played yazılarkən xəta: {e}")
+                return
+
+            with self._lock:
+                for id, n in counts.items():
+                    document_cache.increment(id, {"cards_played": n})
+                self._batch = None
+                self._save_spill()
+            self.flushes += 1
+
+    def _load_spill(self):
+        """
+        Spill faylı JSON sətirləridir: {"batch": id, "counts": {...}} -
+        göndərilmiş partiya, {"counts": {...}} isə sonradan gələn saylar.
+        Yarımçıq yazılmış son sətir atılır.
+        """
+        batch, counts = None, Counter()
+        if not self.spill_file or not os.path.exists(self.spill_file):
+            return batch, counts
+        try:
+            with open(self.spill_file) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not isinstance(entry, dict):
+                        continue
+                    found = Counter({int(id): n for id, n
+                                     in entry.get("counts", {}).items()})
+                    if entry.get("batch"):
+                        batch = (entry["batch"], found)
+                    else:
+                        counts.update(found)
+        except (OSError, ValueError) as e:
+            logger.error(f"cards_played spill faylı oxunmadı: {e}")
+        return batch, counts
+
+    def _append_spill(self, counts):
+        """self._lock altında çağırılır."""
+        if not self.spill_file:
+            return
+        try:
+            if self._spill is None:
+                self._spill = open(self.spill_file, "a")
+            self._spill.write(json.dumps({"counts": counts}) + "\n")
+            self._spill.flush()
+        except OSError as e:
+            logger.error(f"cards_played spill faylı yazılmadı: {e}")
+
+    def _save_spill(self):
+        """Faylı indiki vəziyyətlə əvəz edir, self._lock altında çağırılır."""
+        if not self.spill_file:
+            return
+        try:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+            if self._batch is None and not self._counts:
+                if os.path.exists(self.spill_file):
+                    os.remove(self.spill_file)
+                return
+
+            tmp = self.spill_file + ".tmp"
+            with open(tmp, "w") as f:
+                if self._batch is not None:
+                    batch_id, counts = self._batch
+                    f.write(json.dumps({
+                        "batch": batch_id,
+                        "counts": {str(id): n for id, n in counts.items()},
+                    }) + "\n")
+                if self._counts:
+                    f.write(json.dumps({"counts": {
+                        str(id): n for id, n in self._counts.items()}}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.spill_file)
+        except OSError as e:
+            logger.error(f"cards_played spill faylı yazılmadı: {e}")
+
+    def start(self):
+        """Əvvəlki işdən qalan saylar varsa, onları yazmağa başlayır."""
+        with self._lock:
+            if self._thread is None and (self._batch or self._counts):
+                self._thread = threading.Thread(
+                    target=self._run, name="cards_played_flush", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+
 class UserSetting:
-    """MongoDB-də saxlanılan istifadəçi ayarları/statistikası."""
+    """Seçilmiş storage-da (bax: storage.py) saxlanılan istifadəçi
+    ayarları/statistikası."""
 
     def __init__(self, id):
         doc = dict(DEFAULTS)
         doc["_id"] = id
-        if users_collection is not None:
+        if setup() is not None:
+            token = document_cache.token()
             try:
-                users_collection.update_one(
-                    {"_id": id}, {"$setOnInsert": doc}, upsert=True
-                )
-                fetched = users_collection.find_one({"_id": id})
-                if fetched:
-                    doc = fetched
+                doc = store.create_user(id, DEFAULTS)
+                document_cache.put(id, doc, token)
             except Exception as e:
-                logger.error(f"UserSetting yaradılarkən Mongo xətası (id={id}): {e}")
+                logger.error(f"UserSetting yaradılarkən xəta (id={id}): {e}")
         self.__dict__["id"] = id
         for k, v in DEFAULTS.items():
             self.__dict__[k] = doc.get(k, v)
+        self._apply_pending()
 
     @classmethod
     def get(cls, id):
-        if users_collection is None:
-            return None
-        try:
-            doc = users_collection.find_one({"_id": id})
-        except Exception as e:
-            logger.error(f"UserSetting oxunarkən Mongo xətası (id={id}): {e}")
+        if setup() is None:
             return None
-        if not doc:
+        found, doc = document_cache.get(id)
+        if not found:
+            token = document_cache.token()
+            try:
+                doc = store.get_user(id)
+            except Exception as e:
+                logger.error(f"UserSetting oxunarkən xəta (id={id}): {e}")
+                return None
+            document_cache.put(id, doc, token)
+        return cls._from_doc(id, doc)
+
+    @classmethod
+    def peek(cls, id):
+        """
+        get kimi, amma bazaya getmir - yalnız keşdə olanı (vaxtı keçmiş
+        olsa da) qaytarır. Sənəd oyunçu oyuna qoşulanda keşə yüklənir.
+        """
+        if setup() is None:
             return None
+        found, doc = document_cache.get(id, stale=True)
+        return cls._from_doc(id, doc)
+
+    @classmethod
+    def _from_doc(cls, id, doc):
+        if doc is None:
+            # Sənədi hələ yazılmamış yeni oyunçu
+            if stats_writer is None or not stats_writer.pending(id):
+                return None
+            doc = dict()
         obj = cls.__new__(cls)
         obj.__dict__["id"] = id
         for k, v in DEFAULTS.items():
             obj.__dict__[k] = doc.get(k, v)
+        obj._apply_pending()
         return obj
 
+    def _apply_pending(self):
+        if write_behind is not None:
+            fields = write_behind.pending(self.id)
+            if fields:
+                self.__dict__.update(fields)
+
+        if card_counter is not None:
+            n = card_counter.pending(self.id)
+            if n:
+                self.__dict__["cards_played"] = \
+                    (self.__dict__.get("cards_played") or 0) + n
+
+        if stats_writer is not None:
+            pending = stats_writer.pending(self.id)
+            if pending:
+                inc, name = pending
+                for k, v in inc.items():
+                    self.__dict__[k] = (self.__dict__.get(k) or 0) + v
+                if name:
+                    self.__dict__["name"] = name
+                level, rank_name = compute_level(self.__dict__["first_places"])
+                self.__dict__["level"] = level
+                self.__dict__["rank_name"] = rank_name
+
     def __setattr__(self, name, value):
         self.__dict__[name] = value
 
@@ -91,14 +588,102 @@ class UserSetting:
             self.__dict__["level"] = level
             self.__dict__["rank_name"] = rank_name
 
-        if users_collection is None:
+        if write_behind is None:
             return
 
+        fields = {name: value}
+        if name == "first_places":
+            fields["level"] = self.__dict__["level"]
+            fields["rank_name"] = self.__dict__["rank_name"]
+        document_cache.update(self.id, fields)
+        write_behind.set(self.id, fields)
+        if name == "first_places":
+            _notify_wins(self.id, value)
+
+
+# first_places dəyişəndə çağırılır: callback(id) yazıdan sonra,
+# callback(id, wins) isə dəyər birbaşa təyin olunanda (bax: leaderboard.py)
+win_listeners = list()
+
+
+def _notify_wins(id, wins=None):
+    for callback in win_listeners:
+        try:
+            if wins is None:
+                callback(id)
+            else:
+                callback(id, wins)
+        except Exception as e:
+            logger.error(f"first_places dinləyicisində xəta: {e}")
+
+
+document_cache = DocumentCache(SETTINGS_CACHE_SIZE, SETTINGS_CACHE_TTL)
+
+write_behind = None
+stats_writer = None
+card_counter = None
+
+_setup_lock = threading.Lock()
+_created = False
+
+
+def setup():
+    """
+    Seçilmiş backend-i (bax: storage.get_storage) və fon yazıcılarını
+    yaradır, yazılmamış kart saylarını yazmağa başlayır. Bot başlayanda
+    çağırılır, çağırılmayıbsa ilk istifadədə. Backend-i (və ya None)
+    qaytarır.
+    """
+    global store, write_behind, stats_writer, card_counter, _created
+
+    if _created:
+        return store
+
+    with _setup_lock:
+        if _created:
+            return store
+
+        store = get_storage()
+        if store is not None:
+            write_behind = WriteBehind(store, SETTINGS_FLUSH_SECONDS,
+                                       SETTINGS_FLUSH_SIZE)
+            atexit.register(write_behind.flush)
+
+            stats_writer = StatsWriter(store)
+            atexit.register(stats_writer.flush)
+
+            card_counter = CardCounter(store, CARDS_FLUSH_SECONDS,
+                                       CARDS_SPILL_FILE)
+            card_counter.start()
+            atexit.register(card_counter.flush)
+        _created = True
+        return store
+
+
+def flush():
+    """Gözləyən bütün UserSetting dəyişikliklərini dərhal yazır."""
+    if write_behind is not None:
+        write_behind.flush()
+
+
+def migrate_profiles():
+    """
+    Köhnə "profiles" sənədlərini fonda user_settings-ə birləşdirir (bax:
+    storage.merge_profiles). Bot bu vaxt normal işləyir.
+    """
+    if setup() is None:
+        return
+
+    def on_batch(ids):
+        for id in ids:
+            document_cache.invalidate(id)
+            _notify_wins(id)
+
+    def run():
         try:
-            update = {"$set": {name: value}}
-            if name == "first_places":
-                update["$set"]["level"] = self.__dict__["level"]
-                update["$set"]["rank_name"] = self.__dict__["rank_name"]
-            users_collection.update_one({"_id": self.id}, update, upsert=True)
+            store.merge_profiles(PROFILES_MIGRATION_BATCH, on_batch)
         except Exception as e:
-            logger.error(f"UserSetting yazılarkən Mongo xətası (id={self.id}, sahə={name}): {e}")
+            logger.error(f"Profillər birləşdirilərkən xəta: {e}")
+
+    threading.Thread(target=run, name="profiles_migration",
+                     daemon=True).start()
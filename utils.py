@@ -19,11 +19,17 @@
 
 
 import logging
+import threading
+from collections import deque
+from functools import wraps
+
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from internationalization import _, __
+from config import ASYNC_GAME_HANDLERS
+from internationalization import _, __, carry_locales
 from mwt import MWT
+from outbox import outbox, GAMEPLAY
 from shared_vars import gm, dispatcher
 
 logger = logging.getLogger(__name__)
@@ -82,15 +88,115 @@ def error(update: Update, context: CallbackContext):
     logger.exception(context.error)
 
 
-def send_async(bot, *args, **kwargs):
-    """Send a message asynchronously"""
+def _game_chat_id(update):
+    """The chat whose games the update is about, if any"""
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+
+    user = update.effective_user
+    player = gm.userid_current.get(user.id) if user else None
+    return player.game.chat.id if player else None
+
+
+class ChatQueues(object):
+    """
+    Runs the updates of every chat one after another, in the order they
+    arrived, in at most one dispatcher worker per chat. A busy chat never
+    holds more than one worker, so the other chats keep their share of the
+    pool.
+    """
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self._queues = dict()
+        self._lock = threading.Lock()
+
+    def submit(self, chat_id, func):
+        """ Queues func for the chat, starts a worker if none runs it yet """
+        with self._lock:
+            queue = self._queues.get(chat_id)
+            if queue is not None:
+                queue.append(func)
+                return
+            self._queues[chat_id] = deque([func])
+        self.dispatcher.run_async(self._drain, chat_id)
+
+    def pending(self, chat_id):
+        with self._lock:
+            return len(self._queues.get(chat_id, ()))
+
+    def _drain(self, chat_id):
+        while True:
+            with self._lock:
+                queue = self._queues[chat_id]
+                if not queue:
+                    del self._queues[chat_id]
+                    return
+                func = queue.popleft()
+            func()
+
+
+chat_queues = ChatQueues(dispatcher)
+
+
+def game_serial(func):
+    """
+    Runs the handler in the serial queue of the chat it is about (see
+    ChatQueues), so updates for one game run one at a time and in order,
+    while other chats are not held up. The chat lock is held as well, for
+    the jobs that change games outside of the handlers.
+
+    With ASYNC_GAME_HANDLERS off, the handler runs right away in the
+    dispatcher thread.
+    """
+    @wraps(func)
+    def wrapped(update, context, *pargs, **kwargs):
+        def run(chat_id):
+            with gm.chat_lock(chat_id):
+                return func(update, context, *pargs, **kwargs)
+
+        def queued(chat_id):
+            # Inline results follow the selected game, which might have
+            # changed while this waited in the queue
+            current = _game_chat_id(update)
+            if current is not None and current != chat_id:
+                chat_queues.submit(current, lambda: queued(current))
+                return
+
+            try:
+                run(chat_id)
+            except Exception as e:
+                dispatcher.dispatch_error(update, e)
+
+        chat_id = _game_chat_id(update)
+        if chat_id is None:
+            return func(update, context, *pargs, **kwargs)
+        if not ASYNC_GAME_HANDLERS:
+            return run(chat_id)
+        chat_queues.submit(chat_id, lambda: queued(chat_id))
+    return wrapped
+
+
+def run_async(func, *args, **kwargs):
+    """Run func in a dispatcher worker, with the locales of the caller"""
+    return dispatcher.run_async(carry_locales(func), *args, **kwargs)
+
+
+def send_async(bot, *args, priority=GAMEPLAY, **kwargs):
+    """
+    Send a message asynchronously, through the outbox and within the rate
+    limits of the chat. Lobby and other non-game messages should pass
+    priority=outbox.LOBBY, so they wait for the game messages.
+    """
     if 'timeout' not in kwargs:
         kwargs['timeout'] = TIMEOUT
 
     try:
-        dispatcher.run_async(bot.sendMessage, *args, **kwargs)
+        chat_id = kwargs.get('chat_id', args[0] if args else None)
+        outbox.put(bot.sendMessage, args, kwargs, chat_id=chat_id,
+                   priority=priority)
     except Exception as e:
-        error(None, None, e)
+        logger.error("Could not queue a message: %s", e)
 
 
 def answer_async(bot, *args, **kwargs):
@@ -98,14 +204,16 @@ def answer_async(bot, *args, **kwargs):
     if 'timeout' not in kwargs:
         kwargs['timeout'] = TIMEOUT
 
+    # An answer is only useful right away, so it is neither rate limited nor
+    # sent again after a RetryAfter
     try:
-        dispatcher.run_async(bot.answerInlineQuery, *args, **kwargs)
+        outbox.put(bot.answerInlineQuery, args, kwargs, retry=False)
     except Exception as e:
-        error(None, None, e)
+        logger.error("Could not queue an inline answer: %s", e)
 
 
 def game_is_running(game):
-    return game in gm.chatid_games.get(game.chat.id, list())
+    return gm.is_running(game)
 
 
 def user_is_creator(user, game):